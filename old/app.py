@@ -2,12 +2,19 @@ import tkinter as tk
 from tkinter import scrolledtext, ttk, messagebox, filedialog
 import pandas as pd
 import threading
+import time
 import re
+import os
 import webbrowser
 
 from scraper import PlantPriceScraper
-from utils import extract_url_from_source, open_url
-from models import SearchResult, PlantPriceResults
+from utils import extract_url_from_source, open_url, group_duplicate_plant_names, normalize_plant_name, canonical_url
+from models import SearchResult, PlantPriceResults, RunSummary
+from storage import PriceHistoryStore, NegativeResultCache
+from fingerprints import FragmentCache
+from scheduler import RefreshPlanner
+from export import EXPORT_FORMATS, write_partitioned_results
+from shards import ShardedRun
 
 class PlantPriceScraperApp:
     def __init__(self, root):
@@ -164,6 +171,25 @@ class PlantPriceScraperApp:
             style="Green.TRadiobutton"
         ).pack(side=tk.LEFT, padx=5, pady=3)
         
+        self.http2_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            method_frame, 
+            text="HTTP/2", 
+            variable=self.http2_var,
+            style="Green.TCheckbutton"
+        ).pack(side=tk.LEFT, padx=5, pady=3)
+        
+        # More than one process splits the plant list into shards, each with its own scraper
+        ttk.Label(method_frame, text="Processes:").pack(side=tk.LEFT, padx=(5, 0), pady=3)
+        self.processes_var = tk.IntVar(value=1)
+        ttk.Spinbox(
+            method_frame, 
+            from_=1, 
+            to=8, 
+            width=3, 
+            textvariable=self.processes_var
+        ).pack(side=tk.LEFT, padx=5, pady=3)
+        
         # CAPTCHA handling
         captcha_frame = ttk.LabelFrame(button_frame, text="CAPTCHA Handling", style="Green.TLabelframe")
         captcha_frame.pack(side=tk.LEFT, padx=5)
@@ -176,6 +202,34 @@ class PlantPriceScraperApp:
             style="Green.TCheckbutton"
         ).pack(side=tk.LEFT, padx=5, pady=3)
         
+        # Catalog crawl mode
+        catalog_frame = ttk.LabelFrame(button_frame, text="Retailers", style="Green.TLabelframe")
+        catalog_frame.pack(side=tk.LEFT, padx=5)
+        
+        self.catalog_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            catalog_frame, 
+            text="Use catalog index", 
+            variable=self.catalog_var,
+            style="Green.TCheckbutton"
+        ).pack(side=tk.LEFT, padx=5, pady=3)
+        
+        self.refresh_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            catalog_frame, 
+            text="Only refresh stale prices", 
+            variable=self.refresh_var,
+            style="Green.TCheckbutton"
+        ).pack(side=tk.LEFT, padx=5, pady=3)
+        
+        self.planner_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            catalog_frame, 
+            text="Best sources first", 
+            variable=self.planner_var,
+            style="Green.TCheckbutton"
+        ).pack(side=tk.LEFT, padx=5, pady=3)
+        
         # Buttons frame (right side)
         btn_container = ttk.Frame(button_frame)
         btn_container.pack(side=tk.RIGHT, padx=5)
@@ -231,6 +285,16 @@ class PlantPriceScraperApp:
         )
         self.status_label.pack(fill=tk.X, side=tk.TOP, pady=(2, 0))
         
+        # Live price summary for the whole run
+        self.summary_label = ttk.Label(
+            progress_frame, 
+            text="", 
+            anchor=tk.W,
+            foreground=self.colors["text"],
+            font=("Helvetica", 9)
+        )
+        self.summary_label.pack(fill=tk.X, side=tk.TOP)
+        
         # Initialize scraper
         self.scraper = PlantPriceScraper(logger=self.log)
         
@@ -238,8 +302,15 @@ class PlantPriceScraperApp:
         self.running = False
         self.paused_for_captcha = False
         self.results = {}  # Dictionary of plant_name -> PlantPriceResults
+        self.run_summary = RunSummary()  # Running price statistics across all plants
+        self.history = PriceHistoryStore()  # Every result seen, kept across runs
+        self.negative_cache = NegativeResultCache(self.history)  # (plant, source) pairs with no match
+        self.scraper.fragments = FragmentCache(self.history)  # Unchanged pages skip parsing across runs
+        self.sharded_run = None  # ShardedRun while a multi-process run is going
         self.current_plant = ""
         self.remaining_plants = []
+        self.plant_rows = []  # (input name, search name or None) for every input row, in input order
+        self.plant_row_indices = {}  # search name -> indices into plant_rows
         
         # Sample plant names for testing
         sample_plants = """Echeveria Elegans
@@ -316,7 +387,36 @@ Sedum Morganianum
                 self.results_tree.delete(item)
             self.log_text.delete("1.0", tk.END)
             self.results = {}  # Dictionary of plant_name -> PlantPriceResults
-            self.remaining_plants = plant_names.copy()
+            self.run_summary = RunSummary()
+            self.summary_label.config(text="")
+            
+            # Collapse duplicate entries so each plant is only scraped once
+            jobs = group_duplicate_plant_names(plant_names)
+            # Rows with no searchable name (e.g. punctuation only) keep their place with no search name
+            self.plant_rows = [(plant_name, None) for plant_name in plant_names]
+            self.plant_row_indices = {}
+            for search_name, indices in jobs:
+                self.plant_row_indices[search_name] = indices
+                for index in indices:
+                    self.plant_rows[index] = (plant_names[index], search_name)
+            self.remaining_plants = [search_name for search_name, _ in jobs]
+            
+            unsearchable = sum(1 for _, search_name in self.plant_rows if search_name is None)
+            if unsearchable:
+                self.log(f"Skipping {unsearchable} rows without a searchable plant name")
+            duplicates = len(plant_names) - len(jobs) - unsearchable
+            if duplicates:
+                self.log(f"Collapsed {duplicates} duplicate plant names into {len(jobs)} searches")
+        
+            # Sources known to have no match are only skipped when refreshing; a full run re-checks them
+            self.negative_cache.force_refresh = not self.refresh_var.get()
+            self.scraper.negative_cache = self.negative_cache
+        
+            # Reuse stored prices that are still fresh and only scrape the rest
+            if self.refresh_var.get():
+                self.remaining_plants = self.plan_refresh(self.remaining_plants)
+            else:
+                self.scraper.source_filter = None
         
         # Update UI state
         self.start_button.config(state=tk.DISABLED)
@@ -332,7 +432,8 @@ Sedum Morganianum
         self.status_label.config(text="Initializing...")
         
         # Start scraping in a new thread
-        threading.Thread(target=self.scraping_thread, args=(self.remaining_plants,), daemon=True).start()
+        target = self.sharded_scraping_thread if self.processes_var.get() > 1 else self.scraping_thread
+        threading.Thread(target=target, args=(self.remaining_plants,), daemon=True).start()
 
     def scraping_thread(self, plant_names):
         """Scraping process that runs in a separate thread"""
@@ -340,6 +441,22 @@ Sedum Morganianum
             if self.method_var.get() == "selenium" and not self.scraper.driver:
                 self.scraper.setup_driver()
             
+            self.scraper.use_http2(self.http2_var.get())
+            
+            self.root.after(0, lambda: self.status_label.config(text="Connecting to retailers..."))
+            self.scraper.warm_up()
+            
+            if self.catalog_var.get():
+                self.root.after(0, lambda: self.status_label.config(text="Refreshing retailer catalogs..."))
+                self.scraper.enable_catalog_mode()
+            else:
+                self.scraper.disable_catalog_mode()
+            
+            if self.planner_var.get():
+                self.scraper.enable_source_planner()
+            else:
+                self.scraper.disable_source_planner()
+            
             total_plants = len(plant_names)
             
             for i, plant_name in enumerate(plant_names):
@@ -348,8 +465,12 @@ Sedum Morganianum
                 
                 self.current_plant = plant_name
                 
+                # Catch up on Google as soon as the CAPTCHA has been solved
+                self.backfill_search_engines()
+                
                 # Update status
-                self.root.after(0, lambda: self.status_label.config(text=f"Searching for: {plant_name} ({i+1}/{total_plants})"))
+                paused_note = " - Google paused for CAPTCHA" if self.paused_for_captcha else ""
+                self.root.after(0, lambda: self.status_label.config(text=f"Searching for: {plant_name} ({i+1}/{total_plants}){paused_note}"))
                 self.root.after(0, lambda: self.log(f"Searching for: {plant_name}"))
                 
                 # Search for plant price
@@ -358,28 +479,12 @@ Sedum Morganianum
                 else:
                     result = self.scraper.search_plant_bs4(plant_name)
                 
-                # Check if paused for CAPTCHA
-                if self.scraper.paused_for_captcha:
-                    self.paused_for_captcha = True
-                    self.remaining_plants = plant_names[i:]
-                    self.root.after(0, lambda: self.continue_button.config(state=tk.NORMAL))
-                    self.root.after(0, lambda: self.status_label.config(text="CAPTCHA detected! Please solve it manually."))
-                    self.root.after(0, lambda: messagebox.showinfo("CAPTCHA Detected", 
-                                                           "Please solve the CAPTCHA in the browser window.\n\n" +
-                                                           "After solving, click 'Continue After CAPTCHA' button to resume.", 
-                                                           parent=self.root))
-                    break
+                # A CAPTCHA only pauses Google; this plant's other sources are already in
+                self.check_captcha()
                 
                 # Add to results (we want to collect multiple results per plant)
                 if result:
-                    # Initialize PlantPriceResults if this is the first result for this plant
-                    if plant_name not in self.results:
-                        self.results[plant_name] = PlantPriceResults(plant_name)
-                    
-                    # Add all results to this plant's collection
-                    for res in result:
-                        if isinstance(res, SearchResult) or isinstance(res, dict):
-                            self.results[plant_name].add_result(res)
+                    self.add_results(plant_name, result)
                     
                     # Update the treeview with the current results for this plant
                     self.update_treeview_for_plant(plant_name)
@@ -391,8 +496,7 @@ Sedum Morganianum
                         # Try specialty plant sites for more results
                         specialty_results = self.scraper.search_specialty_sites(plant_name)
                         if specialty_results:
-                            for res in specialty_results:
-                                self.results[plant_name].add_result(res)
+                            self.add_results(plant_name, specialty_results)
                             self.update_treeview_for_plant(plant_name)
                             
                         # If still not enough, try online marketplaces
@@ -400,19 +504,40 @@ Sedum Morganianum
                             # Use priority_marketplaces=True to focus on eBay/Amazon for third price
                             marketplace_results = self.scraper.search_online_marketplaces(plant_name, priority_marketplaces=True)
                             if marketplace_results:
-                                for res in marketplace_results:
-                                    self.results[plant_name].add_result(res)
+                                self.add_results(plant_name, marketplace_results)
                                 self.update_treeview_for_plant(plant_name)
                 
+                # Write this plant's results to the price history in one batch
+                self.flush_history()
+                
                 # Update progress
                 progress_value = int((i + 1) / total_plants * 100)
                 self.root.after(0, lambda v=progress_value: self.progress.config(value=v))
             
-            if self.running and not self.paused_for_captcha:
+            # Plants searched during a pause still need their Google search
+            while self.running and self.scraper.engine_backlog and self.captcha_var.get():
+                if self.paused_for_captcha:
+                    waiting = len(self.scraper.engine_backlog)
+                    self.root.after(0, lambda: self.status_label.config(
+                        text=f"Solve the CAPTCHA to search Google for {waiting} remaining plants"))
+                    time.sleep(0.5)
+                else:
+                    self.backfill_search_engines()
+            if self.scraper.engine_backlog:
+                skipped = len(self.scraper.engine_backlog)
+                self.root.after(0, lambda: self.log(f"Google was skipped for {skipped} plants after a CAPTCHA (they have Bing results)"))
+            
+            if self.running:
                 self.root.after(0, lambda: self.status_label.config(text="Scraping completed!"))
                 self.root.after(0, lambda: self.log("Scraping completed!"))
+                self.root.after(0, lambda: self.log(self.scraper.fragments.describe()))
+                self.root.after(0, lambda: self.log(self.scraper.fetcher.describe()))
+                self.root.after(0, lambda: self.log(self.scraper.platforms.describe()))
+                if self.scraper.source_planner:
+                    self.root.after(0, lambda: self.log(self.scraper.source_planner.describe()))
+                self.root.after(0, lambda: self.log(self.negative_cache.describe()))
                 self.root.after(0, self.prompt_save_results)
-            elif not self.paused_for_captcha:
+            else:
                 self.root.after(0, lambda: self.status_label.config(text="Scraping stopped by user."))
         
         except Exception as e:
@@ -423,34 +548,178 @@ Sedum Morganianum
             self.root.after(0, lambda: messagebox.showerror("Error", f"An error occurred: {str(e)}", parent=self.root))
         
         finally:
-            if not self.paused_for_captcha:
-                self.scraper.close_driver()
-                self.root.after(0, lambda: self.start_button.config(state=tk.NORMAL))
-                self.root.after(0, lambda: self.stop_button.config(state=tk.DISABLED))
-                self.running = False
-                self.scraper.running = False
+            self.flush_history()
+            if self.scraper.source_planner:
+                self.scraper.source_planner.save()
+            self.paused_for_captcha = False
+            self.scraper.close_driver()
+            self.root.after(0, lambda: self.start_button.config(state=tk.NORMAL))
+            self.root.after(0, lambda: self.stop_button.config(state=tk.DISABLED))
+            self.root.after(0, lambda: self.continue_button.config(state=tk.DISABLED))
+            self.running = False
+            self.scraper.running = False
 
-    def update_treeview_for_plant(self, plant_name):
-        """Update the treeview with the current results for a plant"""
-        # Remove any existing entry for this plant
-        for item in self.results_tree.get_children():
-            if self.results_tree.item(item)['values'][0] == plant_name:
-                self.results_tree.delete(item)
-                break
+    def check_captcha(self):
+        """Tell the user when the scraper has just paused Google for a CAPTCHA"""
+        if not self.scraper.paused_for_captcha or self.paused_for_captcha:
+            return
+        
+        self.paused_for_captcha = True
+        self.root.after(0, lambda: self.log("CAPTCHA detected! Google is paused; Bing, retailers, marketplaces and specialty sites continue."))
+        if self.captcha_var.get():
+            self.root.after(0, lambda: self.continue_button.config(state=tk.NORMAL))
+            self.root.after(0, lambda: self.status_label.config(text="CAPTCHA detected! Please solve it manually."))
+            self.root.after(0, lambda: messagebox.showinfo("CAPTCHA Detected", 
+                                                   "Please solve the CAPTCHA in the browser window.\n\n" +
+                                                   "The other sources keep being searched meanwhile. After solving, click " +
+                                                   "'Continue After CAPTCHA' to search Google for the plants skipped in between.", 
+                                                   parent=self.root))
+
+    def backfill_search_engines(self):
+        """Search Google for plants that skipped it while paused, once the pause is over"""
+        if not self.scraper.engine_backlog or self.scraper.paused_for_captcha:
+            return
+        
+        backlog = len(self.scraper.engine_backlog)
+        self.root.after(0, lambda: self.log(f"Searching Google for {backlog} plants skipped during the CAPTCHA pause..."))
+        for plant_name, results in self.scraper.backfill_engines():
+            # Only add what isn't already listed for the plant (Bing often finds the same pages)
+            known = self.results.get(plant_name)
+            if known:
+                seen = {canonical_url(result.url) for result in known.results if result.url}
+                results = [result for result in results if not result.url or canonical_url(result.url) not in seen]
+            if results:
+                self.add_results(plant_name, results)
+                self.update_treeview_for_plant(plant_name)
+            self.flush_history()
+        self.check_captcha()
+
+    def sharded_scraping_thread(self, plant_names):
+        """Scraping process split over several processes, each with its own scraper (and browser)"""
+        try:
+            # Saves this process's source statistics for the shards to load; the run saves theirs when it ends
+            self.scraper.disable_source_planner()
+            run = ShardedRun(
+                plant_names, 
+                self.processes_var.get(), 
+                method=self.method_var.get(), 
+                http2=self.http2_var.get(), 
+                catalog=self.catalog_var.get(), 
+                planner=self.planner_var.get(), 
+                logger=lambda message: self.root.after(0, lambda: self.log(message))
+            )
+            self.sharded_run = run
+            shard_count = len(run.shards)
+            self.root.after(0, lambda: self.status_label.config(text=f"Searching in {shard_count} processes..."))
+            
+            def on_result(plant_name, results):
+                if results:
+                    self.add_results(plant_name, results)
+                    self.update_treeview_for_plant(plant_name)
+                self.flush_history()
+            
+            def on_progress(done, total):
+                # Described now: the callbacks run later on the GUI thread, by when the counts have moved on
+                text = run.describe()
+                self.root.after(0, lambda: self.progress.config(value=int(done / total * 100)))
+                self.root.after(0, lambda: self.status_label.config(text=text))
+            
+            run.run(on_result, on_progress)
+            
+            if self.running:
+                self.root.after(0, lambda: self.status_label.config(text="Scraping completed!"))
+                self.root.after(0, lambda: self.log("Scraping completed!"))
+                summary = run.describe()
+                self.root.after(0, lambda: self.log(summary))
+                self.root.after(0, lambda: self.log(self.negative_cache.describe()))
+                self.root.after(0, self.prompt_save_results)
+            else:
+                self.root.after(0, lambda: self.status_label.config(text="Scraping stopped by user."))
+        
+        except Exception as e:
+            import traceback
+            error_msg = f"Error: {str(e)}\n{traceback.format_exc()}"
+            self.root.after(0, lambda: self.log(error_msg))
+            self.root.after(0, lambda: self.status_label.config(text="Error occurred!"))
+            self.root.after(0, lambda: messagebox.showerror("Error", f"An error occurred: {str(e)}", parent=self.root))
         
+        finally:
+            self.flush_history()
+            # Cleared on the GUI thread, which is where stop_scraping reads it
+            self.root.after(0, lambda: setattr(self, 'sharded_run', None))
+            self.root.after(0, lambda: self.start_button.config(state=tk.NORMAL))
+            self.root.after(0, lambda: self.stop_button.config(state=tk.DISABLED))
+            self.running = False
+            self.scraper.running = False
+
+    def plan_refresh(self, plant_names):
+        """
+        Fill in stored prices that are still fresh and return the plants that need scraping
+        
+        Args:
+            plant_names: Search names for this run
+        
+        Returns:
+            List of plant names to scrape
+        """
+        self.flush_history()
+        planner = RefreshPlanner(self.history, direct_sources=[r.name for r in self.scraper.retailers],
+                                 negative_cache=self.negative_cache)
+        plan = planner.plan(plant_names)
+        self.log(plan.describe())
+        
+        # Plants with only fresh prices are answered entirely from the store;
+        # plants being refreshed keep their fresh retailer prices and skip those retailers
+        reuse = set(plan.reuse)
+        for plant_name in plant_names:
+            if plant_name in reuse:
+                stored = planner.stored_results(plant_name)
+            else:
+                stored = planner.stored_results(plant_name, plan.fresh_sources.get(normalize_plant_name(plant_name), ()))
+            if stored:
+                self.add_results(plant_name, stored, record=False)
+                self.update_treeview_for_plant(plant_name)
+        
+        self.scraper.source_filter = plan.should_query
+        return plan.refresh
+    
+    def add_results(self, plant_name, results, record=True):
+        """Add search results to a plant's collection and to the run-wide summary (and, if record, the price history)"""
+        # Initialize PlantPriceResults if this is the first result for this plant
+        if plant_name not in self.results:
+            self.results[plant_name] = PlantPriceResults(plant_name)
+        
+        for res in results:
+            if isinstance(res, SearchResult) or isinstance(res, dict):
+                search_result = self.results[plant_name].add_result(res)
+                self.run_summary.add_result(search_result)
+                if record:
+                    self.history.add_result(search_result)
+        
+        summary_text = self.run_summary.describe()
+        self.root.after(0, lambda: self.summary_label.config(text=summary_text))
+    
+    def flush_history(self):
+        """Write pending results to the price history database"""
+        try:
+            self.history.flush()
+        except Exception as e:
+            self.log(f"Error saving price history: {str(e)}")
+    
+    def update_treeview_for_plant(self, plant_name):
+        """Update the treeview rows of every input entry that maps to this plant"""
         # Get the plant's results
         plant_results = self.results.get(plant_name)
         if not plant_results:
-            # Insert a row with "No results found" if no results exist
-            self.results_tree.insert("", tk.END, 
-                                   values=[plant_name, "N/A", "No results found", "N/A", "N/A", "N/A", "N/A"])
+            # Show "No results found" if no results exist
+            self._set_treeview_rows(plant_name, ["N/A", "No results found", "N/A", "N/A", "N/A", "N/A"])
             return
             
         # Get top 3 results (pad with empty results if less than 3)
         top_results = plant_results.get_top_results(3)
         
-        # Prepare values list with plant name and 3 prices + 3 sources
-        values = [plant_name]
+        # Prepare values list with 3 prices + 3 sources
+        values = []
         for i in range(3):
             if i < len(top_results):
                 result = top_results[i]
@@ -462,8 +731,23 @@ Sedum Morganianum
                 # Fill with N/A if we don't have enough results
                 values.extend(["N/A", "N/A"])
                 
-        # Insert into treeview
-        self.results_tree.insert("", tk.END, values=values)
+        self._set_treeview_rows(plant_name, values)
+    
+    def _set_treeview_rows(self, plant_name, values):
+        """Insert or refresh one treeview row per original input entry for a plant"""
+        indices = self.plant_row_indices.get(plant_name)
+        if indices is None:
+            # Plant wasn't part of the deduplicated input (shouldn't normally happen)
+            indices = []
+            self.results_tree.insert("", tk.END, values=[plant_name] + values)
+        
+        for index in indices:
+            row_id = f"row{index}"
+            row_values = [self.plant_rows[index][0]] + values
+            if self.results_tree.exists(row_id):
+                self.results_tree.item(row_id, values=row_values)
+            else:
+                self.results_tree.insert("", tk.END, iid=row_id, values=row_values)
         
         # Alternate row colors for better readability
         for i, item in enumerate(self.results_tree.get_children()):
@@ -479,12 +763,14 @@ Sedum Morganianum
             self.paused_for_captcha = False
             self.scraper.set_paused_for_captcha(False)
             self.continue_button.config(state=tk.DISABLED)
-            self.start_scraping()
+            # The scraping thread picks up the skipped Google queries before its next plant
 
     def stop_scraping(self):
         """Stop the scraping process"""
         self.running = False
         self.scraper.stop()
+        if self.sharded_run:
+            self.sharded_run.stop()
         self.status_label.config(text="Stopping... Please wait.")
         self.log("Stopping scraping...")
         self.paused_for_captcha = False
@@ -525,7 +811,13 @@ Sedum Morganianum
             messagebox.showwarning("No Results", "There are no results to save.", parent=self.root)
             return
         
-        filetypes = (("CSV files", "*.csv"), ("Excel files", "*.xlsx"), ("All files", "*.*"))
+        filetypes = (
+            ("CSV files", "*.csv"),
+            ("Excel files", "*.xlsx"),
+            ("Parquet dataset (partitioned by date/retailer)", "*.parquet"),
+            ("Arrow IPC dataset (partitioned by date/retailer)", "*.arrow"),
+            ("All files", "*.*")
+        )
         filename = filedialog.asksaveasfilename(
             title="Save Results",
             defaultextension=".csv",
@@ -534,22 +826,48 @@ Sedum Morganianum
         )
         
         if filename:
+            base, ext = os.path.splitext(filename)
+            if ext.lower() in EXPORT_FORMATS:
+                self.export_dataset(base, EXPORT_FORMATS[ext.lower()])
+                return
+            
             try:
-                # Convert results to a list of dictionaries
-                result_dicts = [plant_results.to_dict() for plant_results in self.results.values()]
+                # Convert results to a list of dictionaries, one per original input row
+                result_dicts = []
+                for input_name, search_name in self.plant_rows:
+                    plant_results = self.results.get(search_name)
+                    if plant_results:
+                        row = plant_results.to_dict()
+                        row["plant_name"] = input_name
+                        result_dicts.append(row)
                 
-                # Create DataFrame
+                # Create DataFrames for the results and the run summary statistics
                 df = pd.DataFrame(result_dicts)
+                summary_df = pd.DataFrame(self.run_summary.to_rows())
                 
                 if filename.endswith('.xlsx'):
-                    df.to_excel(filename, index=False)
-                else:  # Default to CSV
+                    with pd.ExcelWriter(filename) as writer:
+                        df.to_excel(writer, sheet_name="Results", index=False)
+                        summary_df.to_excel(writer, sheet_name="Summary", index=False)
+                else:  # Default to CSV, with the summary alongside it
                     df.to_csv(filename, index=False)
+                    summary_df.to_csv(f"{base}_summary{ext or '.csv'}", index=False)
                 
                 self.log(f"Results saved to {filename}")
                 messagebox.showinfo("Save Successful", f"Results saved to {filename}", parent=self.root)
             except Exception as e:
                 messagebox.showerror("Save Error", f"Could not save results: {str(e)}", parent=self.root)
+    
+    def export_dataset(self, base_dir, file_format):
+        """Export every search result (one row each) as a date/retailer partitioned dataset"""
+        try:
+            all_results = [res for plant_results in self.results.values() for res in plant_results.results]
+            row_count = write_partitioned_results(all_results, base_dir, file_format)
+            
+            self.log(f"Exported {row_count} results to {base_dir}")
+            messagebox.showinfo("Save Successful", f"Exported {row_count} results to {base_dir}", parent=self.root)
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Could not export results: {str(e)}", parent=self.root)
 
     def prompt_save_results(self):
         """Ask user if they want to save results after scraping completes"""
@@ -0,0 +1,384 @@
+"""
+Micro-benchmarks for hot paths of the scraper.
+
+Run from this directory:
+    python benchmarks.py
+"""
+import asyncio
+import datetime
+import http.server
+import json
+import random
+import re
+import threading
+import time
+import timeit
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from bs4 import BeautifulSoup
+
+from fetcher import PageFetcher, httpx
+from models import SearchResult
+from prices import PRICE_PATTERN
+from structured import extract_page_offer
+from utils import is_relevant_result, EXCLUDED_SITES, IRRELEVANT_TERMS, PRICE_INDICATORS
+
+# h2 comes with httpx[http2] and is only needed for the HTTP/2 benchmark server
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+except ImportError:
+    h2 = None
+
+def legacy_is_relevant_result(plant_name, result_text):
+    """Original implementation of utils.is_relevant_result, kept for comparison"""
+    result_text = result_text.lower()
+    plant_name = plant_name.lower()
+    
+    if any(site in result_text for site in list(EXCLUDED_SITES)):
+        return False
+    
+    plant_words = [word for word in plant_name.split() if len(word) > 2]
+    if len(plant_words) >= 3:
+        matches = sum(1 for word in plant_words if word in result_text)
+        if matches < len(plant_words) * 0.67:
+            return False
+    else:
+        if not all(word in result_text for word in plant_words):
+            return False
+    
+    irrelevant_matches = sum(1 for term in list(IRRELEVANT_TERMS) if term in result_text)
+    if irrelevant_matches > 2:
+        return False
+    
+    has_price_indicator = any(indicator in result_text for indicator in list(PRICE_INDICATORS))
+    if len(result_text) < 100 and not has_price_indicator:
+        return False
+    
+    return True
+
+class RegexTermScanner:
+    """Single-pass alternative: one compiled alternation of every term, anchored at word boundaries"""
+    
+    def __init__(self, **categories):
+        self.term_categories = {}
+        for name, terms in categories.items():
+            for term in terms:
+                self.term_categories.setdefault(term.lower(), set()).add(name)
+        
+        # Word terms share one \b(?:...)\b group; terms that don't start and end with a word
+        # character (e.g. "$") have no boundary of their own and are listed alone.
+        # Longest terms first so a longer term wins where two start at the same position.
+        terms = sorted(self.term_categories, key=len, reverse=True)
+        words = [re.escape(term) for term in terms if term[0].isalnum() and term[-1].isalnum()]
+        others = [re.escape(term) for term in terms if not (term[0].isalnum() and term[-1].isalnum())]
+        self.pattern = re.compile('|'.join(others + [r'\b(?:' + '|'.join(words) + r')\b']))
+    
+    def scan(self, text):
+        """Count matching terms for every category in one pass"""
+        counts = {}
+        for term in set(self.pattern.findall(text)):
+            for name in self.term_categories[term]:
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+
+def regex_is_relevant_result(scanner, plant_name, result_text):
+    """is_relevant_result driven by RegexTermScanner"""
+    result_text = result_text.lower()
+    counts = scanner.scan(result_text)
+    if counts.get('excluded'):
+        return False
+    
+    plant_words = [word for word in plant_name.lower().split() if len(word) > 2]
+    matches = sum(1 for word in plant_words if word in result_text)
+    if len(plant_words) >= 3:
+        if matches < len(plant_words) * 0.67:
+            return False
+    elif matches < len(plant_words):
+        return False
+    
+    if counts.get('irrelevant', 0) > 2:
+        return False
+    if len(result_text) < 100 and not counts.get('price'):
+        return False
+    return True
+
+def make_sample_texts(count=200, seed=42):
+    """Build search-result-like snippets of varying length"""
+    rng = random.Random(seed)
+    vocabulary = (
+        "echeveria elegans mexican snowball succulent plant pot grows full sun rosette "
+        "pale blue leaves delivered australia wide nursery garden buy price sale shop "
+        "care guide how to grow images toxic contact us 140mm $12.95 $8.50 wikipedia.org"
+    ).split()
+    texts = []
+    for _ in range(count):
+        length = rng.choice([15, 40, 120, 400])
+        texts.append(' '.join(rng.choice(vocabulary) for _ in range(length)))
+    return texts
+
+def run_relevance_benchmark(repeat=5, number=20):
+    """Compare the current, legacy and combined-regex relevance checks"""
+    texts = make_sample_texts()
+    plant_names = ["Echeveria Elegans", "Aloe Vera", "Crassula Ovata Gollum"]
+    regex_scanner = RegexTermScanner(excluded=EXCLUDED_SITES, irrelevant=IRRELEVANT_TERMS,
+                                     price=PRICE_INDICATORS)
+    
+    # All implementations must agree before timing them
+    for plant_name in plant_names:
+        for text in texts:
+            expected = legacy_is_relevant_result(plant_name, text)
+            assert is_relevant_result(plant_name, text) == expected
+            assert regex_is_relevant_result(regex_scanner, plant_name, text) == expected
+    
+    candidates = {
+        "legacy": lambda p, t: legacy_is_relevant_result(p, t),
+        "current": lambda p, t: is_relevant_result(p, t),
+        "combined regex": lambda p, t: regex_is_relevant_result(regex_scanner, p, t),
+    }
+    
+    checks = len(texts) * len(plant_names) * number
+    print(f"is_relevant_result: {checks} checks per run, best of {repeat}")
+    for name, func in candidates.items():
+        def run():
+            for plant_name in plant_names:
+                for text in texts:
+                    func(plant_name, text)
+        best = min(timeit.repeat(run, repeat=repeat, number=number))
+        print(f"  {name:<15} {best * 1e6 / checks:8.2f} us/check")
+
+# Price selectors GoogleParser._scrape_product_page falls back to when a page has no structured data
+PRODUCT_PAGE_SELECTORS = [
+    'span.price', 'div.price', 'span.product-price',
+    'span[itemprop="price"]', 'meta[itemprop="price"]',
+    'span.amount', 'span[class*="price"]',
+    'p.price', 'div[class*="price"]', 'span.current-price',
+    'div.productPrice', 'span.sales-price',
+    '.product-info-price', '.price-box'
+]
+
+def selector_product_price(page):
+    """Full parse plus CSS selector scan, as done for pages without structured data"""
+    soup = BeautifulSoup(page, 'html.parser')
+    for selector in PRODUCT_PAGE_SELECTORS:
+        for element in soup.select(selector):
+            text = element['content'] if element.name == 'meta' and element.has_attr('content') else element.get_text()
+            match = PRICE_PATTERN.search(text)
+            if match:
+                return match.group(0)
+    return None
+
+def make_product_page(filler_cards=150):
+    """Shopify-style product page: JSON-LD offer in the head, a price span and a large body"""
+    json_ld = json.dumps({
+        "@context": "https://schema.org",
+        "@graph": [
+            {"@type": "Organization", "name": "Example Nursery"},
+            {"@type": "Product", "name": "Echeveria Elegans 140mm",
+             "offers": [{"@type": "Offer", "price": "12.95", "priceCurrency": "AUD"}]}
+        ]
+    })
+    cards = ''.join(
+        f'<div class="card"><a href="/products/p{i}"><h3>Related plant {i}</h3></a>'
+        f'<p class="description">Hardy succulent, full sun, grows to {i % 30} cm.</p></div>'
+        for i in range(filler_cards)
+    )
+    return (
+        '<html><head><title>Echeveria Elegans 140mm | Example Nursery</title>'
+        '<meta property="og:title" content="Echeveria Elegans 140mm">'
+        f'<script type="application/ld+json">{json_ld}</script></head><body>'
+        f'<nav>{"<a href=/c>Category</a>" * 50}</nav>'
+        '<h1>Echeveria Elegans 140mm</h1><span class="price">$12.95</span>'
+        f'<section>{cards}</section></body></html>'
+    )
+
+def run_product_page_benchmark(repeat=5, number=50):
+    """Compare structured-data extraction on raw bytes with a full parse and selector scan"""
+    page = make_product_page()
+    page_bytes = page.encode('utf-8')
+    
+    offer = extract_page_offer(page_bytes)
+    assert offer and offer['price'].format() == selector_product_price(page) == "$12.95"
+    
+    print(f"product page price ({len(page_bytes) // 1024} KB page), best of {repeat}")
+    for name, func in (("structured data", lambda: extract_page_offer(page_bytes)),
+                       ("soup + selectors", lambda: selector_product_price(page))):
+        best = min(timeit.repeat(func, repeat=repeat, number=number))
+        print(f"  {name:<17} {best * 1e3 / number:8.3f} ms/page")
+
+class LegacySearchResult:
+    """SearchResult before it was slotted: a plain object holding the formatted price and source strings"""
+    
+    def __init__(self, plant_name, price, source, source_type=None, relevance_score=0):
+        self.plant_name = plant_name
+        self.price = price.strip()
+        self.source = source
+        self.source_type = source_type or 'retailer'
+        self.relevance_score = relevance_score
+        self.timestamp = datetime.datetime.now()
+
+def _measure(build, count):
+    """Bytes still allocated after building count results"""
+    tracemalloc.start()
+    results = [build(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return size
+
+def run_memory_benchmark(count=100_000):
+    """Compare the memory held by a run's worth of legacy and slotted search results"""
+    retailers = ["Bunnings", "Flower Power", "Garden Express", "eBay Australia", "Plantary"]
+    plants = [f"Echeveria Elegans {i}" for i in range(500)]
+    
+    def legacy(i):
+        retailer = retailers[i % len(retailers)]
+        title = f"Echeveria Elegans 140mm pot variety {i}"
+        url = f"https://example.com.au/products/echeveria-elegans-{i}"
+        return LegacySearchResult(plants[i % len(plants)], f"${i % 90 + 5}.95",
+                                  f"{retailer} - {title[:30]}... - {url}", 'retailer')
+    
+    def slotted(title_length=None):
+        def build(i):
+            title = f"Echeveria Elegans 140mm pot variety {i}"
+            return SearchResult(plants[i % len(plants)], f"${i % 90 + 5}.95", retailer=retailers[i % len(retailers)],
+                                title=title[:title_length], url=f"https://example.com.au/products/echeveria-elegans-{i}")
+        return build
+    
+    # The legacy source string only kept 30 characters of the title; the slotted result keeps all of it
+    print(f"search results in memory: {count} results")
+    legacy_size = _measure(legacy, count)
+    print(f"  {'legacy':<22} {legacy_size / 1024 / 1024:6.1f} MB")
+    for name, build in (("slotted, same text", slotted(30)), ("slotted, full title", slotted())):
+        size = _measure(build, count)
+        print(f"  {name:<22} {size / 1024 / 1024:6.1f} MB ({size / legacy_size - 1:+.0%})")
+
+class _Http1Handler(http.server.BaseHTTPRequestHandler):
+    """Keep-alive HTTP/1.1 handler answering every GET with the test page after a delay"""
+    protocol_version = "HTTP/1.1"
+    body = b""
+    delay = 0.0
+    connections = 0
+    
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+    
+    def do_GET(self):
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+    
+    def log_message(self, *args):
+        pass
+
+class _H2Protocol(asyncio.Protocol):
+    """Minimal cleartext HTTP/2 (prior knowledge) server answering every request with the test page"""
+    connections = 0
+    
+    def __init__(self, body, delay):
+        self.conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        self.body = body
+        self.delay = delay
+        self.pending = {}  # stream id -> body bytes still to send
+    
+    def connection_made(self, transport):
+        type(self).connections += 1
+        self.transport = transport
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+    
+    def data_received(self, data):
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                asyncio.get_running_loop().call_later(self.delay, self.respond, event.stream_id)
+            elif isinstance(event, h2.events.StreamReset):
+                self.pending.pop(event.stream_id, None)
+            elif isinstance(event, h2.events.WindowUpdated):
+                self.send_pending()
+        self.transport.write(self.conn.data_to_send())
+    
+    def respond(self, stream_id):
+        self.conn.send_headers(stream_id, [
+            (":status", "200"),
+            ("content-type", "text/html; charset=utf-8"),
+            ("content-length", str(len(self.body))),
+        ])
+        self.pending[stream_id] = self.body
+        self.send_pending()
+    
+    def send_pending(self):
+        """Send as much queued body data as flow control allows"""
+        for stream_id, data in list(self.pending.items()):
+            while data:
+                size = min(self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size, len(data))
+                if size <= 0:
+                    break
+                self.conn.send_data(stream_id, data[:size], end_stream=size == len(data))
+                data = data[size:]
+            if data:
+                self.pending[stream_id] = data
+            else:
+                del self.pending[stream_id]
+        self.transport.write(self.conn.data_to_send())
+
+def _start_h2_server(body, delay):
+    """Run the HTTP/2 test server on a background event loop, returning its port"""
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(loop.create_server(lambda: _H2Protocol(body, delay), "127.0.0.1", 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return server.sockets[0].getsockname()[1]
+
+def run_http_benchmark(requests_count=200, concurrency=32, page_kb=24, delay=0.02):
+    """
+    Compare the pooled HTTP/1.1 fetcher with the HTTP/2 fetcher on concurrent same-host requests
+    
+    Both servers run locally and wait `delay` seconds before answering, standing in for
+    server think time; the HTTP/2 server speaks cleartext HTTP/2 with prior knowledge.
+    """
+    if h2 is None or httpx is None:
+        print("HTTP/2 benchmark skipped: needs httpx[http2]")
+        return
+    
+    body = make_product_page(filler_cards=page_kb * 1024 // 150).encode("utf-8")
+    _Http1Handler.body = body
+    _Http1Handler.delay = delay
+    http1_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Http1Handler)
+    http1_server.daemon_threads = True
+    threading.Thread(target=http1_server.serve_forever, daemon=True).start()
+    h2_port = _start_h2_server(body, delay)
+    
+    http1 = PageFetcher(max_connections=concurrency)
+    http2 = PageFetcher(http2=True)
+    # Cleartext HTTP/2 needs prior knowledge; real sites negotiate it over TLS
+    http2.client.close()
+    http2.client = httpx.Client(http1=False, http2=True)
+    
+    candidates = (
+        ("HTTP/1.1 pooled", http1, f"http://127.0.0.1:{http1_server.server_port}/", _Http1Handler),
+        ("HTTP/2", http2, f"http://127.0.0.1:{h2_port}/", _H2Protocol),
+    )
+    print(f"same-host fetches: {requests_count} x {len(body) // 1024} KB, {concurrency} threads, "
+          f"{delay * 1000:.0f} ms server delay")
+    for name, fetcher, url, server in candidates:
+        server.connections = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            pages = list(pool.map(lambda i: fetcher.fetch(f"{url}?p={i}", "product"), range(requests_count)))
+            elapsed = time.perf_counter() - start
+        assert all(page.status_code == 200 and len(page.content) == len(body) for page in pages)
+        print(f"  {name:<16} {elapsed:6.2f} s total, {requests_count / elapsed:7.1f} pages/s, "
+              f"{server.connections} connections")
+        fetcher.close()
+    http1_server.shutdown()
+
+if __name__ == "__main__":
+    run_relevance_benchmark()
+    run_product_page_benchmark()
+    run_memory_benchmark()
+    run_http_benchmark()
@@ -0,0 +1,216 @@
+import contextlib
+import json
+import os
+import time
+
+from fetcher import PageFetcher
+from models import SearchResult
+from parsers import RetailerParser
+from utils import random_delay, get_request_headers
+from matcher import TrigramIndex, get_matcher, tokenize, FULL_MATCH_SCORE
+
+# How long a crawled retailer catalog is trusted before it is crawled again
+DEFAULT_REFRESH_PERIOD = 7 * 24 * 60 * 60  # one week, in seconds
+# A failed or empty crawl is retried after this long, doubling with every further failure
+CRAWL_RETRY_DELAY = 60 * 60
+
+class ProductIndex:
+    """Local index of retailer catalog products, searchable by plant name tokens"""
+    
+    def __init__(self, path=None):
+        self.path = path
+        self.products = {}  # retailer name -> list of product dicts
+        self.crawled_at = {}  # retailer name -> unix time of last crawl
+        self.failures = {}  # retailer name -> (consecutive failed crawls, unix time to retry from)
+        self.title_index = TrigramIndex()  # (retailer name, product position) -> title trigrams
+        
+        if path and os.path.exists(path):
+            self.load()
+    
+    def set_products(self, retailer_name, products, crawled_at=None):
+        """Replace all indexed products for a retailer"""
+        # Only this retailer's titles are taken out of the index and put back
+        for position in range(len(self.products.get(retailer_name, ()))):
+            self.title_index.remove((retailer_name, position))
+        self.products[retailer_name] = []
+        self.crawled_at[retailer_name] = crawled_at or time.time()
+        
+        for position, product in enumerate(products):
+            self.products[retailer_name].append({
+                'title': product['title'],
+                'tokens': tokenize(product['title']),
+                'price': product['price'],
+                'url': product['url']
+            })
+            self.title_index.add((retailer_name, position), product['title'])
+    
+    def record_failure(self, retailer_name, now=None, delay=CRAWL_RETRY_DELAY, max_delay=DEFAULT_REFRESH_PERIOD):
+        """Note a failed or empty crawl; the retailer isn't crawled again until the backoff has passed"""
+        failures = self.failures.get(retailer_name, (0, None))[0] + 1
+        retry_at = (now or time.time()) + min(delay * 2 ** (failures - 1), max_delay)
+        self.failures[retailer_name] = (failures, retry_at)
+    
+    def is_backing_off(self, retailer_name, now=None):
+        """Whether a retailer's last crawl failed and its retry time hasn't come yet"""
+        entry = self.failures.get(retailer_name)
+        return bool(entry) and entry[1] > (now or time.time())
+    
+    def is_stale(self, retailer_name, max_age=DEFAULT_REFRESH_PERIOD):
+        """Check whether a retailer's catalog is missing or older than max_age seconds"""
+        crawled_at = self.crawled_at.get(retailer_name)
+        return crawled_at is None or time.time() - crawled_at > max_age
+    
+    def lookup(self, plant_name, retailer_name=None):
+        """
+        Find the best matching product per retailer for a plant
+        
+        Args:
+            plant_name: The plant to look up
+            retailer_name: Restrict the lookup to one retailer (default: all)
+        
+        Returns:
+            Dictionary of retailer name -> best matching product dict
+        """
+        matcher = get_matcher(plant_name)
+        
+        # Ranked fuzzy matches; the first hit per retailer is its best product
+        best = {}
+        for score, (name, position) in self.title_index.search(matcher, min_score=FULL_MATCH_SCORE):
+            if retailer_name and name != retailer_name:
+                continue
+            product = self.products[name][position]
+            # Break score ties in favour of the most specific (shortest) title
+            rank = (score, -len(product['tokens']))
+            if name not in best or rank > best[name][0]:
+                best[name] = (rank, product)
+        
+        return {name: product for name, (rank, product) in best.items()}
+    
+    def load(self):
+        """Load the index from its JSON file"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        for retailer_name, entry in data.get('retailers', {}).items():
+            products = [
+                {'title': title, 'price': price, 'url': url}
+                for title, price, url in entry.get('products', [])
+            ]
+            self.set_products(retailer_name, products, crawled_at=entry.get('crawled_at'))
+        for retailer_name, (failures, retry_at) in data.get('failures', {}).items():
+            self.failures[retailer_name] = (failures, retry_at)
+    
+    def save(self):
+        """Write the index to its JSON file"""
+        if not self.path:
+            return
+        
+        data = {'retailers': {}, 'failures': self.failures}
+        for retailer_name, products in self.products.items():
+            data['retailers'][retailer_name] = {
+                'crawled_at': self.crawled_at.get(retailer_name),
+                'products': [[p['title'], str(p['price']), p['url']] for p in products]
+            }
+        
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+class CatalogCrawler:
+    """Crawls retailer plant category listings and answers plant lookups from the local index"""
+    
+    def __init__(self, retailers, index, logger=None, refresh_period=DEFAULT_REFRESH_PERIOD, fetcher=None):
+        self.retailers = retailers
+        self.index = index
+        self.logger = logger or (lambda msg: None)
+        self.refresh_period = refresh_period
+        self.fetcher = fetcher or PageFetcher(logger=self.logger)  # Shared with the scraper when it passes its own
+    
+    def refresh(self, force=False):
+        """
+        Crawl every retailer whose catalog is missing or older than the refresh period
+        
+        Called once per run, not per plant. A crawl that fails or finds nothing
+        keeps the retailer's previous listing (if any) and is not retried until
+        its backoff has passed, unless force is set.
+        """
+        changed = False
+        for retailer in self.retailers:
+            if not retailer.category_url_template:
+                continue
+            if not force and (not self.index.is_stale(retailer.name, self.refresh_period)
+                              or self.index.is_backing_off(retailer.name)):
+                continue
+        
+            products = self.crawl_retailer(retailer)
+            if products:
+                self.index.set_products(retailer.name, products)
+                self.index.failures.pop(retailer.name, None)
+            else:
+                self.index.record_failure(retailer.name, max_delay=self.refresh_period)
+                self.logger(f"No products crawled from {retailer.name}, searching it live until the next retry")
+            changed = True
+        
+        if changed:
+            self.index.save()
+    
+    def covers(self, retailer):
+        """Whether the index can answer for a retailer: crawled within the refresh period and not empty"""
+        return (bool(retailer.category_url_template) and bool(self.index.products.get(retailer.name))
+                and not self.index.is_stale(retailer.name, self.refresh_period))
+    
+    def crawl_retailer(self, retailer):
+        """Fetch category listing pages for a retailer until they run out"""
+        self.logger(f"Crawling {retailer.name} catalog...")
+        parser = RetailerParser(retailer, logger=self.logger)
+        products = []
+        seen_urls = set()
+        
+        # Listing pages count against the same per-site limit as searches
+        rate_limit = retailer.plan.rate_limit if retailer.plan else contextlib.nullcontext()
+        
+        for page in range(1, retailer.max_catalog_pages + 1):
+            url = retailer.get_category_url(page)
+            try:
+                with rate_limit:
+                    response = self.fetcher.fetch(url, 'category', headers=get_request_headers(), timeout=15)
+                if response.status_code != 200:
+                    break
+                
+                listing = parser.parse_listing_page(response.text, url)
+                
+                # Stop when the page is empty or the site keeps serving the same page
+                new_products = [p for p in listing if p['url'] not in seen_urls]
+                if not new_products:
+                    break
+                
+                for product in new_products:
+                    seen_urls.add(product['url'])
+                products.extend(new_products)
+            
+            except Exception as e:
+                self.logger(f"Error crawling {retailer.name} page {page}: {str(e)}")
+                break
+            
+            random_delay(1, 2)
+        
+        self.logger(f"Indexed {len(products)} products from {retailer.name}")
+        return products
+    
+    def lookup(self, plant_name):
+        """Answer a plant lookup from the index, one result per retailer it covers"""
+        results = []
+        matches = self.index.lookup(plant_name)
+        
+        # Keep the configured retailer order
+        for retailer in self.retailers:
+            product = matches.get(retailer.name) if self.covers(retailer) else None
+            if product:
+                results.append(SearchResult(
+                    plant_name=plant_name,
+                    price=product['price'],
+                    retailer=retailer.name,
+                    title=product['title'],
+                    url=product['url']
+                ))
+        
+        return results
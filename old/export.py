@@ -0,0 +1,129 @@
+import datetime
+import uuid
+
+# pyarrow is only needed for the Parquet / Arrow export
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+# File formats understood by pyarrow.dataset, keyed by the extension picked in the save dialog
+EXPORT_FORMATS = {'.parquet': 'parquet', '.arrow': 'ipc'}
+
+PARTITION_COLUMNS = ['date', 'retailer']
+
+def _require_pyarrow():
+    """Raise a readable error when pyarrow isn't installed"""
+    if pa is None:
+        raise ImportError("Parquet/Arrow export needs pyarrow (pip install pyarrow)")
+
+def results_schema():
+    """Arrow schema for one row per SearchResult"""
+    _require_pyarrow()
+    categorical = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('plant_name', pa.string()),
+        ('retailer', pa.string()),
+        ('source_type', categorical),
+        ('price', pa.float64()),
+        ('price_cents', pa.int64()),
+        ('currency', categorical),
+        ('title', pa.string()),
+        ('url', pa.string()),
+        ('source', pa.string()),
+        ('observed_at', pa.timestamp('ms', tz='UTC')),
+        ('date', pa.string()),
+    ])
+
+def results_to_table(results):
+    """
+    Build an Arrow table from SearchResults
+    
+    Args:
+        results: Iterable of SearchResult objects
+    
+    Returns:
+        pyarrow.Table using results_schema()
+    """
+    _require_pyarrow()
+    columns = {name: [] for name in results_schema().names}
+    
+    for result in results:
+        observed_at = datetime.datetime.fromtimestamp(result.created_at, datetime.timezone.utc)
+        columns['plant_name'].append(result.plant_name)
+        columns['retailer'].append(result.retailer or "Other")
+        columns['source_type'].append(result.source_type)
+        columns['price'].append(result.price_cents / 100 if result.price_cents is not None else None)
+        columns['price_cents'].append(result.price_cents)
+        columns['currency'].append(result.currency)
+        columns['title'].append(result.title)
+        columns['url'].append(result.url)
+        columns['source'].append(result.source)
+        columns['observed_at'].append(observed_at)
+        columns['date'].append(observed_at.date().isoformat())
+    
+    return pa.Table.from_pydict(columns, schema=results_schema())
+
+def write_partitioned_results(results, base_dir, file_format='parquet'):
+    """
+    Write results as a dataset partitioned by date and retailer (date=.../retailer=.../*.parquet)
+    
+    Each call adds new files, so repeated exports into the same directory build up
+    a history that can be read back with load_results.
+    
+    Args:
+        results: Iterable of SearchResult objects
+        base_dir: Root directory of the dataset
+        file_format: 'parquet' or 'ipc' (Arrow IPC / Feather)
+    
+    Returns:
+        Number of rows written
+    """
+    table = results_to_table(results)
+    if table.num_rows == 0:
+        return 0
+    
+    extension = 'arrow' if file_format == 'ipc' else file_format
+    ds.write_dataset(
+        table,
+        base_dir,
+        format=file_format,
+        partitioning=PARTITION_COLUMNS,
+        partitioning_flavor='hive',
+        basename_template=f"results-{uuid.uuid4().hex[:12]}-{{i}}.{extension}",
+        existing_data_behavior='overwrite_or_ignore'
+    )
+    return table.num_rows
+
+def load_results(base_dir, start_date=None, end_date=None, retailers=None, columns=None, file_format='parquet'):
+    """
+    Read an exported dataset back, only touching the partitions that match
+    
+    Args:
+        base_dir: Root directory of the dataset
+        start_date: First date to include (datetime.date or "YYYY-MM-DD")
+        end_date: Last date to include
+        retailers: Only include these retailers
+        columns: Only read these columns
+        file_format: 'parquet' or 'ipc'
+    
+    Returns:
+        pyarrow.Table
+    """
+    _require_pyarrow()
+    dataset = ds.dataset(base_dir, format=file_format, partitioning='hive')
+    
+    condition = None
+    filters = []
+    if start_date:
+        filters.append(ds.field('date') >= str(start_date))
+    if end_date:
+        filters.append(ds.field('date') <= str(end_date))
+    if retailers:
+        filters.append(ds.field('retailer').isin(list(retailers)))
+    for expression in filters:
+        condition = expression if condition is None else condition & expression
+    
+    return dataset.to_table(columns=columns, filter=condition)
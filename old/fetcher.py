@@ -0,0 +1,338 @@
+import codecs
+import importlib.util
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from html.parser import HTMLParser
+
+import requests
+
+# httpx (with the http2 extra) is only needed for the HTTP/2 transport
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Most we read from a page of each type; anything past the cap is dropped
+PAGE_BYTE_LIMITS = {
+    'search': 2 * 1024 * 1024,  # Google / Bing results
+    'retailer': 1536 * 1024,  # Retailer search results
+    'marketplace': 3 * 1024 * 1024,  # eBay / Amazon / Etsy search results
+    'product': 1024 * 1024,  # Single product pages
+    'category': 2 * 1024 * 1024,  # Retailer category listings crawled in catalog mode
+    'api': 512 * 1024,  # Shopify / WooCommerce JSON search
+}
+CHUNK_SIZE = 16 * 1024
+
+# Connection-level headers that are not allowed on HTTP/2 requests
+HOP_BY_HOP_HEADERS = ('connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade')
+
+def accepted_encodings():
+    """Accept-Encoding value listing the compressions the installed decoders can handle"""
+    encodings = ['gzip', 'deflate']
+    if importlib.util.find_spec('brotli') or importlib.util.find_spec('brotlicffi'):
+        encodings.insert(0, 'br')
+    if importlib.util.find_spec('zstandard'):
+        encodings.insert(0, 'zstd')
+    return ', '.join(encodings)
+
+_SIMPLE_SELECTOR_PATTERN = re.compile(r'^([a-zA-Z][\w-]*|\*)?((?:\.[\w-]+|\[[^\]]+\])*)$')
+_CLASS_PATTERN = re.compile(r'\.([\w-]+)')
+_ATTRIBUTE_SELECTOR_PATTERN = re.compile(r'\[\s*([\w-]+)\s*(?:=\s*(\'[^\']*\'|"[^"]*"|[^\]\s]*)\s*)?\]')
+
+class SimpleSelector:
+    """A CSS compound selector without combinators: tag, classes and [attr] / [attr=value] tests"""
+    
+    def __init__(self, tag, classes, attributes):
+        self.tag = tag
+        self.classes = classes
+        self.attributes = attributes  # attribute -> required value, or None for presence only
+    
+    def matches(self, tag, attrs):
+        """Check a start tag as reported by HTMLParser"""
+        if self.tag and tag != self.tag:
+            return False
+        attrs = dict(attrs)
+        if self.classes and not self.classes.issubset((attrs.get('class') or '').split()):
+            return False
+        for name, value in self.attributes.items():
+            if name not in attrs or (value is not None and attrs[name] != value):
+                return False
+        return True
+
+@lru_cache(maxsize=256)
+def compile_selector(selector):
+    """
+    Turn a CSS selector into SimpleSelectors that can be checked tag by tag while streaming
+    
+    Args:
+        selector: CSS selector, optionally a comma separated list
+    
+    Returns:
+        List of SimpleSelector, or None if any part uses combinators or pseudo-classes
+        (cached, so the same selector is only compiled once)
+    """
+    compiled = []
+    for part in selector.split(','):
+        match = _SIMPLE_SELECTOR_PATTERN.match(part.strip())
+        if not match:
+            return None
+        
+        tag, rest = match.group(1), match.group(2)
+        attributes = {}
+        for name, value in _ATTRIBUTE_SELECTOR_PATTERN.findall(rest):
+            attributes[name.lower()] = value.strip('\'"') if value else None
+        classes = set(_CLASS_PATTERN.findall(_ATTRIBUTE_SELECTOR_PATTERN.sub('', rest)))
+        compiled.append(SimpleSelector(None if tag in (None, '*') else tag.lower(), classes, attributes))
+    return compiled
+
+class EarlyStopParser(HTMLParser):
+    """
+    Incremental parser that watches a page as it streams in and says when enough has been read
+    
+    Stops once more than node_count nodes match the selector (so the first node_count
+    are complete), or, when watching for structured data, once a JSON-LD block with
+    a price, an itemprop="price" element or an og:price / product:price meta tag has been seen.
+    An itemprop="price" element that keeps its price in its text (rather than a
+    content attribute) only counts once its end tag has been read.
+    """
+    
+    def __init__(self, selectors=None, node_count=0, structured=False):
+        super().__init__()
+        self.selectors = selectors or []
+        self.node_count = node_count
+        self.structured = structured
+        self.matched = 0
+        self.done = False
+        self.reason = None
+        self._json_ld = None  # Text of the JSON-LD block being read
+        self._price_tag = None  # Tag of the itemprop="price" element being read, and how deeply it is nested
+        self._price_depth = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        
+        if self.selectors and any(selector.matches(tag, attrs) for selector in self.selectors):
+            self.matched += 1
+            if self.matched > self.node_count:
+                self._stop(f"{self.node_count} product nodes")
+                return
+        
+        if self.structured:
+            if tag == self._price_tag:
+                self._price_depth += 1
+                return
+            attributes = dict(attrs)
+            if tag == 'script' and (attributes.get('type') or '').lower() == 'application/ld+json':
+                self._json_ld = []
+            elif attributes.get('itemprop') == 'price' and self._price_tag is None:
+                if tag == 'meta' or attributes.get('content'):
+                    self._stop("microdata price")
+                else:
+                    # The price is the element's text, which has not been fed yet
+                    self._price_tag = tag
+                    self._price_depth = 1
+            elif tag == 'meta' and (attributes.get('property') or '') in ('og:price:amount', 'product:price:amount'):
+                self._stop("OpenGraph price")
+    
+    def handle_data(self, data):
+        if self._json_ld is not None:
+            self._json_ld.append(data)
+    
+    def handle_endtag(self, tag):
+        if tag == self._price_tag:
+            self._price_depth -= 1
+            if self._price_depth == 0:
+                self._price_tag = None
+                self._stop("microdata price")
+        elif tag == 'script' and self._json_ld is not None:
+            block = ''.join(self._json_ld)
+            self._json_ld = None
+            if '"offers"' in block and '"price' in block:
+                self._stop("JSON-LD offer")
+    
+    def _stop(self, reason):
+        self.done = True
+        self.reason = reason
+
+class FetchedPage:
+    """Body of a streamed response, possibly cut short"""
+    
+    def __init__(self, url, status_code, content, encoding, stopped_early=None, truncated=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content  # Raw bytes read
+        self.encoding = encoding
+        self.stopped_early = stopped_early  # Why reading stopped before the end, if it did
+        self.truncated = truncated  # Hit the byte cap for the page type
+    
+    @property
+    def text(self):
+        """Decoded body"""
+        return self.content.decode(self.encoding, errors='replace')
+
+class PageFetcher:
+    """
+    Streaming HTTP fetches with early termination and per page type byte caps
+    
+    Pages are read in CHUNK_SIZE pieces and fed to an EarlyStopParser; reading stops
+    once the parser has seen what the caller needs (enough product nodes or a
+    structured offer) or the page type's byte cap is reached.
+    
+    By default requests go through HTTP/1.1 requests sessions, one per thread
+    (sessions keep cookies and are not thread-safe) on one shared connection
+    pool, so connections opened by warm-up are reused by every thread. A
+    thread's session goes away with the thread; the sockets stay in the
+    shared pool. Small batches of concurrent fetches run on the fetcher's own
+    long-lived thread pool (see map), not on a pool per call. With
+    http2=True (and httpx[http2] installed) they go through an httpx client
+    instead, which multiplexes concurrent requests to the same host over one
+    connection.
+    """
+    
+    def __init__(self, logger=None, limits=None, http2=False, max_connections=20):
+        self.logger = logger or (lambda msg: None)
+        self.limits = dict(PAGE_BYTE_LIMITS, **(limits or {}))
+        self.http2 = http2 and httpx is not None
+        if http2 and httpx is None:
+            self.logger("HTTP/2 needs httpx[http2] (pip install httpx[http2]), using HTTP/1.1")
+        
+        encoding_header = {'Accept-Encoding': accepted_encodings()}
+        self.lock = threading.Lock()
+        if self.http2:
+            self.client = httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                headers=encoding_header,
+                limits=httpx.Limits(max_connections=max_connections)
+            )
+        else:
+            self.encoding_header = encoding_header
+            # Keep a pool per known host so connections opened by warm-up are not evicted
+            self.adapter = requests.adapters.HTTPAdapter(pool_connections=64, pool_maxsize=max_connections)
+            self.local = threading.local()  # Holds the thread's session; dropped when the thread exits
+        self.pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch")
+        self.pages = 0
+        self.bytes_read = 0
+        self.stopped_early = 0
+        self.truncated = 0
+    
+    @property
+    def session(self):
+        """The calling thread's requests session, created on first use"""
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.encoding_header)
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self.local.session = session
+        return session
+    
+    def map(self, function, items):
+        """function(item) for every item, run concurrently on the fetcher's thread pool; results in order"""
+        return list(self.pool.map(function, items))
+    
+    def fetch(self, url, page_type='retailer', headers=None, timeout=10, selector=None, node_count=0,
+              structured=False):
+        """
+        Fetch a page, reading only as much of it as needed
+        
+        Args:
+            url: Page URL
+            page_type: Key of PAGE_BYTE_LIMITS
+            headers: Request headers
+            timeout: Request timeout in seconds
+            selector: Product node selector to watch for (only simple selectors can stop early)
+            node_count: Stop after this many complete product nodes
+            structured: Stop once a structured-data price has been read
+        
+        Returns:
+            FetchedPage
+        """
+        limit = self.limits.get(page_type, PAGE_BYTE_LIMITS['retailer'])
+        selectors = compile_selector(selector) if selector and node_count else None
+        parser = EarlyStopParser(selectors, node_count, structured) if (selectors or structured) else None
+        
+        if self.http2:
+            headers = {k: v for k, v in (headers or {}).items() if k.lower() not in HOP_BY_HOP_HEADERS}
+            with self.client.stream('GET', url, headers=headers, timeout=timeout) as response:
+                status_code = response.status_code
+                encoding = response.encoding or 'utf-8'
+                chunks, size, stopped_early, truncated = self._read(response.iter_bytes(CHUNK_SIZE),
+                                                                    parser, encoding, limit)
+        else:
+            response = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+            try:
+                status_code = response.status_code
+                encoding = response.encoding or 'utf-8'
+                chunks, size, stopped_early, truncated = self._read(response.iter_content(CHUNK_SIZE),
+                                                                    parser, encoding, limit)
+            finally:
+                response.close()
+        
+        with self.lock:
+            self.pages += 1
+            self.bytes_read += size
+            self.stopped_early += bool(stopped_early)
+            self.truncated += truncated
+        if truncated:
+            self.logger(f"Stopped reading {url} at the {limit // 1024} KB cap for {page_type} pages")
+        
+        return FetchedPage(url, status_code, b''.join(chunks), encoding, stopped_early, truncated)
+    
+    def head(self, url, headers=None, timeout=10):
+        """
+        Send a HEAD request, leaving the connection in the pool
+        
+        Returns:
+            Seconds until the response headers arrived
+        """
+        start = time.perf_counter()
+        if self.http2:
+            headers = {k: v for k, v in (headers or {}).items() if k.lower() not in HOP_BY_HOP_HEADERS}
+            self.client.head(url, headers=headers, timeout=timeout)
+        else:
+            self.session.head(url, headers=headers, timeout=timeout)
+        return time.perf_counter() - start
+    
+    def _read(self, body, parser, encoding, limit):
+        """
+        Read decoded body chunks until the parser is satisfied or the byte cap is hit
+        
+        Returns:
+            Tuple of (chunks, bytes read, early stop reason or None, whether the cap was hit)
+        """
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace') if parser else None
+        chunks = []
+        size = 0
+        
+        for chunk in body:
+            chunks.append(chunk)
+            size += len(chunk)
+            if parser:
+                parser.feed(decoder.decode(chunk))
+                if parser.done:
+                    return chunks, size, parser.reason, False
+            if size >= limit:
+                return chunks, size, None, True
+        
+        return chunks, size, None, False
+    
+    def close(self):
+        """Close pooled connections and the fetch threads"""
+        self.pool.shutdown(wait=False)
+        if self.http2:
+            self.client.close()
+        else:
+            # Every thread's session is mounted on this adapter, so this closes all their connections
+            self.adapter.close()
+    
+    def describe(self):
+        """One-line summary for the log"""
+        protocol = 'HTTP/2' if self.http2 else 'HTTP/1.1'
+        return (f"Fetched {self.pages} pages over {protocol} ({self.bytes_read / 1024 / 1024:.1f} MB), "
+                f"{self.stopped_early} stopped early, {self.truncated} cut at the size cap")
@@ -0,0 +1,184 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+from fetcher import compile_selector
+from models import SearchResult
+from prices import Price
+
+BODY_TAG = re.compile(rb'<body', re.IGNORECASE)
+
+# Elements that never have an end tag, so they don't open a level of nesting
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+class FragmentExtractor(HTMLParser):
+    """Collects the markup of every element matching a selector (tags, attributes and text), and nothing else"""
+    
+    def __init__(self, selectors):
+        super().__init__()
+        self.selectors = selectors
+        self.depth = 0  # Open elements inside the current match
+        self.parts = []
+        self.matched = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if not self.depth and not any(selector.matches(tag, attrs) for selector in self.selectors):
+            return
+        if not self.depth:
+            self.matched += 1
+        self.parts.append(f"<{tag}{attrs}>")
+        if tag not in VOID_ELEMENTS:
+            self.depth += 1
+    
+    def handle_startendtag(self, tag, attrs):
+        if self.depth or any(selector.matches(tag, attrs) for selector in self.selectors):
+            self.matched += not self.depth
+            self.parts.append(f"<{tag}{attrs}/>")
+    
+    def handle_data(self, data):
+        if self.depth:
+            self.parts.append(data)
+    
+    def handle_endtag(self, tag):
+        if self.depth and tag not in VOID_ELEMENTS:
+            self.depth -= 1
+            self.parts.append(f"</{tag}>")
+
+class FragmentCache:
+    """
+    Remembers what was extracted from a fetched page, keyed by (URL, selector)
+    
+    The fingerprint is a BLAKE2b hash of the product nodes the selector
+    matches (their tags, attributes and text), so ads, timestamps and
+    per-request tokens elsewhere on the page don't change it. Finding them
+    takes one pass of the standard library's HTMLParser, well short of a
+    BeautifulSoup parse plus extraction. Selectors the streaming matcher
+    can't handle (see fetcher.compile_selector), and pages where the selector
+    matches nothing, are hashed from <body> on instead. When a refetched page
+    has the same fingerprint for the same URL and selector, the stored
+    results are reused and neither BeautifulSoup nor extraction runs.
+    
+    Given a PriceHistoryStore, fingerprints and results are also kept in its
+    database, so they carry over from one run to the next. Lookups and
+    updates take a lock, so one cache can be shared by several parse threads.
+    """
+    
+    def __init__(self, store=None, max_entries=5000):
+        """
+        Args:
+            store: Optional PriceHistoryStore whose database keeps the fingerprints between runs
+            max_entries: Most fragments remembered; the least recently used are dropped
+        """
+        self.store = store
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (url, selector key) -> (fingerprint, results)
+        self.hits = 0
+        self.misses = 0
+        self.pages_skipped = 0  # Pages neither parsed nor extracted
+        self.bytes_hashed = 0
+        if store is not None:
+            for url, selector, fingerprint, fields in reversed(store.load_fragments(max_entries)):
+                self.entries[(url, selector)] = (fingerprint, [self._from_fields(f) for f in fields])
+    
+    def fingerprint(self, page, selector=None):
+        """
+        Hash the part of a page that results are extracted from
+        
+        Args:
+            page: The page's HTML, as raw bytes or decoded text
+            selector: CSS selector of the product nodes (without one, the page is hashed from <body> on)
+        """
+        data = None
+        selectors = compile_selector(selector) if selector else None
+        if selectors:
+            extractor = FragmentExtractor(selectors)
+            extractor.feed(page.decode('utf-8', errors='replace') if isinstance(page, bytes) else page)
+            if extractor.matched:
+                data = ''.join(extractor.parts).encode()
+        if data is None:
+            data = page.encode() if isinstance(page, str) else page
+            body = BODY_TAG.search(data)
+            data = memoryview(data)[body.start() if body else 0:]
+        with self.lock:
+            self.bytes_hashed += len(data)
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    
+    def get(self, url, selector, fingerprint):
+        """
+        Look up stored results for a page
+        
+        Args:
+            url: Page URL
+            selector: CSS selector the products are matched with (or a tuple of it
+                and anything else that changes what is extracted)
+            fingerprint: Fingerprint of the page as fetched now
+        
+        Returns:
+            Copies of the stored SearchResults, or None if the page is new or changed
+        """
+        key = (url, repr(selector))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+        
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.pages_skipped += 1
+            results = entry[1]
+        return [result.copy() for result in results]
+    
+    def put(self, url, selector, fingerprint, results):
+        """Store what was extracted from a page (an empty list is stored too)"""
+        key = (url, repr(selector))
+        results = list(results)
+        with self.lock:
+            self.entries[key] = (fingerprint, results)
+            self.entries.move_to_end(key)
+            evicted = []
+            while len(self.entries) > self.max_entries:
+                evicted.append(self.entries.popitem(last=False)[0])
+        
+        if self.store is not None:
+            self.store.save_fragment(key[0], key[1], fingerprint, [self._to_fields(result) for result in results], evicted)
+    
+    @staticmethod
+    def _to_fields(result):
+        """A SearchResult as JSON-friendly fields, with the price as integer cents and currency"""
+        return {
+            'plant_name': result.plant_name,
+            'price_cents': result.price_cents,
+            'currency': result.currency,
+            'price_text': result._price_text,
+            'source': result._source_text,
+            'source_type': result.source_type,
+            'relevance_score': result.relevance_score,
+            'retailer': result.retailer,
+            'title': result.title,
+            'url': result.url,
+            'note': result.note
+        }
+    
+    @staticmethod
+    def _from_fields(fields):
+        """Rebuild a SearchResult stored by _to_fields"""
+        fields = dict(fields)
+        cents, currency, text = fields.pop('price_cents', None), fields.pop('currency', None), fields.pop('price_text', None)
+        if cents is not None:
+            fields['price'] = Price(cents, currency, raw=text)
+        elif 'price' not in fields:  # Rows written before prices were stored as cents keep the display text
+            fields['price'] = text
+        return SearchResult(**fields)
+    
+    def describe(self):
+        """One-line summary for the log"""
+        lookups = self.hits + self.misses
+        if not lookups:
+            return "Fragment cache: no lookups"
+        return (f"Fragment cache: {self.hits}/{lookups} pages unchanged, "
+                f"skipped parsing {self.pages_skipped} pages "
+                f"({self.bytes_hashed / 1024:.0f} KB hashed)")
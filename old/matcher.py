@@ -0,0 +1,188 @@
+import re
+from functools import lru_cache
+
+from utils import normalize_plant_name
+
+# Words shorter than this are ignored (e.g. "in", "of", "x"), unless a plant name
+# has no longer words (e.g. "ZZ")
+MIN_WORD_LENGTH = 3
+
+# Weighting between whole-word matches and character trigram overlap
+TOKEN_WEIGHT = 0.7
+TRIGRAM_WEIGHT = 0.3
+
+# Minimum trigram similarity for a misspelled word to earn partial credit
+FUZZY_WORD_THRESHOLD = 0.5
+
+# Score thresholds used by the parsers
+RELATED_SCORE = 0.3  # Some of the plant name appears
+PARTIAL_MATCH_SCORE = 0.5  # Roughly half of the plant words match
+FULL_MATCH_SCORE = 0.75  # All plant words match, allowing for small typos
+
+def stem_word(word):
+    """Very light suffix stripping so "succulents"/"succulent" and "daisies"/"daisy" match"""
+    if len(word) > 4:
+        if word.endswith('ies'):
+            return word[:-3] + 'y'
+        if word.endswith('es') and not word.endswith('ses'):
+            return word[:-2]
+        if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+            return word[:-1]
+    return word
+
+def tokenize(text, min_length=MIN_WORD_LENGTH):
+    """Normalize text and split it into stemmed words of at least min_length characters"""
+    words = re.findall(r'[a-z0-9]+', normalize_plant_name(text))
+    return [stem_word(word) for word in words if len(word) >= min_length]
+
+def word_trigrams(word):
+    """Character trigrams of a single word, padded so word boundaries count"""
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def text_trigrams(tokens):
+    """Union of the trigrams of every token"""
+    trigrams = set()
+    for token in tokens:
+        trigrams |= word_trigrams(token)
+    return trigrams
+
+class PlantNameMatcher:
+    """
+    Plant name prepared once for scoring many candidate titles
+    
+    Scores are between 0 and 1: the share of plant words found in the title
+    (with partial credit for near-misses such as typos) blended with how many
+    of the plant name's character trigrams appear in the title.
+    """
+    
+    def __init__(self, plant_name):
+        self.plant_name = plant_name
+        self.stems = list(dict.fromkeys(tokenize(plant_name)))
+        self.min_length = MIN_WORD_LENGTH
+        if not self.stems:
+            # Only short words (e.g. "ZZ"): match on those, and keep short words in titles too
+            self.min_length = 1
+            self.stems = list(dict.fromkeys(tokenize(plant_name, self.min_length)))
+        self.stem_trigrams = {stem: word_trigrams(stem) for stem in self.stems}
+        self.trigrams = text_trigrams(self.stems)
+    
+    def score(self, text):
+        """Score a single product title or text block"""
+        if not self.stems or not text:
+            return 0.0
+        return self.score_tokens(tokenize(text, self.min_length))
+    
+    def score_tokens(self, tokens):
+        """Score an already tokenized title (see tokenize; words shorter than min_length are skipped)"""
+        if self.min_length > 1:
+            tokens = [token for token in tokens if len(token) >= self.min_length]
+        if not self.stems or not tokens:
+            return 0.0
+        
+        token_set = set(tokens)
+        token_credit = 0.0
+        fuzzy_candidates = None
+        
+        for stem in self.stems:
+            if stem in token_set:
+                token_credit += 1
+                continue
+            
+            # No exact match, look for a close spelling among the title words
+            if fuzzy_candidates is None:
+                fuzzy_candidates = [word_trigrams(token) for token in token_set]
+            stem_grams = self.stem_trigrams[stem]
+            best = 0.0
+            for grams in fuzzy_candidates:
+                similarity = 2 * len(stem_grams & grams) / (len(stem_grams) + len(grams))
+                if similarity > best:
+                    best = similarity
+            if best >= FUZZY_WORD_THRESHOLD:
+                token_credit += best
+        
+        token_score = token_credit / len(self.stems)
+        trigram_score = len(self.trigrams & text_trigrams(token_set)) / len(self.trigrams)
+        
+        return TOKEN_WEIGHT * token_score + TRIGRAM_WEIGHT * trigram_score
+    
+    def rank(self, texts, min_score=0.0):
+        """
+        Score many candidates at once
+        
+        Args:
+            texts: List of titles or text blocks
+            min_score: Drop candidates scoring below this
+        
+        Returns:
+            List of (score, index) tuples, best first
+        """
+        scored = []
+        for index, text in enumerate(texts):
+            score = self.score(text)
+            if score >= min_score:
+                scored.append((score, index))
+        
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored
+
+class TrigramIndex:
+    """Trigram index over stored product titles for fast fuzzy candidate lookup"""
+    
+    def __init__(self):
+        self.postings = {}  # trigram -> set of document ids
+        self.documents = {}  # document id -> title tokens
+    
+    def add(self, doc_id, title):
+        """Index a title under the given document id"""
+        # Short words are kept so plant names made only of them can be found
+        tokens = tokenize(title, min_length=1)
+        self.documents[doc_id] = tokens
+        for trigram in text_trigrams(tokens):
+            self.postings.setdefault(trigram, set()).add(doc_id)
+    
+    def remove(self, doc_id):
+        """Drop a document from the index"""
+        tokens = self.documents.pop(doc_id, None)
+        if tokens is None:
+            return
+        for trigram in text_trigrams(tokens):
+            doc_ids = self.postings.get(trigram)
+            if doc_ids is not None:
+                doc_ids.discard(doc_id)
+                if not doc_ids:
+                    del self.postings[trigram]
+    
+    def candidates(self, matcher, min_overlap=0.5):
+        """Document ids sharing at least min_overlap of the plant name's trigrams"""
+        if not matcher.trigrams:
+            return []
+        
+        counts = {}
+        for trigram in matcher.trigrams:
+            for doc_id in self.postings.get(trigram, ()):
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        
+        required = len(matcher.trigrams) * min_overlap
+        return [doc_id for doc_id, count in counts.items() if count >= required]
+    
+    def search(self, matcher, min_score=0.0, limit=None):
+        """
+        Rank indexed titles against a plant name
+        
+        Returns:
+            List of (score, doc_id) tuples, best first
+        """
+        scored = []
+        for doc_id in self.candidates(matcher):
+            score = matcher.score_tokens(self.documents[doc_id])
+            if score >= min_score:
+                scored.append((score, doc_id))
+        
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:limit] if limit else scored
+
+@lru_cache(maxsize=2048)
+def get_matcher(plant_name):
+    """Return a cached matcher so a plant name is only tokenized once per run"""
+    return PlantNameMatcher(plant_name)
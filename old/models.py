@@ -1,32 +1,109 @@
 import datetime
+import random
+import re
+import sys
+import time
+import urllib.parse
+
+from prices import Price, parse_price, format_cents
+from registry import get_registry
+
+def _intern(value):
+    """Intern short, frequently repeated strings (plant names, retailers, source types)"""
+    return sys.intern(value) if isinstance(value, str) else value
 
 class SearchResult:
-    """Represents a search result for a plant price"""
-    def __init__(self, plant_name, price, source, source_type=None, relevance_score=0):
-        self.plant_name = plant_name
-        self.price = self._standardize_price(price)
-        self.source = source
+    """
+    Represents a search result for a plant price
+    
+    Uses __slots__ and keeps the retailer, product title and URL as separate
+    fields; the display string is only built when `source` is read. Free-form
+    source text is kept as-is for results that have no retailer or URL
+    (e.g. featured snippets or "not found" markers).
+    
+    __slots__ is not a memory saving here: the title and URL strings make up
+    most of a result, so it is roughly 3% smaller than the old plain object
+    for the same text, and about even while also keeping the full title and
+    URL (see run_memory_benchmark in benchmarks.py).
+    """
+    __slots__ = (
+        'plant_name', 'price_cents', 'currency', '_price_text', 'retailer', 'title', 'url', 'note',
+        '_source_text', 'source_type', 'relevance_score', 'created_at'
+    )
+    
+    def __init__(self, plant_name, price, source=None, source_type=None, relevance_score=0,
+                 retailer=None, title=None, url=None, note=None):
+        self.plant_name = _intern(plant_name)
+        # Parsed once into integer cents; `price` is formatted from them on demand
+        parsed = parse_price(price)
+        if parsed:
+            self.price_cents = parsed.cents
+            self.currency = parsed.currency
+            self._price_text = parsed.raw  # Raw text, only if it differs from the display form
+        else:
+            self.price_cents = None
+            self.currency = None
+            self._price_text = _intern("N/A" if price is None else str(price).strip())  # Status text, e.g. "Not found"
+        self.retailer = _intern(retailer)
+        self.title = title
+        self.url = url
+        self.note = note  # Extra detail shown in brackets, e.g. where the price was found
+        self._source_text = None if (retailer or url) else (source or "Unknown")
         # New fields to better track result types
-        self.source_type = source_type or self._determine_source_type(source)
+        self.source_type = _intern(source_type or self._determine_source_type(self.source))
         self.relevance_score = relevance_score
-        self.timestamp = datetime.datetime.now()  # Using datetime instead of pd.Timestamp
+        self.created_at = time.time()  # Unix time the result was created
+    
+    @property
+    def price(self):
+        """Display price such as "$12.95", or the status text (e.g. "Not found") if there is no price"""
+        if self.price_cents is None:
+            return self._price_text
+        return format_cents(self.price_cents, self.currency)
+    
+    @property
+    def price_value(self):
+        """The price as a Price, or None if there is no price"""
+        if self.price_cents is None:
+            return None
+        return Price(self.price_cents, self.currency, raw=self._price_text)
+    
+    @property
+    def source(self):
+        """Human readable source, e.g. "Bunnings - Echeveria Elegans... - https://..." """
+        if self._source_text is not None:
+            return self._source_text
         
-    def _standardize_price(self, price):
-        """Standardize price format"""
-        if isinstance(price, str):
-            # Remove any extra spaces
-            price = price.strip()
-            
-            # Make sure price has $ symbol
-            if price != "N/A" and price != "Not found" and price != "Error" and not price.startswith('$'):
-                price = '$' + price
-                
-            # Add .00 if it's a whole dollar amount without cents
-            if price.startswith('$') and price[1:].isdigit():
-                price = price + '.00'
+        parts = [self.retailer] if self.retailer else []
+        if self.title:
+            parts.append(f"{self.title[:30]}...")
+        if self.url:
+            parts.append(self.url)
+        source = " - ".join(parts)
         
-        return price
+        if self.note:
+            source += f" ({self.note})"
+        return source
+    
+    @property
+    def timestamp(self):
+        """Creation time as a datetime"""
+        return datetime.datetime.fromtimestamp(self.created_at)
     
+    def copy(self):
+        """A new result with the same fields and a fresh timestamp"""
+        return SearchResult(
+            plant_name=self.plant_name,
+            price=self.price_value or self._price_text,
+            source=self._source_text,
+            source_type=self.source_type,
+            relevance_score=self.relevance_score,
+            retailer=self.retailer,
+            title=self.title,
+            url=self.url,
+            note=self.note
+        )
+        
     def _determine_source_type(self, source):
         """Categorize the source based on its text content"""
         source_lower = source.lower()
@@ -51,116 +128,250 @@ class SearchResult:
         return {
             "plant_name": self.plant_name,
             "price": self.price,
+            "price_cents": self.price_cents,
+            "currency": self.currency,
             "source": self.source,
-            "source_type": self.source_type
+            "source_type": self.source_type,
+            "retailer": self.retailer,
+            "title": self.title,
+            "url": self.url
         }
     
     def __str__(self):
         """String representation for debugging"""
         return f"{self.plant_name} - {self.price} from {self.source} ({self.source_type})"
         
+class PriceAggregate:
+    """
+    Running price statistics updated one result at a time: count, min, max and
+    mean in cents, plus an approximate median from a small fixed-size reservoir
+    sample so memory stays constant however many prices arrive.
+    """
+    def __init__(self, sample_size=64):
+        self.count = 0  # All results, priced or not
+        self.priced = 0  # Results that had a price
+        self.min_cents = None
+        self.max_cents = None
+        self.total_cents = 0
+        self.sample_size = sample_size
+        self.sample = []
+        self._rng = random.Random(0)
+    
+    def add_result(self, result):
+        """Fold a SearchResult into the aggregate"""
+        self.count += 1
+        if result.price_cents is not None:
+            self.add_price(result.price_cents)
+    
+    def add_price(self, cents):
+        """Fold a single price (in cents) into the aggregate"""
+        self.priced += 1
+        self.total_cents += cents
+        if self.min_cents is None or cents < self.min_cents:
+            self.min_cents = cents
+        if self.max_cents is None or cents > self.max_cents:
+            self.max_cents = cents
+        
+        # Reservoir sampling keeps a uniform sample of every price seen so far
+        if len(self.sample) < self.sample_size:
+            self.sample.append(cents)
+        else:
+            slot = self._rng.randrange(self.priced)
+            if slot < self.sample_size:
+                self.sample[slot] = cents
+    
+    @property
+    def mean_cents(self):
+        return round(self.total_cents / self.priced) if self.priced else None
+    
+    @property
+    def median_cents(self):
+        """Median of the sample (exact until more than sample_size prices have been seen)"""
+        if not self.sample:
+            return None
+        ordered = sorted(self.sample)
+        middle = len(ordered) // 2
+        if len(ordered) % 2:
+            return ordered[middle]
+        return round((ordered[middle - 1] + ordered[middle]) / 2)
+    
+    def to_dict(self):
+        """Formatted statistics ("N/A" where there are no prices)"""
+        def fmt(cents):
+            return format_cents(cents) if cents is not None else "N/A"
+        
+        return {
+            "count": self.count,
+            "priced": self.priced,
+            "min": fmt(self.min_cents),
+            "max": fmt(self.max_cents),
+            "avg": fmt(self.mean_cents),
+            "median": fmt(self.median_cents)
+        }
+
+class RunSummary:
+    """Price aggregates for a whole run, kept per plant, per retailer and per source type"""
+    def __init__(self):
+        self.overall = PriceAggregate()
+        self.by_plant = {}
+        self.by_retailer = {}
+        self.by_source_type = {}
+    
+    def add_result(self, result):
+        """Fold a SearchResult into every aggregate it belongs to"""
+        self.overall.add_result(result)
+        for groups, key in (
+            (self.by_plant, result.plant_name),
+            (self.by_retailer, result.retailer or "Other"),
+            (self.by_source_type, result.source_type),
+        ):
+            if key not in groups:
+                groups[key] = PriceAggregate()
+            groups[key].add_result(result)
+    
+    def describe(self):
+        """One-line summary for the status area"""
+        stats = self.overall.to_dict()
+        return (f"{stats['priced']} prices for {len(self.by_plant)} plants - "
+                f"min {stats['min']}, median {stats['median']}, avg {stats['avg']}, max {stats['max']}")
+    
+    def to_rows(self):
+        """Flatten all aggregates into rows for export"""
+        rows = [dict(scope="all", key="all", **self.overall.to_dict())]
+        for scope, groups in (
+            ("plant", self.by_plant),
+            ("retailer", self.by_retailer),
+            ("source_type", self.by_source_type),
+        ):
+            for key, aggregate in groups.items():
+                rows.append(dict(scope=scope, key=key, **aggregate.to_dict()))
+        return rows
+
+# Default prioritization for PlantPriceResults.get_top_results. Each step is
+# (bucket, limit): a limit of 1 only considers the first result in that bucket,
+# None keeps taking results from it until enough have been picked. Results from
+# a source that has already been picked are skipped.
+DEFAULT_RANKING_POLICY = (
+    ('retailer', 1),
+    ('search', 1),
+    ('priority_marketplace', 1),  # eBay / Amazon
+    ('specialty', None),
+    ('marketplace', None),
+    ('other', None),
+)
+
+# Marketplaces that get their own bucket ahead of the other marketplaces
+PRIORITY_MARKETPLACES = ('ebay', 'amazon')
+
+class ResultRanker:
+    """
+    Keeps a plant's results bucketed by category as they arrive so the top N
+    can be picked without rescanning every result; the last picks are cached
+    until the next result is added.
+    """
+    def __init__(self, policy=None):
+        self.policy = policy or DEFAULT_RANKING_POLICY
+        self.buckets = {}  # bucket name -> results in arrival order
+        self._top_cache = {}  # count -> list of results
+        
+    def bucket_for(self, result):
+        """Work out which ranking bucket a result belongs in"""
+        if result.source_type == 'marketplace':
+            source_lower = result.source.lower()
+            if any(name in source_lower for name in PRIORITY_MARKETPLACES):
+                return 'priority_marketplace'
+        return result.source_type
+    
+    def add(self, result):
+        """Register a newly added result"""
+        self.buckets.setdefault(self.bucket_for(result), []).append(result)
+        self._top_cache.clear()
+    
+    def top(self, results, count):
+        """
+        Pick the top results according to the policy
+        
+        Args:
+            results: All results in arrival order (used for the final fill-up)
+            count: Number of results wanted
+        """
+        cached = self._top_cache.get(count)
+        if cached is not None:
+            return cached
+        
+        # If we have fewer than requested results, return all of them
+        if len(results) <= count:
+            picked = list(results)
+            self._top_cache[count] = picked
+            return picked
+        
+        picked = []
+        picked_ids = set()
+        seen_sources = set()
+        
+        for bucket, limit in self.policy:
+            candidates = self.buckets.get(bucket)
+            if not candidates:
+                continue
+            if limit is not None:
+                candidates = candidates[:limit]
+            
+            for result in candidates:
+                if len(picked) >= count:
+                    break
+                source = result.source
+                if source in seen_sources:
+                    continue
+                picked.append(result)
+                picked_ids.add(id(result))
+                seen_sources.add(source)
+        
+        # If we still need more, add remaining results from any category
+        if len(picked) < count:
+            for result in results:
+                if id(result) not in picked_ids:
+                    picked.append(result)
+                    if len(picked) >= count:
+                        break
+        
+        self._top_cache[count] = picked
+        return picked
+
 class PlantPriceResults:
     """Stores multiple price results for a single plant"""
-    def __init__(self, plant_name):
+    def __init__(self, plant_name, ranking_policy=None):
         self.plant_name = plant_name
         self.results = []  # List of SearchResult objects
+        self.ranker = ResultRanker(ranking_policy)
+        self.aggregate = PriceAggregate()
         
     def add_result(self, result):
         """Add a search result to this plant's results"""
-        if isinstance(result, SearchResult):
-            self.results.append(result)
-        else:
-            # Convert dict to SearchResult if needed
-            source_type = result.get("source_type", None)
-            
-            # If source_type not provided, determine based on source
-            if not source_type and "source" in result:
-                source = result.get("source", "")
-                if any(retailer in source.lower() for retailer in ['bunnings', 'flower power', 'garden express']):
-                    source_type = 'retailer'
-                elif any(marketplace in source.lower() for marketplace in ['ebay', 'amazon', 'etsy']):
-                    source_type = 'marketplace'
-            
-            self.results.append(SearchResult(
+        if not isinstance(result, SearchResult):
+            # Convert dict to SearchResult if needed (source_type is derived from the source if missing)
+            result = SearchResult(
                 plant_name=result.get("plant_name", self.plant_name),
                 price=result.get("price", "N/A"),
                 source=result.get("source", "Unknown"),
-                source_type=source_type
-            ))
+                source_type=result.get("source_type"),
+                retailer=result.get("retailer"),
+                title=result.get("title"),
+                url=result.get("url")
+            )
+        
+        self.results.append(result)
+        self.ranker.add(result)
+        self.aggregate.add_result(result)
+        return result
             
     def get_top_results(self, count=3):
         """
-        Get the top N results with prioritization:
+        Get the top N results with prioritization (see DEFAULT_RANKING_POLICY):
         1. At least one retailer if available
         2. At least one general search result if available  
         3. At least one marketplace (specifically eBay/Amazon) if available
         """
-        # If we have fewer than requested results, return all of them
-        if len(self.results) <= count:
-            return self.results
-            
-        # Group results by source type
-        retailer_results = [r for r in self.results if r.source_type == 'retailer']
-        search_results = [r for r in self.results if r.source_type == 'search']
-        specialty_results = [r for r in self.results if r.source_type == 'specialty']
-        
-        # Specifically identify eBay and Amazon results
-        marketplace_results = []
-        for r in self.results:
-            if r.source_type == 'marketplace':
-                if 'ebay' in r.source.lower() or 'amazon' in r.source.lower():
-                    marketplace_results.append(r)
-        
-        # Other marketplace results
-        other_marketplace_results = [r for r in self.results if r.source_type == 'marketplace' 
-                                    and r not in marketplace_results]
-        
-        # Other results
-        other_results = [r for r in self.results if r.source_type == 'other']
-        
-        # Build prioritized results
-        prioritized_results = []
-        
-        # First, add a retailer result if available
-        if retailer_results:
-            prioritized_results.append(retailer_results[0])
-            
-        # Then, add a search result if available
-        if search_results:
-            # Don't add if it's from same source as a retailer we already added
-            if not any(r.source == search_results[0].source for r in prioritized_results):
-                prioritized_results.append(search_results[0])
-        
-        # Then, add an eBay or Amazon result if available
-        if marketplace_results:
-            # Don't add if it's from same source as what we already added
-            if not any(r.source == marketplace_results[0].source for r in prioritized_results):
-                prioritized_results.append(marketplace_results[0])
-        
-        # If we need more results, add from specialty sites
-        while len(prioritized_results) < count and specialty_results:
-            result = specialty_results.pop(0)
-            if not any(r.source == result.source for r in prioritized_results):
-                prioritized_results.append(result)
-        
-        # If we still need more, add from other marketplace results
-        while len(prioritized_results) < count and other_marketplace_results:
-            result = other_marketplace_results.pop(0)
-            if not any(r.source == result.source for r in prioritized_results):
-                prioritized_results.append(result)
-        
-        # If we still need more, add from other results
-        while len(prioritized_results) < count and other_results:
-            result = other_results.pop(0)
-            if not any(r.source == result.source for r in prioritized_results):
-                prioritized_results.append(result)
-        
-        # If we still need more, add remaining results from any category
-        remaining_results = [r for r in self.results if r not in prioritized_results]
-        while len(prioritized_results) < count and remaining_results:
-            prioritized_results.append(remaining_results.pop(0))
-            
-        return prioritized_results[:count]
+        return self.ranker.top(self.results, count)
     
     def to_dict(self):
         """Convert to dictionary with multiple prices and sources"""
@@ -195,54 +406,62 @@ class PlantPriceResults:
         return has_retailer and has_marketplace
     
     def get_stats(self):
-        """Get statistics about the prices found"""
-        if not self.results:
-            return {
-                "count": 0,
-                "min": "N/A",
-                "max": "N/A",
-                "avg": "N/A"
-            }
-            
-        # Extract numeric prices
-        numeric_prices = []
-        for result in self.results:
-            price = result.price
-            if isinstance(price, str) and price.startswith('$'):
-                try:
-                    # Remove $ and convert to float
-                    numeric_price = float(price.replace('$', '').replace(',', ''))
-                    numeric_prices.append(numeric_price)
-                except ValueError:
-                    continue
-        
-        if not numeric_prices:
-            return {
-                "count": len(self.results),
-                "min": "N/A",
-                "max": "N/A",
-                "avg": "N/A"
-            }
-            
+        """Get statistics about the prices found (kept up to date as results are added)"""
+        stats = self.aggregate.to_dict()
         return {
-            "count": len(self.results),
-            "min": f"${min(numeric_prices):.2f}",
-            "max": f"${max(numeric_prices):.2f}",
-            "avg": f"${sum(numeric_prices)/len(numeric_prices):.2f}"
+            "count": stats["count"],
+            "min": stats["min"],
+            "max": stats["max"],
+            "avg": stats["avg"]
         }
 
 class Retailer:
     """Represents a plant retailer website"""
-    def __init__(self, name, url_template, price_pattern, product_selector, alt_selectors=None):
+    def __init__(self, name, url_template, price_pattern, product_selector, alt_selectors=None,
+                 category_url_template=None, max_catalog_pages=20, platform=None, plan=None):
         self.name = name
         self.url_template = url_template
-        self.price_pattern = price_pattern
+        self.price_pattern = re.compile(price_pattern) if isinstance(price_pattern, str) else price_pattern
         self.product_selector = product_selector
         self.alt_selectors = alt_selectors or []
+        # Paged plant category listing used by catalog crawl mode
+        self.category_url_template = category_url_template
+        self.max_catalog_pages = max_catalog_pages
+        # Store platform ('shopify' / 'woocommerce') whose JSON search can replace the HTML page
+        self.platform = platform
+        # Compiled registry entry (SitePlan) with precompiled selectors and the site's rate limit
+        self.plan = plan
+    
+    @classmethod
+    def from_plan(cls, plan):
+        """Build a Retailer from a registry SitePlan"""
+        return cls(
+            name=plan.name,
+            url_template=plan.url_template,
+            price_pattern=plan.price_pattern,
+            product_selector=plan.product_selector,
+            alt_selectors=plan.alt_selectors,
+            category_url_template=plan.category_url_template,
+            max_catalog_pages=plan.max_catalog_pages,
+            platform=plan.platform,
+            plan=plan
+        )
         
     def get_search_url(self, plant_name):
         """Generate search URL for the given plant name"""
-        return self.url_template.format(plant_name=plant_name.replace(' ', '%20'))
+        if self.plan:
+            return self.plan.search_url(plant_name)
+        return self.url_template.format(plant_name=urllib.parse.quote(plant_name, safe=''))
+    
+    def select(self, node, selector):
+        """Select nodes, using the registry's precompiled selector when there is one"""
+        return self.plan.select(node, selector) if self.plan else node.select(selector)
+    
+    def get_category_url(self, page):
+        """Generate the URL of a plant category listing page (1-based)"""
+        if not self.category_url_template:
+            return None
+        return self.category_url_template.format(page=page)
     
     def __str__(self):
         """String representation for debugging"""
@@ -250,41 +469,5 @@ class Retailer:
 
 # List of default retailers to search
 def get_default_retailers():
-    return [
-        Retailer(
-            name="Bunnings",
-            url_template="https://www.bunnings.com.au/search/products?q={plant_name}&category=Plants",
-            price_pattern=r'\$\d+(?:\.\d{2})?',
-            product_selector="article.product",
-            alt_selectors=["div.product-list article", "div[data-product-card]"]
-        ),
-        Retailer(
-            name="Flower Power",
-            url_template="https://www.flowerpower.com.au/search?q={plant_name}",
-            price_pattern=r'\$\d+(?:\.\d{2})?',
-            product_selector="div.product-item-info",
-            alt_selectors=["li.product-item"]
-        ),
-        Retailer(
-            name="Garden Express",
-            url_template="https://www.gardenexpress.com.au/search/{plant_name}",
-            price_pattern=r'\$\d+(?:\.\d{2})?',
-            product_selector="div.product-item",
-            alt_selectors=["div.product-grid div"]
-        ),
-        # Added additional popular retailers
-        Retailer(
-            name="The Plant People",
-            url_template="https://www.theplantpeople.com.au/search?q={plant_name}",
-            price_pattern=r'\$\d+(?:\.\d{2})?',
-            product_selector="div.product",
-            alt_selectors=["div.product-grid-item"]
-        ),
-        Retailer(
-            name="Garden World",
-            url_template="https://www.gardenworld.com.au/?s={plant_name}&post_type=product",
-            price_pattern=r'\$\d+(?:\.\d{2})?',
-            product_selector="li.product",
-            alt_selectors=["ul.products li"]
-        )
-    ]
\ No newline at end of file
+    """Direct retailers from the site registry (retailers.json), highest priority first"""
+    return [Retailer.from_plan(plan) for plan in get_registry().stage('retailer')]
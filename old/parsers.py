@@ -1,16 +1,19 @@
 import re
-import json
-import requests
 from bs4 import BeautifulSoup
 from models import SearchResult
+from prices import PRICE_PATTERN, price_from_match
 from utils import is_relevant_result, get_request_headers
+from matcher import get_matcher, RELATED_SCORE
+from structured import extract_page_offer
+from fetcher import PageFetcher
 
 class GoogleParser:
     """Parser for Google search results"""
     
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, fetcher=None):
         self.logger = logger or (lambda msg: None)
-        self.price_pattern = r'\$\d{1,3}(?:,\d{3})*(?:\.\d{2})?'  # Match prices like $10, $10.99, $1,000
+        self.fetcher = fetcher or PageFetcher(logger=self.logger)
+        self.price_pattern = PRICE_PATTERN  # Match prices like $10, $10.99, $1,000
     
     def extract_prices_from_soup(self, soup, plant_name):
         """
@@ -46,8 +49,9 @@ class GoogleParser:
         if len(results) < 3:
             self.logger("Not enough results, checking product pages...")
             product_urls = self._find_product_urls(soup, 3 - len(results))
-            for url in product_urls:
-                page_results = self._scrape_product_page(url, plant_name)
+            # Fetch the pages concurrently (over one connection per host with the HTTP/2 fetcher)
+            pages = self.fetcher.map(lambda url: self._scrape_product_page(url, plant_name), product_urls)
+            for page_results in pages:
                 if page_results:
                     results.extend(page_results)
                     if len(results) >= 3:
@@ -114,10 +118,11 @@ class GoogleParser:
                     continue
                 
                 # Find price
-                price_match = re.search(self.price_pattern, div_text)
+                price_match = self.price_pattern.search(div_text)
                 if price_match:
                     # Get source URL
-                    source = "Google Shopping"
+                    retailer = "Google Shopping"
+                    url = None
                     link = div.select_one('a')
                     if link and link.has_attr('href'):
                         href = link['href']
@@ -128,15 +133,13 @@ class GoogleParser:
                                 # Extract domain for cleaner display
                                 domain_match = re.search(r'https?://(?:www\.)?([^/]+)', url)
                                 if domain_match:
-                                    domain = domain_match.group(1)
-                                    source = f"{domain} - {url}"
-                                else:
-                                    source = f"Shopping: {url}"
+                                    retailer = domain_match.group(1)
                     
                     results.append(SearchResult(
                         plant_name=plant_name,
-                        price=price_match.group(0),
-                        source=source
+                        price=price_from_match(price_match),
+                        retailer=retailer,
+                        url=url
                     ))
         
         return results
@@ -174,37 +177,40 @@ class GoogleParser:
                 # Find price in title (highest priority)
                 price_match = None
                 if title_text:
-                    price_match = re.search(self.price_pattern, title_text)
+                    price_match = self.price_pattern.search(title_text)
                 
                 # If no price in title, check meta description
                 if not price_match and meta_text:
-                    price_match = re.search(self.price_pattern, meta_text)
+                    price_match = self.price_pattern.search(meta_text)
                 
                 # If still no price, check full text
                 if not price_match:
-                    price_match = re.search(self.price_pattern, result.get_text())
+                    price_match = self.price_pattern.search(result.get_text())
                 
                 if price_match:
                     # Get source URL
-                    source = "Organic Result"
+                    retailer = "Organic Result"
+                    url = None
                     link = result.select_one('a')
                     if link and link.has_attr('href'):
-                        url = link['href']
-                        domain = re.search(r'https?://(?:www\.)?([^/]+)', url)
+                        domain = re.search(r'https?://(?:www\.)?([^/]+)', link['href'])
                         if domain:
-                            source = f"{domain.group(1)} - {url}"
+                            retailer = domain.group(1)
+                            url = link['href']
                     
                     # Note where the price was found for better debugging
-                    price_location = ""
+                    price_location = None
                     if price_match.group(0) in title_text:
-                        price_location = " (found in title)"
+                        price_location = "found in title"
                     elif meta_text and price_match.group(0) in meta_text:
-                        price_location = " (found in meta description)"
+                        price_location = "found in meta description"
                     
                     results.append(SearchResult(
                         plant_name=plant_name,
-                        price=price_match.group(0),
-                        source=source + price_location
+                        price=price_from_match(price_match),
+                        retailer=retailer,
+                        url=url,
+                        note=price_location
                     ))
         
         return results
@@ -231,7 +237,7 @@ class GoogleParser:
                     continue
                 
                 # Find all prices in the snippet
-                price_matches = re.finditer(self.price_pattern, snippet_text)
+                price_matches = self.price_pattern.finditer(snippet_text)
                 for price_match in price_matches:
                     # Try to find context for this price (nearby text)
                     price_pos = price_match.start()
@@ -241,7 +247,7 @@ class GoogleParser:
                     
                     results.append(SearchResult(
                         plant_name=plant_name,
-                        price=price_match.group(0),
+                        price=price_from_match(price_match),
                         source=f"Featured Snippet: {context}..."
                     ))
         
@@ -264,12 +270,12 @@ class GoogleParser:
             if tag and tag.has_attr('content'):
                 content = tag['content']
                 if is_relevant_result(plant_name, content):
-                    price_match = re.search(self.price_pattern, content)
+                    price_match = self.price_pattern.search(content)
                     if price_match:
                         tag_name = tag.get('name', tag.get('property', 'meta'))
                         results.append(SearchResult(
                             plant_name=plant_name,
-                            price=price_match.group(0),
+                            price=price_from_match(price_match),
                             source=f"Meta {tag_name}: {content[:50]}..."
                         ))
         
@@ -287,7 +293,7 @@ class GoogleParser:
             for meta in meta_elements:
                 meta_text = meta.get_text()
                 if is_relevant_result(plant_name, meta_text):
-                    price_match = re.search(self.price_pattern, meta_text)
+                    price_match = self.price_pattern.search(meta_text)
                     if price_match:
                         # Try to find the associated URL
                         parent = meta.parent
@@ -308,7 +314,7 @@ class GoogleParser:
                         
                         results.append(SearchResult(
                             plant_name=plant_name,
-                            price=price_match.group(0),
+                            price=price_from_match(price_match),
                             source=source
                         ))
         
@@ -318,9 +324,25 @@ class GoogleParser:
         """Scrape the product page directly for price information"""
         try:
             self.logger(f"Checking product page: {url}")
-            response = requests.get(url, headers=get_request_headers(), timeout=10)
+            # Stop reading as soon as a structured price has streamed in
+            response = self.fetcher.fetch(url, 'product', headers=get_request_headers(), timeout=10, structured=True)
             
             if response.status_code == 200:
+                domain = re.search(r'https?://(?:www\.)?([^/]+)', url)
+                domain_text = domain.group(1) if domain else "Product page"
+                
+                # Structured data (JSON-LD, microdata, OpenGraph) straight from the raw bytes
+                offer = extract_page_offer(response.content)
+                if offer:
+                    return [SearchResult(
+                        plant_name=plant_name,
+                        price=offer['price'],
+                        retailer=domain_text,
+                        title=offer['title'],
+                        url=url
+                    )]
+                
+                # No structured offer, fall back to scanning the page with CSS selectors
                 soup = BeautifulSoup(response.text, 'html.parser')
                 
                 # Common price selectors across e-commerce sites
@@ -341,7 +363,7 @@ class GoogleParser:
                         else:
                             price_text = price_element.get_text().strip()
                         
-                        price_match = re.search(self.price_pattern, price_text)
+                        price_match = self.price_pattern.search(price_text)
                         if price_match:
                             # Get the product title if possible
                             title = ""
@@ -352,51 +374,13 @@ class GoogleParser:
                                     title = title_elem.get_text().strip()
                                     break
                             
-                            if title:
-                                source = f"Product: {title[:30]}... - {url}"
-                            else:
-                                domain = re.search(r'https?://(?:www\.)?([^/]+)', url)
-                                domain_text = domain.group(1) if domain else "Product page"
-                                source = f"{domain_text} - {url}"
-                                
-                            return [SearchResult(
-                                plant_name=plant_name,
-                                price=price_match.group(0),
-                                source=source
-                            )]
-                
-                # Try JSON-LD data if available
-                json_ld = soup.find('script', type='application/ld+json')
-                if json_ld:
-                    try:
-                        data = json.loads(json_ld.string)
-                        if isinstance(data, list):
-                            data = data[0]
-                        
-                        # Try different possible paths for price
-                        price = None
-                        if 'offers' in data:
-                            if isinstance(data['offers'], dict) and 'price' in data['offers']:
-                                price = data['offers']['price']
-                            elif isinstance(data['offers'], list) and data['offers'] and 'price' in data['offers'][0]:
-                                price = data['offers'][0]['price']
-                        elif 'price' in data:
-                            price = data['price']
-                        
-                        if price:
-                            # Get product name from JSON-LD if available
-                            product_name = data.get('name', '')
-                            domain = re.search(r'https?://(?:www\.)?([^/]+)', url)
-                            domain_text = domain.group(1) if domain else "Product page"
-                            
-                            source = f"{domain_text} - {product_name[:30]}... - {url}"
                             return [SearchResult(
                                 plant_name=plant_name,
-                                price=f"${price}",
-                                source=source
+                                price=price_from_match(price_match),
+                                retailer=domain_text,
+                                title=title or None,
+                                url=url
                             )]
-                    except Exception as e:
-                        self.logger(f"Error parsing JSON-LD: {str(e)}")
         
         except Exception as e:
             self.logger(f"Error scraping product page: {str(e)}")
@@ -407,73 +391,134 @@ class GoogleParser:
 class RetailerParser:
     """Parser for specific retailer websites"""
     
-    def __init__(self, retailer, logger=None):
+    def __init__(self, retailer, logger=None, fragments=None):
         self.retailer = retailer
         self.logger = logger or (lambda msg: None)
+        self.fragments = fragments  # Optional FragmentCache to skip parsing unchanged pages
     
-    def parse_product_page(self, response_text, plant_name):
-        """Parse a retailer product page for relevant price information"""
-        soup = BeautifulSoup(response_text, 'html.parser')
-        
-        # Look for products
-        products = soup.select(self.retailer.product_selector)
+    def find_products(self, soup):
+        """Select product nodes using the retailer's main selector, then the alternatives"""
+        products = self.retailer.select(soup, self.retailer.product_selector)
         
         # If main selector doesn't work, try alternatives
         if not products:
             for alt_selector in self.retailer.alt_selectors:
-                products = soup.select(alt_selector)
+                products = self.retailer.select(soup, alt_selector)
                 if products:
                     break
         
-        # Try to find the most relevant product
-        relevant_products = []
-        for product in products[:5]:  # Check first 5 products
-            product_text = product.get_text()
-            
-            # Find the title element if possible
-            title_elements = product.select('h2, h3, h4, a[class*="title"], div[class*="title"]')
-            product_title = ""
-            if title_elements:
-                product_title = title_elements[0].get_text().strip()
-            
-            # Calculate relevance score based on presence of plant name words
-            plant_words = [word.lower() for word in plant_name.split() if len(word) > 2]
-            product_text_lower = product_text.lower()
-            title_lower = product_title.lower() if product_title else ""
+        return products
+    
+    def extract_product(self, product, fallback_url):
+        """
+        Pull title, price and URL out of a single product node
+        
+        Args:
+            product: BeautifulSoup node for one product card
+            fallback_url: URL to use when the card has no usable link
             
-            # Count matching words in title and full text, giving title matches more weight
-            title_matches = sum(1 for word in plant_words if word in title_lower)
-            text_matches = sum(1 for word in plant_words if word in product_text_lower)
+        Returns:
+            Dictionary with title, price, url and text (price is None if not found)
+        """
+        product_text = product.get_text()
+        
+        # Find the title element if possible
+        title_elements = product.select('h2, h3, h4, a[class*="title"], div[class*="title"]')
+        product_title = ""
+        if title_elements:
+            product_title = title_elements[0].get_text().strip()
+        
+        # Extract price
+        price_match = self.retailer.price_pattern.search(product_text)
+        
+        # Get URL if possible
+        product_url = fallback_url
+        a_tags = product.select('a')
+        if a_tags and a_tags[0].has_attr('href'):
+            product_url = a_tags[0]['href']
+            if not product_url.startswith('http'):
+                # Try to build full URL from relative path
+                if product_url.startswith('/'):
+                    domain = re.search(r'https?://(?:www\.)?([^/]+)', self.retailer.url_template)
+                    if domain:
+                        product_url = f"https://{domain.group(1)}{product_url}"
+                else:
+                    # Default fallback if we can't build a proper URL
+                    domain = self.retailer.name.lower().replace(' ', '')
+                    product_url = f"https://www.{domain}.com.au/{product_url}"
+        
+        return {
+            'title': product_title,
+            'price': price_from_match(price_match) if price_match else None,
+            'url': product_url,
+            'text': product_text
+        }
+    
+    def parse_listing_page(self, response_text, page_url):
+        """
+        Parse a category listing page into a list of priced products
+        
+        Args:
+            response_text: HTML of the listing page
+            page_url: URL of the listing page (used when a card has no link)
             
-            # Relevance score: title matches are worth more
-            relevance_score = (title_matches * 2) + text_matches
+        Returns:
+            List of product dictionaries with title, price and url
+        """
+        soup = BeautifulSoup(response_text, 'html.parser')
+        
+        listing = []
+        for product in self.find_products(soup):
+            details = self.extract_product(product, page_url)
+            if details['price'] and details['title']:
+                listing.append({
+                    'title': details['title'],
+                    'price': details['price'],
+                    'url': details['url']
+                })
+        
+        return listing
+    
+    def parse_product_page(self, response_text, plant_name):
+        """Parse a retailer product page for relevant price information"""
+        search_url = self.retailer.get_search_url(plant_name)
+        
+        # Reuse the previous answer if the page hasn't changed since the last fetch, without parsing it
+        fingerprint = None
+        if self.fragments is not None:
+            fingerprint = self.fragments.fingerprint(response_text, self.retailer.product_selector)
+            cached = self.fragments.get(search_url, self.retailer.product_selector, fingerprint)
+            if cached is not None:
+                return cached[0] if cached else None
+        
+        soup = BeautifulSoup(response_text, 'html.parser')
+        
+        # Look for products (only the first 5 are checked)
+        products = self.find_products(soup)[:5]
+        result = self.best_product(products, plant_name, search_url)
+        if fingerprint is not None:
+            self.fragments.put(search_url, self.retailer.product_selector, fingerprint, [result] if result else [])
+        return result
+    
+    def best_product(self, products, plant_name, fallback_url):
+        """Score product nodes against the plant name and return the best priced match as a SearchResult"""
+        # Try to find the most relevant product
+        matcher = get_matcher(plant_name)
+        relevant_products = []
+        for product in products:
+            details = self.extract_product(product, fallback_url)
             
-            # Extract price
-            price_match = re.search(self.retailer.price_pattern, product_text)
+            # Score the title and the full card text, giving title matches more weight
+            text_score = matcher.score(details['text'])
+            relevance_score = (matcher.score(details['title']) * 2) + text_score
             
-            if price_match and relevance_score > 0:
-                # Get URL if possible
-                product_url = self.retailer.get_search_url(plant_name)
-                a_tags = product.select('a')
-                if a_tags and a_tags[0].has_attr('href'):
-                    product_url = a_tags[0]['href']
-                    if not product_url.startswith('http'):
-                        # Try to build full URL from relative path
-                        if product_url.startswith('/'):
-                            domain = re.search(r'https?://(?:www\.)?([^/]+)', self.retailer.url_template)
-                            if domain:
-                                product_url = f"https://{domain.group(1)}{product_url}"
-                        else:
-                            # Default fallback if we can't build a proper URL
-                            domain = self.retailer.name.lower().replace(' ', '')
-                            product_url = f"https://www.{domain}.com.au/{product_url}"
-                
+            if details['price'] and text_score >= RELATED_SCORE:
                 relevant_products.append({
                     'relevance': relevance_score,
                     'product': product,
-                    'price': price_match.group(0),
-                    'title': product_title or f"Product from {self.retailer.name}",
-                    'url': product_url
+                    'price': details['price'],
+                    'title': details['title'] or f"Product from {self.retailer.name}",
+                    'url': details['url']
                 })
         
         # Sort by relevance score and get the most relevant product
@@ -484,7 +529,10 @@ class RetailerParser:
             return SearchResult(
                 plant_name=plant_name,
                 price=best_match['price'],
-                source=f"{self.retailer.name} - {best_match['title'][:30]}... - {best_match['url']}"
+                retailer=self.retailer.name,
+                title=best_match['title'],
+                url=best_match['url'],
+                relevance_score=best_match['relevance']
             )
         
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,453 @@
+import queue
+import sys
+import threading
+import time
+
+from models import SearchResult, PlantPriceResults
+from parsers import RetailerParser
+from platforms import best_platform_product
+from scraper import ENGINE_SOURCE
+from utils import get_request_headers, dedupe_results_by_url
+
+# Workers per stage. Fetching waits on the network, so it gets the most threads;
+# parsing is CPU bound and gains little from more threads than cores
+DEFAULT_WIDTHS = {
+    'query': 1,
+    'fetch': 8,
+    'parse': 2,
+    'rank': 1,
+    'sink': 1
+}
+
+# Capacity of each stage's input queue. The parse queue is kept short: a full
+# queue blocks the fetch workers, so at most this many downloaded pages (plus
+# one per fetch worker) are held in memory waiting to be parsed
+DEFAULT_QUEUE_SIZES = {
+    'query': 16,
+    'fetch': 64,
+    'parse': 8,
+    'rank': 64,
+    'sink': 16
+}
+
+STAGE_NAMES = ('query', 'fetch', 'parse', 'rank', 'sink')
+
+_STOP = object()  # Queue sentinel telling a worker to exit
+
+class PlantJob:
+    """One plant moving through the pipeline; collects the results of its source tasks"""
+    
+    def __init__(self, index, plant_name):
+        self.index = index
+        self.plant_name = plant_name
+        self.results = []
+        self.pending = 0  # Source tasks not yet through the parse stage
+        self.lock = threading.Lock()
+
+class SourceTask:
+    """
+    One source query for one plant: built by the query stage, filled in by fetch and parse
+    
+    kind is the search stage the source belongs to ('retailer', 'specialty' or
+    'marketplace') or 'engines' for the search engines, which fetch and parse
+    in one step.
+    """
+    __slots__ = ('job', 'kind', 'source', 'target', 'plan', 'platform', 'url',
+                 'html', 'products', 'results', 'failed', 'started')
+    
+    def __init__(self, job, kind, source, target=None, plan=None, platform=None, url=None):
+        self.job = job
+        self.kind = kind
+        self.source = source
+        self.target = target  # Retailer or site dictionary
+        self.plan = plan
+        self.platform = platform  # Shopify / WooCommerce stores are searched through their JSON API first
+        self.url = url
+        self.html = None
+        self.products = None  # Platform products, when the JSON search answered
+        self.results = []
+        self.failed = False
+        self.started = None
+
+class StageStats:
+    """Counters for one stage: items in and out, time working and time blocked on the next queue"""
+    
+    def __init__(self, name, workers, inbox):
+        self.name = name
+        self.workers = workers
+        self.inbox = inbox
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0  # Waiting for room downstream (backpressure)
+        self.peak_depth = 0
+        self.started = time.monotonic()
+    
+    def sample_depth(self):
+        depth = self.inbox.qsize()
+        if depth > self.peak_depth:
+            self.peak_depth = depth
+    
+    def to_dict(self):
+        """Snapshot: throughput per second, queue depth now and at peak, utilisation of the workers"""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        with self.lock:
+            return {
+                'stage': self.name,
+                'workers': self.workers,
+                'processed': self.processed,
+                'errors': self.errors,
+                'per_second': self.processed / elapsed,
+                'queue_depth': self.inbox.qsize(),
+                'peak_depth': self.peak_depth,
+                'queue_size': self.inbox.maxsize,
+                'busy': self.busy_seconds / (elapsed * self.workers),
+                'blocked': self.blocked_seconds / (elapsed * self.workers)
+            }
+
+class Stage:
+    """
+    A pool of worker threads taking items from a bounded queue
+    
+    handler(item, emit) processes one item and calls emit(output) for each
+    item it passes on; emit blocks while the next stage's queue is full.
+    """
+    
+    def __init__(self, name, handler, workers, inbox, outbox=None, logger=None):
+        self.name = name
+        self.handler = handler
+        self.inbox = inbox
+        self.outbox = outbox
+        self.logger = logger or (lambda msg: None)
+        self.stats = StageStats(name, workers, inbox)
+        self.threads = [
+            threading.Thread(target=self._work, name=f"pipeline-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+    
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+    
+    def emit(self, item):
+        """Pass an item to the next stage, waiting while its queue is full"""
+        start = time.monotonic()
+        self.outbox.put(item)
+        waited = time.monotonic() - start
+        with self.stats.lock:
+            self.stats.blocked_seconds += waited
+        return waited
+    
+    def _work(self):
+        while True:
+            self.stats.sample_depth()
+            item = self.inbox.get()
+            if item is _STOP:
+                break
+            
+            start = time.monotonic()
+            blocked = [0.0]
+            
+            def emit(output):
+                blocked[0] += self.emit(output)
+            
+            failed = False
+            try:
+                self.handler(item, emit)
+            except Exception as e:
+                self.logger(f"Error in {self.name} stage: {str(e)}")
+                failed = True
+            with self.stats.lock:
+                self.stats.processed += 1
+                self.stats.errors += failed
+                self.stats.busy_seconds += time.monotonic() - start - blocked[0]
+    
+    def stop(self):
+        """Let the workers finish what is queued, then exit"""
+        for _ in self.threads:
+            self.inbox.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+
+class ScrapePipeline:
+    """
+    Plant searches as a staged producer/consumer pipeline
+    
+    query (build one task per source) -> fetch (network) -> parse (HTML to
+    results) -> rank (once all of a plant's tasks are in) -> sink (store and
+    report). Each stage has its own worker count and a bounded input queue,
+    so a slow stage makes the ones before it wait instead of letting work
+    pile up; in particular fetched pages can only get a few pages ahead of the
+    parsers. Per-stage throughput, queue depth, busy and blocked time are
+    kept, so stage widths can be tuned from describe() rather than guessed.
+    
+    The searches are the scraper's own (same sources, filters, rate limits,
+    parsers and source statistics) in BeautifulSoup mode, with every source
+    queried in parallel rather than in stage order.
+    """
+    
+    def __init__(self, scraper, sink=None, widths=None, queue_sizes=None, logger=None):
+        """
+        Args:
+            scraper: PlantPriceScraper supplying sources, fetcher and parsers
+            sink: Optional PriceHistoryStore every result is written to
+            widths: Workers per stage, overriding DEFAULT_WIDTHS
+            queue_sizes: Input queue capacity per stage, overriding DEFAULT_QUEUE_SIZES
+            logger: Function to call with log messages
+        """
+        self.scraper = scraper
+        self.sink = sink
+        self.widths = dict(DEFAULT_WIDTHS, **(widths or {}))
+        self.queue_sizes = dict(DEFAULT_QUEUE_SIZES, **(queue_sizes or {}))
+        self.logger = logger or (lambda msg: None)
+        self.on_result = None
+        self.completed = 0
+        self.done = threading.Condition()
+        self.stages = []
+    
+    def _build_stages(self):
+        queues = [queue.Queue(maxsize=self.queue_sizes[name]) for name in STAGE_NAMES]
+        handlers = [self.build_queries, self.fetch, self.parse, self.rank, self.store]
+        self.stages = [
+            Stage(name, handler, self.widths[name], queues[i], queues[i + 1] if i + 1 < len(queues) else None, self.logger)
+            for i, (name, handler) in enumerate(zip(STAGE_NAMES, handlers))
+        ]
+        self.by_name = {stage.name: stage for stage in self.stages}
+    
+    # Stage handlers
+    
+    def build_queries(self, job, emit):
+        """Query stage: one task for every source the scraper would query for the plant"""
+        scraper = self.scraper
+        plant_name = job.plant_name
+        tasks = []
+        try:
+            if scraper.running:
+                if scraper.should_query(plant_name, ENGINE_SOURCE) and not scraper.paused_for_captcha:
+                    tasks.append(SourceTask(job, 'engines', ENGINE_SOURCE))
+                
+                # In catalog mode, answer from the local index and only search retailers it can't cover
+                retailers = scraper.retailers
+                if scraper.catalog:
+                    job.results.extend(scraper.catalog.lookup(plant_name))
+                    retailers = [r for r in retailers if not scraper.catalog.covers(r)]
+                for retailer in scraper.order_sources(plant_name, retailers, lambda r: r.name):
+                    if scraper.should_query(plant_name, retailer.name):
+                        tasks.append(SourceTask(job, 'retailer', retailer.name, retailer, retailer.plan, retailer.platform,
+                                                retailer.get_search_url(plant_name)))
+                
+                for kind, sites in (('marketplace', scraper.get_marketplaces(plant_name, priority_marketplaces=True)),
+                                    ('specialty', scraper.get_specialty_sites(plant_name))):
+                    for site in scraper.order_sources(plant_name, sites, lambda s: s['name']):
+                        if scraper.should_query(plant_name, site['name']):
+                            tasks.append(SourceTask(job, kind, site['name'], site, site['plan'], site.get('platform'), site['url']))
+        except Exception as e:
+            scraper.logger(f"Error planning the search for {plant_name}: {str(e)}")
+        
+        # Set before any task is passed on, so a fast task can't finish the job early
+        job.pending = len(tasks)
+        if not tasks:
+            self.by_name['rank'].inbox.put(job)
+            return
+        for task in tasks:
+            emit(task)
+    
+    def fetch(self, task, emit):
+        """Fetch stage: download the page (or JSON products) under the site's rate limit"""
+        scraper = self.scraper
+        task.started = scraper.source_started()
+        try:
+            if not scraper.running:
+                task.failed = True
+            elif task.kind == 'engines':
+                # Hedged Google / Bing search, which fetches and parses in one go and records its own statistics
+                task.results = scraper.search_engines(task.job.plant_name)
+            else:
+                if task.platform:
+                    with scraper.rate_limit(task.plan):
+                        task.products = scraper.platforms.search(task.platform, task.url, task.job.plant_name)
+                # The HTML page is the fallback when there is no usable JSON search
+                if task.products is None:
+                    self.fetch_page(task)
+        except Exception as e:
+            scraper.logger(f"Error searching {task.source}: {str(e)}")
+            task.failed = True
+        finally:
+            emit(task)
+    
+    def fetch_page(self, task):
+        """Download a search page, reading only as far as the product cards that get parsed"""
+        scraper = self.scraper
+        # Same limits as the scraper's own stages: marketplaces send their referer and get longer
+        if task.kind == 'marketplace':
+            page_type, headers, timeout, node_count = 'marketplace', task.plan.request_headers(), 15, 10
+        else:
+            page_type, headers, timeout, node_count = 'retailer', get_request_headers(), 10, 5 if task.kind == 'retailer' else 3
+        selector = task.target.product_selector if task.kind == 'retailer' else task.target['product_selector']
+        
+        scraper.logger(f"Checking {task.source}...")
+        with scraper.rate_limit(task.plan):
+            response = scraper.fetcher.fetch(task.url, page_type, headers=headers, timeout=timeout,
+                                             selector=selector, node_count=node_count)
+        task.failed = response.status_code != 200
+        if not task.failed:
+            task.html = response.text
+    
+    def parse(self, task, emit):
+        """Parse stage: turn the fetched page into results and record the source's outcome"""
+        scraper = self.scraper
+        plant_name = task.job.plant_name
+        try:
+            if task.products is not None:
+                result = best_platform_product(task.products, plant_name, task.source)
+                task.results = [result] if result else []
+            elif task.html is not None:
+                if task.kind == 'retailer':
+                    parser = RetailerParser(task.target, logger=scraper.logger, fragments=scraper.fragments)
+                    result = parser.parse_product_page(task.html, plant_name)
+                    task.results = [result] if result else []
+                elif task.kind == 'specialty':
+                    result = scraper.parse_specialty_page(task.target, task.html, plant_name)
+                    task.results = [result] if result else []
+                else:
+                    task.results = list(scraper.parse_marketplace_page(task.target, task.html, plant_name, True))
+        except Exception as e:
+            scraper.logger(f"Error searching {task.source}: {str(e)}")
+            task.failed = True
+        finally:
+            task.html = None  # Release the page as soon as it is parsed
+            # Passed on even if recording fails, or the plant's pending count never reaches zero and run() hangs
+            try:
+                if task.kind != 'engines':
+                    scraper.record_source(plant_name, task.source, bool(task.results), task.started, task.failed)
+            finally:
+                emit(task)
+    
+    def rank(self, item, emit):
+        """Rank stage: once all of a plant's tasks are in, order its results best first"""
+        if isinstance(item, PlantJob):
+            job = item  # Plant with no sources to query
+        else:
+            job = item.job
+            with job.lock:
+                job.results.extend(item.results)
+                job.pending -= 1
+                if job.pending:
+                    return
+        
+        try:
+            results = dedupe_results_by_url(job.results)
+            if not any(result.price_cents is not None for result in results):
+                results.append(SearchResult(
+                    plant_name=job.plant_name,
+                    price="Not found",
+                    source="No price found from any retailer"
+                ))
+            
+            # Top three by the usual ranking policy first, then everything else
+            plant_results = PlantPriceResults(job.plant_name)
+            for result in results:
+                plant_results.add_result(result)
+            top = plant_results.get_top_results(3)
+            top_ids = {id(result) for result in top}
+            job.results = top + [result for result in results if id(result) not in top_ids]
+        finally:
+            emit(job)
+    
+    def store(self, job, emit):
+        """Sink stage: write the plant's results and report it"""
+        try:
+            if self.sink:
+                self.sink.add_results(job.results)
+                self.sink.flush()
+            if self.on_result:
+                self.on_result(job.plant_name, job.results)
+        finally:
+            with self.done:
+                self.completed += 1
+                self.done.notify_all()
+    
+    # Running
+    
+    def run(self, plant_names, on_result=None, report_interval=30):
+        """
+        Search every plant and wait for the pipeline to drain
+        
+        Args:
+            plant_names: Plants to search
+            on_result: Called with (plant_name, results) as each plant completes (from the sink thread)
+            report_interval: Seconds between stage statistics in the log (None for none)
+        
+        Returns:
+            List of (plant_name, results) in input order
+        """
+        self.on_result = on_result
+        self.completed = 0
+        self.scraper.start()
+        self._build_stages()
+        for stage in self.stages:
+            stage.start()
+        
+        jobs = [PlantJob(index, plant_name) for index, plant_name in enumerate(plant_names)]
+        query_queue = self.stages[0].inbox
+        next_report = time.monotonic() + (report_interval or 0)
+        for job in jobs:
+            # Blocks while the query stage is behind, which holds back the whole input
+            query_queue.put(job)
+            self.sample_depths()
+        
+        with self.done:
+            while self.completed < len(jobs):
+                self.done.wait(timeout=1)
+                self.sample_depths()
+                if report_interval and time.monotonic() >= next_report:
+                    self.logger(self.describe())
+                    next_report = time.monotonic() + report_interval
+        
+        for stage in self.stages:
+            stage.stop()
+        self.logger(self.describe())
+        return [(job.plant_name, job.results) for job in jobs]
+    
+    def sample_depths(self):
+        for stage in self.stages:
+            stage.stats.sample_depth()
+    
+    def stats(self):
+        """Per-stage statistics (see StageStats.to_dict), in pipeline order"""
+        return [stage.stats.to_dict() for stage in self.stages]
+    
+    def describe(self):
+        """One line per stage: workers, throughput, queue depth and how busy or blocked the workers are"""
+        lines = ["Pipeline stages:"]
+        for stats in self.stats():
+            lines.append(
+                f"  {stats['stage']}: {stats['workers']} workers, {stats['processed']} items "
+                f"({stats['per_second']:.2f}/s, {stats['errors']} errors), "
+                f"queue {stats['queue_depth']}/{stats['queue_size']} (peak {stats['peak_depth']}), "
+                f"busy {stats['busy']:.0%}, blocked {stats['blocked']:.0%}"
+            )
+        return "\n".join(lines)
+
+if __name__ == "__main__":
+    # python pipeline.py plants.txt [fetch workers] [parse workers]
+    from fingerprints import FragmentCache
+    from scraper import PlantPriceScraper
+    from storage import PriceHistoryStore
+    
+    with open(sys.argv[1], 'r') as f:
+        plants = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    widths = {}
+    if len(sys.argv) > 2:
+        widths['fetch'] = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        widths['parse'] = int(sys.argv[3])
+    
+    store = PriceHistoryStore()
+    scraper = PlantPriceScraper(logger=print)
+    scraper.fragments = FragmentCache(store)
+    pipeline = ScrapePipeline(scraper, sink=store, widths=widths, logger=print)
+    for plant_name, results in pipeline.run(plants):
+        print(f"{plant_name}: " + ", ".join(f"{r.price} ({r.source})" for r in results[:3]))
+    store.close()
@@ -0,0 +1,165 @@
+import html
+import json
+import urllib.parse
+
+from models import SearchResult
+from prices import Price, parse_price
+from matcher import get_matcher, RELATED_SCORE
+from utils import get_request_headers
+
+class ShopifyAdapter:
+    """Shopify predictive search: /search/suggest.json returns product titles, URLs and prices"""
+    
+    name = "Shopify"
+    
+    def search_url(self, base_url, plant_name, limit=10):
+        query = urllib.parse.quote_plus(plant_name)
+        return (f"{base_url}/search/suggest.json?q={query}&resources[type]=product"
+                f"&resources[limit]={limit}&resources[options][unavailable_products]=last")
+    
+    def products(self, data, base_url):
+        """Product dicts from a suggest.json payload (raises KeyError/TypeError if it isn't one)"""
+        products = []
+        for item in data['resources']['results']['products']:
+            # URLs are relative and carry search tracking parameters (?_pos=1&_sid=...)
+            url = urllib.parse.urljoin(base_url, (item.get('url') or '').split('?')[0])
+            products.append({
+                'title': html.unescape(item.get('title') or ''),
+                'url': url,
+                'price': parse_price(item.get('price') or item.get('price_min')),
+                'available': item.get('available') is not False
+            })
+        return products
+
+class WooCommerceAdapter:
+    """WooCommerce Store API: /wp-json/wc/store/v1/products returns prices in minor units"""
+    
+    name = "WooCommerce"
+    
+    def search_url(self, base_url, plant_name, limit=10):
+        query = urllib.parse.quote_plus(plant_name)
+        return f"{base_url}/wp-json/wc/store/v1/products?search={query}&per_page={limit}"
+    
+    def products(self, data, base_url):
+        """Product dicts from a Store API product list (raises KeyError/TypeError if it isn't one)"""
+        products = []
+        for item in data:
+            prices = item['prices']
+            # Variable products leave price empty and give a range instead
+            value = prices.get('price') or (prices.get('price_range') or {}).get('min_amount')
+            price = None
+            if value:
+                minor_unit = int(prices.get('currency_minor_unit', 2))
+                cents = int(value) * 10 ** (2 - minor_unit) if minor_unit <= 2 else int(value) // 10 ** (minor_unit - 2)
+                price = Price(cents, prices.get('currency_code') or 'AUD')
+            products.append({
+                'title': html.unescape(item.get('name') or ''),
+                'url': item.get('permalink') or base_url,
+                'price': price,
+                'available': item.get('is_in_stock') is not False
+            })
+        return products
+
+PLATFORM_ADAPTERS = {
+    'shopify': ShopifyAdapter(),
+    'woocommerce': WooCommerceAdapter()
+}
+
+class PlatformSearch:
+    """
+    Product search through a store platform's JSON endpoint instead of its HTML search page
+    
+    The JSON payloads are a small fraction of the size of a rendered search page
+    and map straight onto SearchResult, so nothing has to be parsed as HTML.
+    Stores whose endpoint is disabled are remembered and left to the HTML path.
+    """
+    
+    def __init__(self, fetcher, logger=None):
+        self.fetcher = fetcher
+        self.logger = logger or (lambda msg: None)
+        self.unsupported = set()  # Hosts whose JSON endpoint is unavailable
+        self.searches = 0
+        self.bytes_read = 0
+    
+    def search(self, platform, site_url, plant_name, limit=10):
+        """
+        Search a store through its platform's JSON endpoint
+        
+        Args:
+            platform: Key of PLATFORM_ADAPTERS
+            site_url: Any URL on the store (only the scheme and host are used)
+            plant_name: Plant to search for
+            limit: Most products to ask for
+        
+        Returns:
+            List of product dicts (title, url, price, available), or None if the
+            endpoint could not be used and the HTML search page should be scraped instead
+        """
+        adapter = PLATFORM_ADAPTERS.get(platform)
+        parts = urllib.parse.urlparse(site_url)
+        if adapter is None or parts.netloc in self.unsupported:
+            return None
+        
+        base_url = f"{parts.scheme}://{parts.netloc}"
+        headers = get_request_headers()
+        headers['Accept'] = 'application/json'
+        response = self.fetcher.fetch(adapter.search_url(base_url, plant_name, limit), 'api', headers=headers, timeout=10)
+        self.searches += 1
+        self.bytes_read += len(response.content)
+        
+        if response.status_code != 200:
+            if response.status_code in (401, 403, 404):
+                self.unsupported.add(parts.netloc)
+                self.logger(f"{parts.netloc} has no {adapter.name} JSON search (status {response.status_code}), using HTML")
+            return None
+        
+        try:
+            return adapter.products(json.loads(response.text), base_url)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.unsupported.add(parts.netloc)
+            self.logger(f"{parts.netloc} did not return {adapter.name} JSON, using HTML")
+            return None
+    
+    def describe(self):
+        """One-line summary for the log"""
+        text = f"Platform JSON: {self.searches} searches ({self.bytes_read / 1024:.0f} KB)"
+        if self.unsupported:
+            text += f", {len(self.unsupported)} stores fell back to HTML"
+        return text
+
+def best_platform_product(products, plant_name, retailer_name):
+    """
+    Most relevant priced product from a platform search as a SearchResult
+    
+    Args:
+        products: Product dicts from PlatformSearch.search
+        plant_name: Plant that was searched for
+        retailer_name: Store name for the result
+    
+    Returns:
+        SearchResult, or None if no priced product is relevant
+    """
+    matcher = get_matcher(plant_name)
+    best = None
+    for position, product in enumerate(products):
+        if not product['price']:
+            continue
+        score = matcher.score(product['title'])
+        # Best title match; ties go to in-stock products, then to the store's own ordering
+        rank = (score, product['available'], -position)
+        if score >= RELATED_SCORE and (best is None or rank > best[0]):
+            best = (rank, product)
+    
+    if best is None:
+        return None
+    
+    (score, available, _), product = best
+    return SearchResult(
+        plant_name=plant_name,
+        price=product['price'],
+        retailer=retailer_name,
+        title=product['title'] or f"Product from {retailer_name}",
+        url=product['url'],
+        relevance_score=score,
+        note=None if available else "sold out"
+    )
@@ -0,0 +1,112 @@
+import re
+import sys
+
+# One pattern for every price we pull out of a page: "$12", "$12.95", "$1,299.00",
+# "AU$ 15.5", "US$9.99". Written to be used with search() on free text.
+PRICE_PATTERN = re.compile(
+    r'(?P<prefix>AU|A|US|NZ)?\$\s?(?P<dollars>\d{1,3}(?:,\d{3})+|\d+)(?:\.(?P<cents>\d{1,2}))?'
+)
+
+# Plain numbers as found in JSON-LD, meta tags or split price widgets ("12.95", "12.", "1,299")
+_NUMBER_PATTERN = re.compile(r'^\s*(?P<dollars>\d{1,3}(?:,\d{3})+|\d+)(?:\.(?P<cents>\d{0,2}))?\s*$')
+
+_CURRENCY_BY_PREFIX = {None: 'AUD', 'AU': 'AUD', 'A': 'AUD', 'US': 'USD', 'NZ': 'NZD'}
+_SYMBOL_BY_CURRENCY = {'AUD': '$', 'USD': 'US$', 'NZD': 'NZ$'}
+
+def format_cents(cents, currency='AUD'):
+    """Display form of a price in cents, e.g. "$12.95" (or "US$12.95" for other currencies)"""
+    symbol = _SYMBOL_BY_CURRENCY.get(currency, currency + ' ')
+    return f"{symbol}{cents // 100}.{cents % 100:02d}"
+
+class Price:
+    """A parsed price: integer cents, a currency code and (if different from the display form) the raw text"""
+    __slots__ = ('cents', 'currency', 'raw')
+    
+    def __init__(self, cents, currency='AUD', raw=None):
+        self.cents = cents
+        self.currency = sys.intern(currency)
+        self.raw = None
+        # Only keep the raw text when it says something the formatted price doesn't
+        if raw is not None and raw != self.format():
+            self.raw = raw
+    
+    @property
+    def amount(self):
+        """Price as a float in dollars"""
+        return self.cents / 100
+    
+    def format(self):
+        """Display form, e.g. "$12.95" """
+        return format_cents(self.cents, self.currency)
+    
+    def __str__(self):
+        return self.format()
+    
+    def __repr__(self):
+        return f"Price({self.cents}, {self.currency!r})"
+    
+    def __eq__(self, other):
+        return isinstance(other, Price) and (self.cents, self.currency) == (other.cents, other.currency)
+    
+    def __hash__(self):
+        return hash((self.cents, self.currency))
+
+def _to_cents(dollars, cents):
+    """Combine the dollar and cent groups of a match into integer cents"""
+    cents = (cents or '').ljust(2, '0')
+    return int(dollars.replace(',', '')) * 100 + int(cents)
+
+def price_from_match(match):
+    """Build a Price from a PRICE_PATTERN match (or any match whose text is a price)"""
+    if 'dollars' not in match.re.groupindex:
+        return parse_price(match.group(0))
+    groups = match.groupdict()
+    return Price(
+        _to_cents(groups['dollars'], groups.get('cents')),
+        _CURRENCY_BY_PREFIX.get(groups.get('prefix'), 'AUD'),
+        raw=match.group(0)
+    )
+
+def extract_price(text, pattern=PRICE_PATTERN):
+    """
+    Find the first price in a block of text
+    
+    Args:
+        text: Text that may contain a price
+        pattern: Compiled pattern or pattern string (defaults to PRICE_PATTERN)
+    
+    Returns:
+        Price, or None if the text has no price
+    """
+    if not text:
+        return None
+    match = re.search(pattern, text) if isinstance(pattern, str) else pattern.search(text)
+    return price_from_match(match) if match else None
+
+def parse_price(value):
+    """
+    Parse a single price value
+    
+    Args:
+        value: Price, number, "$12.95"-style text or a bare number such as "12.95"
+    
+    Returns:
+        Price, or None for status text like "Not found"
+    """
+    if value is None:
+        return None
+    if isinstance(value, Price):
+        return value
+    if isinstance(value, (int, float)):
+        return Price(int(round(value * 100)))
+    
+    text = str(value).strip()
+    match = PRICE_PATTERN.match(text)
+    if match:
+        return price_from_match(match)
+    
+    match = _NUMBER_PATTERN.match(text)
+    if match:
+        return Price(_to_cents(match.group('dollars'), match.group('cents')), raw=text)
+    
+    return None
@@ -0,0 +1,289 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+import soupsieve
+
+from prices import PRICE_PATTERN
+from utils import get_request_headers
+
+# Site definitions shipped with the scraper; adding a retailer is an edit to this file
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retailers.json")
+
+# Config sections and the search stage each one feeds
+STAGES = {
+    'retailers': 'retailer',
+    'specialty_sites': 'specialty',
+    'marketplaces': 'marketplace'
+}
+
+# Coordination file shared by processes that must respect the same per-host limits
+DEFAULT_RATE_LIMIT_PATH = "rate_limits.db"
+
+_MARKETPLACE_ACCEPT = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8"
+
+class RateLimit:
+    """
+    Per-site request limit: at most max_concurrency requests in flight and
+    at least min_interval seconds between request starts
+    
+    Use as a context manager around a fetch.
+    """
+    
+    def __init__(self, max_concurrency=2, min_interval=1.0):
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+    
+    def __enter__(self):
+        self.slots.acquire()
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.slots.release()
+        return False
+
+class SharedRateLimit(RateLimit):
+    """
+    RateLimit enforced across processes through a SQLite coordination file
+    
+    Every process that opens the same file shares one request budget per key
+    (normally the site's host): the next allowed start time and the requests
+    in flight are kept in the file and updated in short BEGIN IMMEDIATE
+    transactions. A slot held by a process that died is freed after
+    slot_timeout seconds.
+    """
+    
+    def __init__(self, path, key, max_concurrency=2, min_interval=1.0, slot_timeout=120, poll_interval=0.05):
+        super().__init__(max_concurrency, min_interval)
+        self.path = path
+        self.key = key
+        self.slot_timeout = slot_timeout
+        self.poll_interval = poll_interval
+        self.local = threading.local()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(
+                "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, next_start REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS rate_limit_slots (id INTEGER PRIMARY KEY, key TEXT NOT NULL, expires REAL NOT NULL);"
+            )
+    
+    def _reserve(self):
+        """Take a slot and a start time if one is free; returns (slot id, seconds to wait) or None"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                cursor.execute("DELETE FROM rate_limit_slots WHERE key = ? AND expires < ?", (self.key, now))
+                in_flight = cursor.execute("SELECT COUNT(*) FROM rate_limit_slots WHERE key = ?", (self.key,)).fetchone()[0]
+                if in_flight >= self.max_concurrency:
+                    cursor.execute("COMMIT")
+                    return None
+                
+                row = cursor.execute("SELECT next_start FROM rate_limits WHERE key = ?", (self.key,)).fetchone()
+                next_start = row[0] if row else 0.0
+                cursor.execute(
+                    "INSERT OR REPLACE INTO rate_limits (key, next_start) VALUES (?, ?)",
+                    (self.key, max(now, next_start) + self.min_interval)
+                )
+                cursor.execute(
+                    "INSERT INTO rate_limit_slots (key, expires) VALUES (?, ?)",
+                    (self.key, now + self.slot_timeout)
+                )
+                slot = cursor.lastrowid
+                cursor.execute("COMMIT")
+                return slot, next_start - now
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+    
+    def __enter__(self):
+        # The in-process semaphore keeps this process's threads from polling the file needlessly
+        self.slots.acquire()
+        try:
+            reserved = self._reserve()
+            while reserved is None:
+                time.sleep(self.poll_interval)
+                reserved = self._reserve()
+        except Exception:
+            self.slots.release()
+            raise
+        
+        slot, wait = reserved
+        self.local.slot = slot
+        if wait > 0:
+            time.sleep(wait)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            with self.lock:
+                self.conn.execute("DELETE FROM rate_limit_slots WHERE id = ?", (self.local.slot,))
+        finally:
+            self.slots.release()
+        return False
+
+class SitePlan:
+    """
+    One registry entry compiled for repeated use
+    
+    Regexes and CSS selectors are compiled once when the registry is loaded,
+    along with the URL builder, request headers and rate limit, so a search
+    stage does no per-call setup beyond formatting the plant name into the URL.
+    """
+    
+    def __init__(self, entry, stage, defaults=None):
+        entry = dict(defaults or {}, **entry)
+        self.name = entry['name']
+        self.stage = stage
+        self.priority = entry['priority']
+        self.prioritized = entry.get('prioritized', False)  # Moved to the front in priority marketplace mode
+        self.platform = entry.get('platform')
+        
+        self.url_template = entry['url']
+        self.space = entry['space']
+        parts = urllib.parse.urlparse(self.url_template)
+        self.host = parts.hostname
+        self.base_url = f"{parts.scheme}://{parts.netloc}"
+        self.category_url_template = entry.get('category_url')
+        self.max_catalog_pages = entry.get('max_catalog_pages', 20)
+        
+        pattern = entry.get('price_pattern')
+        self.price_pattern = re.compile(pattern) if pattern else PRICE_PATTERN
+        
+        self.product_selector = entry['product_selector']
+        self.alt_selectors = entry.get('alt_selectors', [])
+        self.price_selector = entry.get('price_selector')
+        self.title_selector = entry.get('title_selector')
+        self.link_selector = entry.get('link_selector')
+        self.selectors = {}  # CSS selector text -> compiled soupsieve pattern
+        for selector in [self.product_selector, self.price_selector, self.title_selector, self.link_selector] + self.alt_selectors:
+            if selector:
+                self.selectors[selector] = soupsieve.compile(selector)
+        
+        self.referer = entry.get('referer')
+        self.rate_limit = RateLimit(entry['max_concurrency'], entry['min_interval'])
+    
+    def search_url(self, plant_name):
+        """Search URL for a plant, quoted with spaces as "+" or "%20" depending on the site"""
+        if self.space == '+':
+            return self.url_template.format(plant_name=urllib.parse.quote_plus(plant_name))
+        return self.url_template.format(plant_name=urllib.parse.quote(plant_name, safe=''))
+    
+    def request_headers(self):
+        """Request headers with a random user agent, plus the site's referer if it has one"""
+        headers = get_request_headers()
+        if self.referer:
+            headers['Accept'] = _MARKETPLACE_ACCEPT
+            headers['Referer'] = self.referer
+        return headers
+    
+    def absolute_url(self, href):
+        """Resolve a link found on the site's pages"""
+        return urllib.parse.urljoin(self.base_url + '/', href)
+    
+    def select(self, node, selector):
+        """node.select(selector) using the precompiled pattern when the selector is one of the site's"""
+        compiled = self.selectors.get(selector)
+        return compiled.select(node) if compiled else node.select(selector)
+    
+    def select_one(self, node, selector):
+        """node.select_one(selector) using the precompiled pattern when the selector is one of the site's"""
+        compiled = self.selectors.get(selector)
+        return compiled.select_one(node) if compiled else node.select_one(selector)
+    
+    def site(self, plant_name):
+        """Site dictionary for a plant, as consumed by the specialty and marketplace stages"""
+        site = {
+            "name": self.name,
+            "url": self.search_url(plant_name),
+            "price_pattern": self.price_pattern,
+            "product_selector": self.product_selector,
+            "plan": self
+        }
+        for key in ('price_selector', 'title_selector', 'link_selector', 'platform'):
+            if getattr(self, key):
+                site[key] = getattr(self, key)
+        return site
+
+class RetailerRegistry:
+    """
+    Every site the scraper searches, loaded once from a JSON config file
+    
+    The config has one section per search stage (see STAGES). Each entry gives
+    the site name, search URL template with a {plant_name} placeholder, the
+    character spaces are encoded as, selectors, an optional price_pattern,
+    rate limit and priority; values missing from an entry come from "defaults".
+    """
+    
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        
+        defaults = config.get('defaults', {})
+        self.plans = {}  # stage -> SitePlans, highest priority first
+        for section, stage in STAGES.items():
+            plans = [SitePlan(entry, stage, defaults) for entry in config.get(section, [])]
+            plans.sort(key=lambda plan: plan.priority)
+            self.plans[stage] = plans
+    
+    def stage(self, stage):
+        """Plans for one search stage ('retailer', 'specialty' or 'marketplace'), highest priority first"""
+        return self.plans.get(stage, [])
+    
+    def marketplaces(self, prioritized=False):
+        """Marketplace plans; in prioritized mode the entries marked "prioritized" come first"""
+        plans = self.stage('marketplace')
+        if prioritized:
+            plans = sorted(plans, key=lambda plan: not plan.prioritized)
+        return plans
+    
+    def find(self, name):
+        """Plan for a site name, or None"""
+        for plans in self.plans.values():
+            for plan in plans:
+                if plan.name == name:
+                    return plan
+        return None
+    
+    def share_rate_limits(self, path=DEFAULT_RATE_LIMIT_PATH):
+        """
+        Enforce every site's rate limit across all processes using the same coordination file
+        
+        Args:
+            path: SQLite file the limits are coordinated through
+        """
+        for plans in self.plans.values():
+            for plan in plans:
+                limit = plan.rate_limit
+                plan.rate_limit = SharedRateLimit(path, plan.host, limit.max_concurrency, limit.min_interval)
+    
+    def hosts(self):
+        """Every host in the registry"""
+        return list(dict.fromkeys(plan.host for plans in self.plans.values() for plan in plans))
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+def get_registry():
+    """The registry loaded from REGISTRY_PATH (loaded on first use, then shared)"""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = RetailerRegistry()
+        return _default_registry
@@ -0,0 +1,247 @@
+import sys
+import time
+
+from fingerprints import FragmentCache
+from models import SearchResult
+from prices import Price
+from storage import PriceHistoryStore, NegativeResultCache
+from utils import normalize_plant_name
+
+DAY = 24 * 60 * 60
+
+# How long a stored price is trusted, scaled by how often it has changed
+MIN_TTL = 1 * DAY  # Prices that change on most observations
+MAX_TTL = 21 * DAY  # Prices that have never changed
+RECENT_CHANGE = 3 * DAY  # A price that moved this recently is treated as volatile
+HISTORY_WINDOW = 60 * DAY  # Observations older than this are ignored
+
+# Rough request cost of refreshing one plant: Google search plus marketplace checks,
+# on top of one request per direct retailer that is due
+BASE_REQUEST_COST = 3
+
+class RefreshPlan:
+    """Outcome of RefreshPlanner.plan: which plants to scrape and which stored prices to reuse"""
+    
+    def __init__(self):
+        self.refresh = []  # Plant names to scrape, most overdue first
+        self.reuse = []  # Plant names whose stored prices are all still fresh
+        self.fresh_sources = {}  # normalized plant name -> retailers whose stored price is fresh
+        self.requests = 0  # Estimated requests needed for self.refresh
+        self.deferred = 0  # Due plants left for a later run because of the request budget
+    
+    def should_query(self, plant_name, source):
+        """Source filter for PlantPriceScraper: skip retailers whose stored price is still fresh"""
+        return source not in self.fresh_sources.get(normalize_plant_name(plant_name), ())
+    
+    def describe(self):
+        """One-line summary for the log"""
+        text = f"Refreshing {len(self.refresh)} plants (~{self.requests} requests), reusing stored prices for {len(self.reuse)}"
+        if self.deferred:
+            text += f", {self.deferred} due plants deferred to the next run"
+        return text
+
+class RefreshPlanner:
+    """
+    Decides which (plant, retailer) prices need re-scraping
+    
+    Each stored price gets a TTL between MIN_TTL and MAX_TTL depending on how
+    often it changed across past runs; prices that changed in the last
+    RECENT_CHANGE seconds get MIN_TTL. A plant is refreshed when it has no
+    stored price or any of its stored prices has outlived its TTL.
+    
+    Only the direct retailers' prices count. The other history buckets
+    ("Other", "Google Shopping", per-domain search results) mix many different
+    products, so they would always look volatile; they are never due
+    themselves, and a plant known only through them is refreshed once its
+    newest price is MAX_TTL old.
+    """
+    
+    def __init__(self, store, direct_sources=(), min_ttl=MIN_TTL, max_ttl=MAX_TTL, negative_cache=None):
+        """
+        Args:
+            store: PriceHistoryStore with past results
+            direct_sources: Names of retailers searched directly (each costs one request)
+            min_ttl: Shortest time a price is trusted, in seconds
+            max_ttl: Longest time a price is trusted, in seconds
+            negative_cache: Optional NegativeResultCache; retailers known to have no match
+                for a plant are left out of its request estimate
+        """
+        self.store = store
+        self.direct_sources = set(direct_sources)
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_cache = negative_cache
+    
+    def entry_ttl(self, stats, now):
+        """TTL in seconds for one (plant, retailer) entry from its source_stats row"""
+        if stats['last_changed'] and now - stats['last_changed'] < RECENT_CHANGE:
+            return self.min_ttl
+        
+        volatility = stats['changes'] / max(stats['observations'] - 1, 1)
+        return self.max_ttl - (self.max_ttl - self.min_ttl) * min(volatility, 1.0)
+    
+    def due_sources(self, plant_name, fresh=(), now=None):
+        """Direct retailers that will actually be queried for a plant: not fresh and not known to have no match"""
+        due = self.direct_sources - set(fresh)
+        if self.negative_cache is not None and not self.negative_cache.force_refresh:
+            due -= self.negative_cache.negative_sources(plant_name, now)
+        return due
+    
+    def plan(self, plant_names, budget=None, now=None):
+        """
+        Plan a run over the given plants
+        
+        Args:
+            plant_names: Plant names (search names) in the run
+            budget: Maximum estimated requests for this run, or None for no limit
+            now: Current unix time (defaults to time.time())
+        
+        Returns:
+            RefreshPlan
+        """
+        now = now or time.time()
+        entries = {}
+        for stats in self.store.source_stats(now - HISTORY_WINDOW):
+            entries.setdefault(stats['plant'], []).append(stats)
+        
+        plan = RefreshPlan()
+        due = []
+        
+        for plant_name in plant_names:
+            key = normalize_plant_name(plant_name)
+            plant_entries = entries.get(key)
+            if not plant_entries:
+                # Never priced: refresh first
+                due.append((float('inf'), plant_name, BASE_REQUEST_COST + len(self.due_sources(plant_name, now=now))))
+                continue
+            
+            fresh = set()
+            overdue = 0.0
+            direct_entries = [stats for stats in plant_entries if stats['retailer'] in self.direct_sources]
+            for stats in direct_entries:
+                age = now - stats['last_seen']
+                ttl = self.entry_ttl(stats, now)
+                if age < ttl:
+                    fresh.add(stats['retailer'])
+                else:
+                    overdue = max(overdue, age / ttl)
+            if not direct_entries:
+                age = now - max(stats['last_seen'] for stats in plant_entries)
+                if age >= self.max_ttl:
+                    overdue = age / self.max_ttl
+            
+            plan.fresh_sources[key] = fresh
+            if overdue:
+                cost = BASE_REQUEST_COST + len(self.due_sources(plant_name, fresh, now))
+                due.append((overdue, plant_name, cost))
+            else:
+                plan.reuse.append(plant_name)
+        
+        due.sort(key=lambda item: item[0], reverse=True)
+        for overdue, plant_name, cost in due:
+            if budget is not None and plan.requests + cost > budget:
+                plan.deferred += 1
+                if overdue != float('inf'):
+                    plan.reuse.append(plant_name)  # Stale, but still better than nothing
+                continue
+            plan.refresh.append(plant_name)
+            plan.requests += cost
+        
+        return plan
+    
+    def stored_results(self, plant_name, sources=None):
+        """
+        Latest stored prices for a plant as SearchResults
+        
+        Args:
+            plant_name: Plant name to attach to the results
+            sources: Only include these retailers (None for all)
+        
+        Returns:
+            List of SearchResult objects
+        """
+        results = []
+        for row in self.store.latest_prices(plant_name):
+            if sources is not None and row['retailer'] not in sources:
+                continue
+            observed = time.strftime('%Y-%m-%d', time.localtime(row['observed_at']))
+            has_link = row['retailer'] != "Other" or row['url']
+            results.append(SearchResult(
+                plant_name=plant_name,
+                price=Price(row['price_cents'], row['currency'] or 'AUD'),
+                source=None if has_link else row['source'],
+                source_type=row['source_type'],
+                retailer=row['retailer'] if has_link else None,
+                title=row['title'],
+                url=row['url'],
+                note=f"stored {observed}"
+            ))
+        return results
+
+def run_periodic(scraper, plant_names, store, budget, interval=60 * 60, logger=None, full_refresh_every=None):
+    """
+    Keep a plant list fresh: every interval, scrape the most overdue plants within the budget
+    
+    Runs until scraper.running is cleared (e.g. from another thread via scraper.stop()).
+    Sources with no match for a plant are skipped until their negative cache entry
+    expires, except on forced full refresh cycles.
+    
+    Args:
+        scraper: PlantPriceScraper (BeautifulSoup mode is used)
+        plant_names: Every plant to keep fresh
+        store: PriceHistoryStore the results are written to
+        budget: Estimated requests allowed per cycle
+        interval: Seconds between cycles
+        logger: Function to call with log messages
+        full_refresh_every: Re-query sources with no match on every Nth cycle (None to rely on expiry only)
+    """
+    logger = logger or (lambda msg: None)
+    negative_cache = NegativeResultCache(store)
+    planner = RefreshPlanner(store, direct_sources=[r.name for r in scraper.retailers], negative_cache=negative_cache)
+    scraper.negative_cache = negative_cache
+    scraper.fragments = FragmentCache(store)
+    scraper.start()
+    cycle = 0
+    
+    while scraper.running:
+        cycle += 1
+        negative_cache.force_refresh = bool(full_refresh_every) and cycle % full_refresh_every == 0
+        if negative_cache.force_refresh:
+            logger("Full refresh: re-checking sources with no match")
+        
+        if scraper.catalog:
+            scraper.catalog.refresh()
+        plan = planner.plan(plant_names, budget=budget)
+        logger(plan.describe())
+        scraper.source_filter = plan.should_query
+        
+        for plant_name in plan.refresh:
+            if not scraper.running:
+                break
+            try:
+                store.add_results(scraper.search_plant_bs4(plant_name))
+                store.flush()
+            except Exception as e:
+                logger(f"Error refreshing {plant_name}: {str(e)}")
+        
+        scraper.source_filter = None
+        logger(scraper.fragments.describe())
+        logger(scraper.fetcher.describe())
+        logger(scraper.platforms.describe())
+        logger(negative_cache.describe())
+        next_run = time.time() + interval
+        while scraper.running and time.time() < next_run:
+            time.sleep(1)
+
+if __name__ == "__main__":
+    # Headless refresh loop: python scheduler.py plants.txt [budget] [interval seconds] [full refresh every N cycles]
+    from scraper import PlantPriceScraper
+    
+    with open(sys.argv[1], 'r') as f:
+        plants = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    budget = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    interval = int(sys.argv[3]) if len(sys.argv) > 3 else 60 * 60
+    full_refresh_every = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    
+    run_periodic(PlantPriceScraper(logger=print), plants, PriceHistoryStore(), budget, interval, logger=print,
+                 full_refresh_every=full_refresh_every)
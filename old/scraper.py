@@ -1,7 +1,9 @@
+import contextlib
 import time
 import random
-import requests
 import re
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -12,8 +14,21 @@ from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 
 from models import SearchResult, get_default_retailers
+from prices import PRICE_PATTERN, price_from_match
 from parsers import GoogleParser, RetailerParser
-from utils import random_delay, format_search_term, get_random_user_agent, get_request_headers
+from catalog import ProductIndex, CatalogCrawler, DEFAULT_REFRESH_PERIOD
+from fingerprints import FragmentCache
+from sources import SourcePlanner
+from fetcher import PageFetcher
+from registry import get_registry
+from platforms import PlatformSearch, best_platform_product
+from warmup import DnsCache, warm_up
+from matcher import get_matcher, RELATED_SCORE, PARTIAL_MATCH_SCORE
+from utils import (random_delay, format_search_term, get_random_user_agent, get_request_headers,
+                   LatencyTracker, dedupe_results_by_url)
+
+# Source name the search engine stage is tracked under (Google and its Bing hedge together)
+ENGINE_SOURCE = "Search engines"
 
 class PlantPriceScraper:
     """Main scraper class that handles both Selenium and BeautifulSoup scraping approaches"""
@@ -22,14 +37,29 @@ class PlantPriceScraper:
         self.logger = logger or (lambda msg: None)  # Default logger does nothing
         self.driver = None
         self.running = False
-        self.paused_for_captcha = False
-        self.google_parser = GoogleParser(logger=self.logger)
+        self.paused_for_captcha = False  # Only the browser's Google searches are paused; other sources carry on
+        self.engine_backlog = []  # Plants that skipped Google while paused, in order
+        self.sources_queried = 0  # Retailer, marketplace and specialty queries made (see record_source)
+        self.sources_failed = 0  # ... and how many of them raised or got an error status
+        self.fetcher = PageFetcher(logger=self.logger)  # Streaming fetches that stop once enough is read
+        self.google_parser = GoogleParser(logger=self.logger, fetcher=self.fetcher)
+        self.platforms = PlatformSearch(self.fetcher, logger=self.logger)  # Shopify / WooCommerce JSON search
+        self.registry = get_registry()  # Compiled site plans for every search stage
         self.retailers = get_default_retailers()
+        self.catalog = None  # CatalogCrawler when catalog crawl mode is enabled
+        self.source_filter = None  # Optional function(plant_name, source_name) -> bool, see should_query
+        self.source_planner = None  # SourcePlanner when sources are ordered by learned yield
+        self.negative_cache = None  # NegativeResultCache of (plant, source) pairs without a match
+        self.fragments = FragmentCache()  # Results of pages seen before, by (URL, selector)
+        self.engine_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="engine")
+        self.engine_latency = {"Google": LatencyTracker(), "Bing": LatencyTracker()}
+        self.dns_cache = DnsCache()
     
     def start(self):
         """Initialize the scraper"""
         self.running = True
         self.paused_for_captcha = False
+        self.engine_backlog = []
     
     def stop(self):
         """Stop the scraper"""
@@ -89,6 +119,121 @@ class PlantPriceScraper:
             self.logger(f"Error checking for CAPTCHA: {str(e)}")
             return False
     
+    def enable_catalog_mode(self, index_path="catalog_index.json", refresh_period=DEFAULT_REFRESH_PERIOD, refresh=True):
+        """
+        Answer retailer lookups from a locally crawled product index instead of per-plant searches
+        
+        Stale catalogs are crawled here, once; call catalog.refresh() again to
+        pick up catalogs that go stale during a long-running session.
+        
+        Args:
+            index_path: JSON file the product index is persisted to
+            refresh_period: Seconds before a retailer's catalog is crawled again
+            refresh: Crawl stale catalogs now; without it the index is only read, and
+                retailers it can't answer for are searched live
+        """
+        index = ProductIndex(index_path)
+        self.catalog = CatalogCrawler(self.retailers, index, logger=self.logger, refresh_period=refresh_period,
+                                      fetcher=self.fetcher)
+        if refresh:
+            self.catalog.refresh()
+    
+    def disable_catalog_mode(self):
+        """Go back to one search request per plant per retailer"""
+        self.catalog = None
+    
+    def enable_source_planner(self, stats_path="source_stats.json", exploration=0.1):
+        """
+        Query the sources that have returned prices most often first, and skip those that almost never do
+        
+        Args:
+            stats_path: JSON file the per-source statistics are persisted to
+            exploration: Probability of querying a skipped source anyway to keep its statistics current
+        """
+        if self.source_planner is None or self.source_planner.path != stats_path:
+            self.source_planner = SourcePlanner(stats_path, exploration=exploration)
+    
+    def disable_source_planner(self):
+        """Go back to the fixed source order, saving the statistics gathered so far"""
+        if self.source_planner:
+            self.source_planner.save()
+        self.source_planner = None
+    
+    def use_http2(self, enabled):
+        """Switch the fetch layer between pooled HTTP/1.1 and multiplexed HTTP/2 (needs httpx[http2])"""
+        if enabled == self.fetcher.http2:
+            return
+        self.fetcher.close()
+        self.fetcher = PageFetcher(logger=self.logger, http2=enabled)
+        self.google_parser.fetcher = self.fetcher
+        self.platforms.fetcher = self.fetcher
+        if self.catalog:
+            self.catalog.fetcher = self.fetcher
+    
+    def known_hosts(self):
+        """Hosts a run will contact: search engines, direct retailers, specialty sites and marketplaces"""
+        hosts = ["www.google.com.au", "www.bing.com"]
+        hosts += [urllib.parse.urlparse(retailer.url_template).hostname for retailer in self.retailers]
+        hosts += self.registry.hosts()
+        return list(dict.fromkeys(hosts))
+    
+    def warm_up(self, open_connections=True):
+        """
+        Resolve and cache DNS for every known host and optionally open pooled connections
+        
+        Logs the DNS time and the cold vs warm first-byte latency per host.
+        
+        Args:
+            open_connections: Also open a connection to each host, not just resolve it
+        """
+        self.dns_cache.install()
+        hosts = self.known_hosts()
+        self.logger(f"Warming up {len(hosts)} hosts...")
+        report = warm_up(hosts, self.fetcher, self.dns_cache, open_connections=open_connections, logger=self.logger)
+        self.logger(self.dns_cache.describe())
+        return report
+    
+    def should_query(self, plant_name, source_name):
+        """Whether a source should be queried for a plant (e.g. False when a stored price is still fresh)"""
+        if self.source_filter is not None and not self.source_filter(plant_name, source_name):
+            return False
+        if self.negative_cache is not None and not self.negative_cache.should_query(plant_name, source_name):
+            return False
+        return self.source_planner is None or self.source_planner.should_query(plant_name, source_name)
+    
+    def order_sources(self, plant_name, items, name):
+        """Order a stage's sources best first when the source planner is enabled"""
+        return self.source_planner.order(plant_name, items, name) if self.source_planner else items
+    
+    def source_started(self):
+        """Start time and byte count of a source query, for record_source"""
+        return time.perf_counter(), self.fetcher.bytes_read
+    
+    def record_source(self, plant_name, source_name, hit, started, failed=False):
+        """
+        Report whether a source query produced a price to the source planner and negative cache (if enabled)
+        
+        Args:
+            plant_name: Plant that was searched for
+            source_name: Retailer / site name, or ENGINE_SOURCE
+            hit: Whether a priced, relevant result was found
+            started: Value of source_started() before the query
+            failed: The query raised an error, so a miss says nothing about the source's range
+        """
+        if source_name != ENGINE_SOURCE:
+            self.sources_queried += 1
+            self.sources_failed += bool(failed)
+        if self.source_planner:
+            elapsed = time.perf_counter() - started[0]
+            self.source_planner.record(plant_name, source_name, hit, elapsed, max(self.fetcher.bytes_read - started[1], 0))
+        # Empty search engine pages are usually CAPTCHAs or blocks, not a sign the plant isn't sold
+        if self.negative_cache is not None and not failed and source_name != ENGINE_SOURCE:
+            self.negative_cache.record(plant_name, source_name, hit)
+    
+    def rate_limit(self, plan):
+        """Context manager applying a site plan's rate limit (no limit for sites outside the registry)"""
+        return plan.rate_limit if plan else contextlib.nullcontext()
+    
     def set_paused_for_captcha(self, paused):
         """Set the paused_for_captcha flag"""
         self.paused_for_captcha = paused
@@ -99,48 +244,21 @@ class PlantPriceScraper:
             # Random delay
             random_delay(2, 5, self.logger)
             
-            # Construct search URL
-            search_term = format_search_term(plant_name)
-            url = f"https://www.google.com.au/search?q={search_term}&gl=au&hl=en&num=30"  # Increased results per page
-            
-            self.logger(f"Searching Google for: {plant_name}")
-            self.driver.get(url)
-            
-            # Check if there's a CAPTCHA
-            if self.detect_captcha():
-                self.logger("CAPTCHA detected!")
-                self.paused_for_captcha = True
-                return [SearchResult(
-                    plant_name=plant_name,
-                    price="Paused for CAPTCHA", 
-                    source="Google"
-                )]
-            
-            # Wait for results to load
-            try:
-                WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.ID, "search"))
-                )
-            except:
-                self.logger("No search results found or page structure changed")
-                return [SearchResult(
-                    plant_name=plant_name,
-                    price="No results", 
-                    source="Google"
-                )]
-            
-            # Get the page HTML
-            page_html = self.driver.page_source
-            
-            # Use BeautifulSoup for parsing
-            soup = BeautifulSoup(page_html, 'html.parser')
+            # Search engines: Google in the browser, hedged with Bing. While a CAPTCHA is waiting
+            # to be solved only Bing is searched and the plant is queued for backfill_engines
+            if self.paused_for_captcha:
+                engine_results = []
+                if self.should_query(plant_name, ENGINE_SOURCE):
+                    engine_results = dedupe_results_by_url(self.timed_search("Bing", self.search_bing, plant_name))
+                    self.engine_backlog.append(plant_name)
+            else:
+                engine_results = self.search_engines(plant_name, self.search_google_selenium)
+                if self.paused_for_captcha:
+                    self.engine_backlog.append(plant_name)
             
             # First source: Direct retailers (both from search results and direct queries)
             retailer_results = self.search_direct_retailers(plant_name)
             
-            # Second source: Google results (with enhanced meta data extraction)
-            google_results = self.google_parser.extract_prices_from_soup(soup, plant_name)
-            
             # Third source: Marketplaces (specifically eBay/Amazon)
             marketplace_results = self.search_online_marketplaces(plant_name, priority_marketplaces=True)
             
@@ -150,9 +268,9 @@ class PlantPriceScraper:
             # First, add retailer results
             results.extend(retailer_results)
             
-            # Next, add unique Google results
+            # Next, add unique search engine results
             existing_sources = {r.source for r in results}
-            for result in google_results:
+            for result in engine_results:
                 if result.source not in existing_sources:
                     results.append(result)
                     existing_sources.add(result.source)
@@ -186,39 +304,46 @@ class PlantPriceScraper:
                 source=f"Error: {str(e)}"
             )]
     
-    def search_plant_bs4(self, plant_name):
-        """Search for a plant price using direct requests and BeautifulSoup"""
+    def backfill_engines(self):
+        """
+        Search Google for plants that skipped it while paused for a CAPTCHA
+        
+        Bing was already searched for these plants during the pause, so only
+        Google runs. Stops at the next CAPTCHA, putting that plant back at the
+        front of the backlog.
+        
+        Yields:
+            (plant_name, list of SearchResult)
+        """
+        while self.engine_backlog and self.running and not self.paused_for_captcha:
+            plant_name = self.engine_backlog.pop(0)
+            self.logger(f"Google for {plant_name} (skipped during the CAPTCHA pause)")
+            started = self.source_started()
+            results = dedupe_results_by_url(self.timed_search("Google", self.search_google_selenium, plant_name))
+            if self.paused_for_captcha:
+                self.engine_backlog.insert(0, plant_name)
+            else:
+                self.record_source(plant_name, ENGINE_SOURCE, bool(results), started)
+            yield plant_name, results
+    
+    def search_plant_bs4(self, plant_name, raise_errors=False):
+        """
+        Search for a plant price using direct requests and BeautifulSoup
+        
+        Args:
+            plant_name: Name of the plant to search for
+            raise_errors: Let an error in a search stage propagate instead of falling
+                back to the direct retailers (for work queue workers, which retry the plant)
+        """
         try:
             # Random delay
             random_delay(1, 3, self.logger)
             
-            # Construct search URL
-            search_term = format_search_term(plant_name)
-            url = f"https://www.google.com.au/search?q={search_term}&gl=au&hl=en&num=30"  # Increased results per page
-            
-            self.logger(f"Searching Google for: {plant_name}")
-            
-            # Make the request
-            response = requests.get(url, headers=get_request_headers(), timeout=10)
+            if self.source_planner:
+                return self.search_plant_planned(plant_name)
             
-            # Initialize results
-            retailer_results = []
-            google_results = []
-            marketplace_results = []
-            
-            # Process Google search results
-            if response.status_code != 200:
-                self.logger(f"Google search failed with status code: {response.status_code}")
-            else:
-                # Parse the HTML
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Check for CAPTCHA
-                if "unusual traffic" in soup.text.lower() or "captcha" in soup.text.lower() or "verify you're a human" in soup.text.lower():
-                    self.logger("CAPTCHA detected in BS4 search. Trying direct retailer websites...")
-                else:
-                    # Extract results with enhanced meta data extraction
-                    google_results = self.google_parser.extract_prices_from_soup(soup, plant_name)
+            # Search engines: Google, hedged with Bing
+            engine_results = self.search_engines(plant_name)
             
             # First source: Direct retailers
             retailer_results = self.search_direct_retailers(plant_name)
@@ -232,9 +357,9 @@ class PlantPriceScraper:
             # First, add retailer results
             results.extend(retailer_results)
             
-            # Next, add unique Google results
+            # Next, add unique search engine results
             existing_sources = {r.source for r in results}
-            for result in google_results:
+            for result in engine_results:
                 if result.source not in existing_sources:
                     results.append(result)
                     existing_sources.add(result.source)
@@ -261,28 +386,210 @@ class PlantPriceScraper:
             return results
             
         except Exception as e:
+            if raise_errors:
+                raise
             self.logger(f"Error in BS4 search: {str(e)}")
             # Still try direct retailers even if there's an error
             return self.search_direct_retailers(plant_name)
     
+    def search_plant_planned(self, plant_name):
+        """
+        Run the search stages in the order the source planner expects to fill the results fastest
+        
+        Stages are ordered by the expected hits per request of their sources and
+        the search stops once three priced results from different sources are in,
+        so low-yield stages are often never reached.
+        """
+        stages = {
+            "engines": lambda: self.search_engines(plant_name),
+            "retailer": lambda: self.search_direct_retailers(plant_name),
+            "marketplace": lambda: self.search_online_marketplaces(plant_name, priority_marketplaces=True),
+            "specialty": lambda: self.search_specialty_sites(plant_name)
+        }
+        sources = {
+            "engines": [ENGINE_SOURCE],
+            "retailer": [retailer.name for retailer in self.retailers],
+            "marketplace": [plan.name for plan in self.registry.marketplaces()],
+            "specialty": [plan.name for plan in self.registry.stage('specialty')]
+        }
+        
+        results = []
+        existing_sources = set()
+        for stage in self.source_planner.order_stages(plant_name, sources):
+            if not self.running:
+                break
+            for result in stages[stage]():
+                # "Not found" markers don't count towards the three prices
+                if result.price_cents is not None and result.source not in existing_sources:
+                    results.append(result)
+                    existing_sources.add(result.source)
+            if len(results) >= 3:
+                break
+        
+        if not results:
+            results.append(SearchResult(
+                plant_name=plant_name,
+                price="Not found",
+                source="No price found from any retailer"
+            ))
+        return results
+    
+    def search_google(self, plant_name):
+        """Search Google with a direct request and extract prices from the results page"""
+        # Construct search URL
+        search_term = format_search_term(plant_name)
+        url = f"https://www.google.com.au/search?q={search_term}&gl=au&hl=en&num=30"  # Increased results per page
+        
+        self.logger(f"Searching Google for: {plant_name}")
+        
+        # Make the request
+        response = self.fetcher.fetch(url, 'search', headers=get_request_headers(), timeout=10)
+        if response.status_code != 200:
+            self.logger(f"Google search failed with status code: {response.status_code}")
+            return []
+        
+        # Parse the HTML
+        soup = BeautifulSoup(response.text, 'html.parser')
+        
+        # Check for CAPTCHA
+        page_text = soup.text.lower()
+        if "unusual traffic" in page_text or "captcha" in page_text or "verify you're a human" in page_text:
+            self.logger("CAPTCHA detected in BS4 search. Trying other sources...")
+            return []
+        
+        # Extract results with enhanced meta data extraction
+        return self.google_parser.extract_prices_from_soup(soup, plant_name)
+    
+    def search_google_selenium(self, plant_name):
+        """Search Google in the browser and extract prices from the results page"""
+        # Construct search URL
+        search_term = format_search_term(plant_name)
+        url = f"https://www.google.com.au/search?q={search_term}&gl=au&hl=en&num=30"  # Increased results per page
+        
+        self.logger(f"Searching Google for: {plant_name}")
+        self.driver.get(url)
+        
+        # Check if there's a CAPTCHA
+        if self.detect_captcha():
+            self.logger("CAPTCHA detected!")
+            self.paused_for_captcha = True
+            return []
+        
+        # Wait for results to load
+        try:
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.ID, "search"))
+            )
+        except:
+            self.logger("No search results found or page structure changed")
+            return []
+        
+        # Use BeautifulSoup for parsing
+        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+        return self.google_parser.extract_prices_from_soup(soup, plant_name)
+    
+    def timed_search(self, engine, search, plant_name):
+        """Run one search engine query, recording its latency (errors give no results)"""
+        start = time.monotonic()
+        try:
+            return search(plant_name)
+        except Exception as e:
+            self.logger(f"Error in {engine} search: {str(e)}")
+            return []
+        finally:
+            self.engine_latency[engine].record(time.monotonic() - start)
+    
+    def search_engines(self, plant_name, google_search=None):
+        """
+        Search Google, hedged with Bing
+        
+        Google is queried first. Bing is only fired if Google hasn't answered
+        within its recent 90th percentile latency, or answered with nothing
+        (error, CAPTCHA, no prices). The first engine to come back with results
+        wins; results are deduplicated by canonical URL.
+        
+        Args:
+            plant_name: Name of the plant to search for
+            google_search: Function doing the Google query (defaults to search_google)
+            
+        Returns:
+            List of SearchResult objects
+        """
+        google_search = google_search or self.search_google
+        if not self.should_query(plant_name, ENGINE_SOURCE):
+            return []
+        started = self.source_started()
+        
+        google = self.engine_pool.submit(self.timed_search, "Google", google_search, plant_name)
+        done, _ = wait([google], timeout=self.engine_latency["Google"].hedge_delay())
+        if done and google.result():
+            results = dedupe_results_by_url(google.result())
+            self.record_source(plant_name, ENGINE_SOURCE, bool(results), started)
+            return results
+        
+        self.logger("Google is slow or returned nothing, also searching Bing...")
+        bing = self.engine_pool.submit(self.timed_search, "Bing", self.search_bing, plant_name)
+        
+        results = []
+        pending = {google, bing}
+        while pending and not results:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results.extend(future.result())
+        
+        # The browser can't be used for anything else until its search has finished
+        if google in pending and google_search == self.search_google_selenium:
+            results.extend(google.result())
+        
+        results = dedupe_results_by_url(results)
+        self.record_source(plant_name, ENGINE_SOURCE, bool(results), started)
+        return results
+    
     def search_direct_retailers(self, plant_name):
         """Search specific retailer websites directly"""
         results = []
         
-        for retailer in self.retailers:
+        # In catalog mode, answer from the local index and only search retailers it can't cover
+        retailers = self.retailers
+        if self.catalog:
+            results.extend(self.catalog.lookup(plant_name))
+            retailers = [r for r in self.retailers if not self.catalog.covers(r)]
+        
+        skipped = 0
+        for retailer in self.order_sources(plant_name, retailers, lambda r: r.name):
+            if not self.should_query(plant_name, retailer.name):
+                skipped += 1
+                continue
+            
+            found = len(results)
+            started = self.source_started()
+            failed = False
             try:
                 self.logger(f"Checking {retailer.name}...")
                 time.sleep(random.uniform(1, 2))
                 
+                # Shopify / WooCommerce stores answer from their JSON search, HTML is the fallback
+                if retailer.platform:
+                    with self.rate_limit(retailer.plan):
+                        products = self.platforms.search(retailer.platform, retailer.get_search_url(plant_name), plant_name)
+                    if products is not None:
+                        result = best_platform_product(products, plant_name, retailer.name)
+                        if result:
+                            results.append(result)
+                        continue
+                
                 # Get search URL for this retailer
-                url = retailer.get_search_url(plant_name.replace(' ', '+'))
+                url = retailer.get_search_url(plant_name)
                 
-                # Make the request
-                response = requests.get(url, headers=get_request_headers(), timeout=10)
+                # Make the request, reading only up to the first 5 product cards
+                with self.rate_limit(retailer.plan):
+                    response = self.fetcher.fetch(url, 'retailer', headers=get_request_headers(), timeout=10,
+                                                  selector=retailer.product_selector, node_count=5)
+                failed = response.status_code != 200
                 
                 if response.status_code == 200:
                     # Parse the result
-                    parser = RetailerParser(retailer, logger=self.logger)
+                    parser = RetailerParser(retailer, logger=self.logger, fragments=self.fragments)
                     result = parser.parse_product_page(response.text, plant_name)
                     
                     if result:
@@ -290,9 +597,12 @@ class PlantPriceScraper:
                     
             except Exception as e:
                 self.logger(f"Error searching {retailer.name}: {str(e)}")
+                failed = True
+            finally:
+                self.record_source(plant_name, retailer.name, len(results) > found, started, failed)
         
         # If no results from any retailer, return a not found result
-        if not results:
+        if not results and not skipped:
             results.append(SearchResult(
                 plant_name=plant_name,
                 price="Not found",
@@ -311,7 +621,7 @@ class PlantPriceScraper:
             url = f"https://www.bing.com/search?q={search_term}&cc=au"
             
             # Make the request
-            response = requests.get(url, headers=get_request_headers(), timeout=10)
+            response = self.fetcher.fetch(url, 'search', headers=get_request_headers(), timeout=10)
             
             if response.status_code != 200:
                 self.logger(f"Bing search failed with status code: {response.status_code}")
@@ -322,24 +632,24 @@ class PlantPriceScraper:
             
             # Extract prices - try to find product listings first
             results = []
-            price_pattern = r'\$\d{1,3}(?:,\d{3})*(?:\.\d{2})?'
+            price_pattern = PRICE_PATTERN
+            matcher = get_matcher(plant_name)
             
             # Look for Bing Shopping results
             shopping_results = soup.select('div.b_ad li.b_adLastChild, div.cico')
             for result in shopping_results:
                 result_text = result.get_text()
-                price_match = re.search(price_pattern, result_text)
-                if price_match and any(word.lower() in result_text.lower() for word in plant_name.split()):
+                price_match = price_pattern.search(result_text)
+                if price_match and matcher.score(result_text) >= RELATED_SCORE:
                     # Try to find the link
                     link = result.find('a')
-                    source = "Bing Shopping"
-                    if link and link.has_attr('href'):
-                        source = f"Bing Shopping: {link['href']}"
+                    url = link['href'] if link and link.has_attr('href') else None
                     
                     results.append(SearchResult(
                         plant_name=plant_name,
-                        price=price_match.group(0),
-                        source=source
+                        price=price_from_match(price_match),
+                        retailer="Bing Shopping",
+                        url=url
                     ))
             
             # Look for organic results with meta title/description
@@ -351,33 +661,31 @@ class PlantPriceScraper:
                 
                 if title:
                     title_text = title.get_text()
-                    price_match = re.search(price_pattern, title_text)
-                    if price_match and any(word.lower() in title_text.lower() for word in plant_name.split()):
+                    price_match = price_pattern.search(title_text)
+                    if price_match and matcher.score(title_text) >= RELATED_SCORE:
                         link = title.find('a')
-                        source = "Bing Result"
-                        if link and link.has_attr('href'):
-                            source = f"Bing Result: {link['href']}"
+                        url = link['href'] if link and link.has_attr('href') else None
                         
                         results.append(SearchResult(
                             plant_name=plant_name,
-                            price=price_match.group(0),
-                            source=source
+                            price=price_from_match(price_match),
+                            retailer="Bing Result",
+                            url=url
                         ))
                         continue
                 
                 if meta:
                     meta_text = meta.get_text()
-                    price_match = re.search(price_pattern, meta_text)
-                    if price_match and any(word.lower() in meta_text.lower() for word in plant_name.split()):
+                    price_match = price_pattern.search(meta_text)
+                    if price_match and matcher.score(meta_text) >= RELATED_SCORE:
                         link = title.find('a') if title else None
-                        source = "Bing Result"
-                        if link and link.has_attr('href'):
-                            source = f"Bing Result: {link['href']}"
+                        url = link['href'] if link and link.has_attr('href') else None
                         
                         results.append(SearchResult(
                             plant_name=plant_name,
-                            price=price_match.group(0),
-                            source=source
+                            price=price_from_match(price_match),
+                            retailer="Bing Result",
+                            url=url
                         ))
             
             return results[:3]  # Return top 3 results
@@ -386,133 +694,116 @@ class PlantPriceScraper:
             self.logger(f"Error in Bing search: {str(e)}")
             return []
     
+    def get_specialty_sites(self, plant_name):
+        """Specialty plant sites with their search URLs for a plant, from the site registry"""
+        return [plan.site(plant_name) for plan in self.registry.stage('specialty')]
+        
     def search_specialty_sites(self, plant_name):
         """Search specialty plant websites directly"""
         self.logger(f"Searching specialty plant sites for: {plant_name}")
         
-        specialty_sites = [
-            {
-                "name": "Plantary",
-                "url": f"https://plantary.com.au/search?q={plant_name.replace(' ', '+')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.product-grid-item",
-                "price_selector": "span.price"
-            },
-            {
-                "name": "Plant Farm",
-                "url": f"https://www.plant-farm.com.au/search?type=product&q={plant_name.replace(' ', '+')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.product-item",
-                "price_selector": "span.price"
-            },
-            {
-                "name": "Little Succers",
-                "url": f"https://littlesuccers.com.au/search?q={plant_name.replace(' ', '+')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.product-details",
-                "price_selector": "span.price"
-            },
-            {
-                "name": "Plants in a Box",
-                "url": f"https://plantsinabox.com.au/search?q={plant_name.replace(' ', '+')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.productitem",
-                "price_selector": "span.price"
-            },
-            {
-                "name": "Seed World",
-                "url": f"https://seedworld.com.au/search?q={plant_name.replace(' ', '+')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.product",
-                "price_selector": "span.price"
-            },
-            # Additional specialty sites
-            {
-                "name": "The Succulent Garden",
-                "url": f"https://thesucculentgarden.com.au/search?q={plant_name.replace(' ', '+')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.grid-product",
-                "price_selector": "span.price"
-            },
-            {
-                "name": "Collectors Corner",
-                "url": f"https://collectorscorner.com.au/search?q={plant_name.replace(' ', '+')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.product-item",
-                "price_selector": "span.price"
-            },
-            {
-                "name": "Huge Cactus",
-                "url": f"https://hugecactus.com.au/search?q={plant_name.replace(' ', '+')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.product-item",
-                "price_selector": "span.price"
-            },
-            {
-                "name": "Hello Succulents",
-                "url": f"https://hellosucculents.com.au/?s={plant_name.replace(' ', '+')}&post_type=product",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "li.product",
-                "price_selector": "span.woocommerce-Price-amount"
-            }
-        ]
+        specialty_sites = self.get_specialty_sites(plant_name)
         
         results = []
+        matcher = get_matcher(plant_name)
         
-        for site in specialty_sites:
+        for site in self.order_sources(plant_name, specialty_sites, lambda s: s['name']):
+            if not self.should_query(plant_name, site['name']):
+                continue
+            
+            found = len(results)
+            started = self.source_started()
+            failed = False
             try:
                 self.logger(f"Checking {site['name']}...")
                 random_delay(1, 2, self.logger)
+                plan = site["plan"]
+                
+                # Shopify / WooCommerce stores answer from their JSON search, HTML is the fallback
+                if site.get("platform"):
+                    with plan.rate_limit:
+                        products = self.platforms.search(site["platform"], site["url"], plant_name)
+                    if products is not None:
+                        result = best_platform_product(products, plant_name, site['name'])
+                        if result:
+                            self.logger(f"Found {site['name']} product with price: {result.price}")
+                            results.append(result)
+                        continue
                 
-                response = requests.get(site["url"], headers=get_request_headers(), timeout=10)
+                with plan.rate_limit:
+                    response = self.fetcher.fetch(site["url"], 'retailer', headers=get_request_headers(), timeout=10,
+                                                  selector=site["product_selector"], node_count=3)
+                failed = response.status_code != 200
                 
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Look for products
-                    products = soup.select(site["product_selector"])
-                    self.logger(f"Found {len(products)} products on {site['name']}")
-                    
-                    for product in products[:3]:  # Check first 3 products
-                        # Try to get price using the specific selector first
-                        price_element = None
-                        if "price_selector" in site:
-                            price_element = product.select_one(site["price_selector"])
-                        
-                        if price_element:
-                            price_text = price_element.get_text().strip()
-                            price_match = re.search(site["price_pattern"], price_text)
-                        else:
-                            product_text = product.get_text().strip()
-                            price_match = re.search(site["price_pattern"], product_text)
-                            
-                        # Check if product is relevant and has a price
-                        if price_match and any(word.lower() in product.get_text().lower() for word in plant_name.split()):
-                            # Get URL if possible
-                            product_url = site["url"]
-                            a_tags = product.select('a')
-                            if a_tags and a_tags[0].has_attr('href'):
-                                href = a_tags[0]['href']
-                                if href.startswith('/'):
-                                    domain = re.search(r'https?://(?:www\.)?([^/]+)', site["url"])
-                                    if domain:
-                                        product_url = f"https://{domain.group(1)}{href}"
-                                else:
-                                    product_url = href
-                            
-                            self.logger(f"Found {site['name']} product with price: {price_match.group(0)}")
-                            results.append(SearchResult(
-                                plant_name=plant_name,
-                                price=price_match.group(0),
-                                source=f"{site['name']} - {product_url}"
-                            ))
-                            break  # Only get one result per specialty site
+                    result = self.parse_specialty_page(site, response.text, plant_name, matcher)
+                    if result:
+                        results.append(result)
                     
             except Exception as e:
                 self.logger(f"Error searching {site['name']}: {str(e)}")
+                failed = True
+            finally:
+                self.record_source(plant_name, site['name'], len(results) > found, started, failed)
         
         return results
     
+    def parse_specialty_page(self, site, html, plant_name, matcher=None):
+        """
+        First relevant, priced product on a specialty site's search page
+        
+        Args:
+            site: Site dictionary from get_specialty_sites
+            html: Search page HTML
+            plant_name: Plant that was searched for
+            matcher: Plant name matcher (built from plant_name if not given)
+        
+        Returns:
+            SearchResult or None
+        """
+        matcher = matcher or get_matcher(plant_name)
+        plan = site["plan"]
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Look for products
+        products = plan.select(soup, site["product_selector"])
+        self.logger(f"Found {len(products)} products on {site['name']}")
+        
+        for product in products[:3]:  # Check first 3 products
+            # Try to get price using the specific selector first
+            price_element = None
+            if "price_selector" in site:
+                price_element = plan.select_one(product, site["price_selector"])
+            
+            if price_element:
+                price_text = price_element.get_text().strip()
+                price_match = site["price_pattern"].search(price_text)
+            else:
+                product_text = product.get_text().strip()
+                price_match = site["price_pattern"].search(product_text)
+                
+            # Check if product is relevant and has a price
+            if price_match and matcher.score(product.get_text()) >= RELATED_SCORE:
+                # Get URL if possible
+                product_url = site["url"]
+                a_tags = product.select('a')
+                if a_tags and a_tags[0].has_attr('href'):
+                    product_url = plan.absolute_url(a_tags[0]['href'])
+                
+                self.logger(f"Found {site['name']} product with price: {price_match.group(0)}")
+                return SearchResult(
+                    plant_name=plant_name,
+                    price=price_from_match(price_match),
+                    retailer=site['name'],
+                    url=product_url
+                )  # Only get one result per specialty site
+        
+        return None
+    
+    def get_marketplaces(self, plant_name, priority_marketplaces=False):
+        """Online marketplaces with their search URLs for a plant (eBay and Amazon first when prioritized)"""
+        return [plan.site(plant_name) for plan in self.registry.marketplaces(priority_marketplaces)]
+    
     def search_online_marketplaces(self, plant_name, priority_marketplaces=False):
         """
         Search online marketplaces for plant prices
@@ -523,188 +814,47 @@ class PlantPriceScraper:
         """
         self.logger(f"Searching online marketplaces for: {plant_name}")
         
-        # If we want to prioritize eBay and Amazon, put them first
-        if priority_marketplaces:
-            marketplaces = [
-                {
-                    "name": "eBay Australia",
-                    "url": f"https://www.ebay.com.au/sch/i.html?_nkw={plant_name.replace(' ', '+')}+plant&_sacat=0",
-                    "price_pattern": r'\$\d+(?:\.\d{2})?',
-                    "product_selector": "li.s-item",
-                    "title_selector": "div.s-item__title",
-                    "price_selector": "span.s-item__price",
-                    "link_selector": "a.s-item__link"
-                },
-                {
-                    "name": "Amazon Australia",
-                    "url": f"https://www.amazon.com.au/s?k={plant_name.replace(' ', '+')}+plant",
-                    "price_pattern": r'\$\d+(?:\.\d{2})?',
-                    "product_selector": "div.s-result-item[data-component-type='s-search-result']",
-                    "title_selector": "h2 a span",
-                    "price_selector": "span.a-price-whole",
-                    "link_selector": "h2 a.a-link-normal"
-                },
-                {
-                    "name": "Etsy",
-                    "url": f"https://www.etsy.com/au/search?q={plant_name.replace(' ', '+')}+plant",
-                    "price_pattern": r'\$\d+(?:\.\d{2})?',
-                    "product_selector": "div.wt-grid__item-xs-6",
-                    "title_selector": "h3",
-                    "price_selector": "span.currency-value",
-                    "link_selector": "a.listing-link"
-                }
-            ]
-        else:
-            marketplaces = [
-                {
-                    "name": "Etsy",
-                    "url": f"https://www.etsy.com/au/search?q={plant_name.replace(' ', '+')}+plant",
-                    "price_pattern": r'\$\d+(?:\.\d{2})?',
-                    "product_selector": "div.wt-grid__item-xs-6",
-                    "title_selector": "h3",
-                    "price_selector": "span.currency-value",
-                    "link_selector": "a.listing-link"
-                },
-                {
-                    "name": "eBay Australia",
-                    "url": f"https://www.ebay.com.au/sch/i.html?_nkw={plant_name.replace(' ', '+')}+plant&_sacat=0",
-                    "price_pattern": r'\$\d+(?:\.\d{2})?',
-                    "product_selector": "li.s-item",
-                    "title_selector": "div.s-item__title",
-                    "price_selector": "span.s-item__price",
-                    "link_selector": "a.s-item__link"
-                },
-                {
-                    "name": "Amazon Australia",
-                    "url": f"https://www.amazon.com.au/s?k={plant_name.replace(' ', '+')}+plant",
-                    "price_pattern": r'\$\d+(?:\.\d{2})?',
-                    "product_selector": "div.s-result-item[data-component-type='s-search-result']",
-                    "title_selector": "h2 a span",
-                    "price_selector": "span.a-price-whole",
-                    "link_selector": "h2 a.a-link-normal"
-                }
-            ]
+        marketplaces = self.get_marketplaces(plant_name, priority_marketplaces)
         
         results = []
+        matcher = get_matcher(plant_name)
         
         for marketplace in marketplaces:
+            if not self.should_query(plant_name, marketplace['name']):
+                continue
+            
+            found = len(results)
+            started = self.source_started()
+            failed = False
             try:
                 self.logger(f"Checking {marketplace['name']}...")
                 random_delay(1, 2, self.logger)
                 
-                # Set specific headers for marketplaces to avoid bot detection
-                headers = get_request_headers()
-                if "ebay" in marketplace["url"]:
-                    headers["Accept"] = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8"
-                    headers["Referer"] = "https://www.ebay.com.au/"
-                elif "amazon" in marketplace["url"]:
-                    headers["Accept"] = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8"
-                    headers["Referer"] = "https://www.amazon.com.au/"
-                elif "etsy" in marketplace["url"]:
-                    headers["Accept"] = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8"
-                    headers["Referer"] = "https://www.etsy.com/"
-                
-                response = requests.get(marketplace["url"], headers=headers, timeout=15)
+                # Marketplace plans carry a referer to avoid bot detection
+                plan = marketplace["plan"]
+                with plan.rate_limit:
+                    response = self.fetcher.fetch(marketplace["url"], 'marketplace', headers=plan.request_headers(),
+                                                  timeout=15, selector=marketplace["product_selector"], node_count=10)
+                failed = response.status_code != 200
                 
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Look for products
-                    products = soup.select(marketplace["product_selector"])
-                    self.logger(f"Found {len(products)} products on {marketplace['name']}")
-                    
-                    found_products = 0
-                    for product in products[:10]:  # Check first 10 products
-                        # Try specific selectors first for more accurate results
-                        title_elem = product.select_one(marketplace["title_selector"])
-                        price_elem = product.select_one(marketplace["price_selector"])
-                        link_elem = product.select_one(marketplace["link_selector"])
-                        
-                        if title_elem and price_elem:
-                            title_text = title_elem.get_text().strip()
-                            price_text = price_elem.get_text().strip()
-                            
-                            # Improved relevance check
-                            plant_words = [word.lower() for word in plant_name.split() if len(word) > 2]
-                            title_lower = title_text.lower()
-                            
-                            # Count matching words for better relevance
-                            matching_words = sum(1 for word in plant_words if word in title_lower)
-                            is_relevant = matching_words >= len(plant_words) * 0.5  # At least half the words match
-                            
-                            if is_relevant:
-                                # Extract price using regex if needed
-                                price_match = re.search(marketplace["price_pattern"], price_text)
-                                if not price_match:
-                                    price_match = re.search(marketplace["price_pattern"], product.get_text().strip())
-                                
-                                if price_match:
-                                    product_url = marketplace["url"]
-                                    if link_elem and link_elem.has_attr('href'):
-                                        product_url = link_elem['href']
-                                        if not product_url.startswith('http'):
-                                            # Handle relative URLs
-                                            if "ebay" in marketplace["url"]:
-                                                product_url = f"https://www.ebay.com.au{product_url}"
-                                            elif "amazon" in marketplace["url"]:
-                                                product_url = f"https://www.amazon.com.au{product_url}"
-                                            elif "etsy" in marketplace["url"]:
-                                                product_url = f"https://www.etsy.com{product_url}"
-                                    
-                                    self.logger(f"Found {marketplace['name']} product: {title_text} - {price_match.group(0)}")
-                                    results.append(SearchResult(
-                                        plant_name=plant_name,
-                                        price=price_match.group(0),
-                                        source=f"{marketplace['name']} - {title_text[:30]}... - {product_url}"
-                                    ))
-                                    found_products += 1
-                                    if found_products >= 2 and priority_marketplaces:  # Get two results per marketplace when prioritizing
-                                        break
-                                    elif found_products >= 1 and not priority_marketplaces:  # Otherwise just get one
-                                        break
-                        
-                        # If specific selectors failed, try generic text search as fallback
-                        if found_products == 0:
-                            product_text = product.get_text()
-                            plant_words = [word.lower() for word in plant_name.split() if len(word) > 2]
-                            product_lower = product_text.lower()
-                            
-                            # Count matching words for better relevance
-                            matching_words = sum(1 for word in plant_words if word in product_lower)
-                            is_relevant = matching_words >= len(plant_words) * 0.5  # At least half the words match
-                            
-                            if is_relevant:
-                                price_match = re.search(marketplace["price_pattern"], product_text)
-                                if price_match:
-                                    a_tags = product.select('a')
-                                    product_url = marketplace["url"]
-                                    if a_tags and a_tags[0].has_attr('href'):
-                                        product_url = a_tags[0]['href']
-                                    
-                                    # Extract a simple title from the product text
-                                    title_extract = product_text[:50].strip().replace('\n', ' ')
-                                    
-                                    results.append(SearchResult(
-                                        plant_name=plant_name,
-                                        price=price_match.group(0),
-                                        source=f"{marketplace['name']} - {title_extract}... - {product_url}"
-                                    ))
-                                    found_products += 1
-                                    if found_products >= 2 and priority_marketplaces:
-                                        break
-                                    elif found_products >= 1 and not priority_marketplaces:
-                                        break
+                    results.extend(self.parse_marketplace_page(marketplace, response.text, plant_name,
+                                                               priority_marketplaces, matcher))
                     
             except Exception as e:
                 self.logger(f"Error searching {marketplace['name']}: {str(e)}")
+                failed = True
+            finally:
+                self.record_source(plant_name, marketplace['name'], len(results) > found, started, failed)
         
         # For priority marketplaces, make sure results are eBay/Amazon first if available
         if priority_marketplaces and results:
             priority_results = []
             other_results = []
+            prioritized = {plan.name for plan in self.registry.marketplaces() if plan.prioritized}
             
             for result in results:
-                if "eBay" in result.source or "Amazon" in result.source:
+                if result.retailer in prioritized:
                     priority_results.append(result)
                 else:
                     other_results.append(result)
@@ -714,6 +864,111 @@ class PlantPriceScraper:
         else:
             return results
     
+    def parse_marketplace_page(self, marketplace, html, plant_name, priority_marketplaces=False, matcher=None):
+        """
+        Relevant, priced listings on a marketplace search page (two in priority mode, otherwise one)
+        
+        Args:
+            marketplace: Site dictionary from get_marketplaces
+            html: Search page HTML
+            plant_name: Plant that was searched for
+            priority_marketplaces: Keep two listings instead of one
+            matcher: Plant name matcher (built from plant_name if not given)
+        
+        Returns:
+            List of SearchResult
+        """
+        matcher = matcher or get_matcher(plant_name)
+        plan = marketplace["plan"]
+        
+        # Reuse the previous results if the page hasn't changed since the last fetch, without parsing it
+        # (priority mode keeps two results per marketplace, so it is cached separately)
+        fragment_key = (marketplace["product_selector"], priority_marketplaces)
+        fingerprint = self.fragments.fingerprint(html, marketplace["product_selector"])
+        cached = self.fragments.get(marketplace["url"], fragment_key, fingerprint)
+        if cached is not None:
+            return cached
+        
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Look for products (only the first 10 are checked)
+        products = plan.select(soup, marketplace["product_selector"])[:10]
+        self.logger(f"Found {len(products)} products on {marketplace['name']}")
+        results = []
+        
+        found_products = 0
+        for product in products:
+            # Try specific selectors first for more accurate results
+            title_elem = plan.select_one(product, marketplace["title_selector"])
+            price_elem = plan.select_one(product, marketplace["price_selector"])
+            link_elem = plan.select_one(product, marketplace["link_selector"])
+            
+            if title_elem and price_elem:
+                title_text = title_elem.get_text().strip()
+                price_text = price_elem.get_text().strip()
+                
+                # Relevance check: roughly half the plant words must match the title
+                relevance_score = matcher.score(title_text)
+                
+                if relevance_score >= PARTIAL_MATCH_SCORE:
+                    # Extract price using regex if needed
+                    price_match = marketplace["price_pattern"].search(price_text)
+                    if not price_match:
+                        price_match = marketplace["price_pattern"].search(product.get_text().strip())
+                    
+                    if price_match:
+                        product_url = marketplace["url"]
+                        if link_elem and link_elem.has_attr('href'):
+                            product_url = plan.absolute_url(link_elem['href'])
+                        
+                        self.logger(f"Found {marketplace['name']} product: {title_text} - {price_match.group(0)}")
+                        results.append(SearchResult(
+                            plant_name=plant_name,
+                            price=price_from_match(price_match),
+                            retailer=marketplace['name'],
+                            title=title_text,
+                            url=product_url,
+                            relevance_score=relevance_score
+                        ))
+                        found_products += 1
+                        if found_products >= 2 and priority_marketplaces:  # Get two results per marketplace when prioritizing
+                            break
+                        elif found_products >= 1 and not priority_marketplaces:  # Otherwise just get one
+                            break
+            
+            # If specific selectors failed, try generic text search as fallback
+            if found_products == 0:
+                product_text = product.get_text()
+                relevance_score = matcher.score(product_text)
+                
+                if relevance_score >= PARTIAL_MATCH_SCORE:
+                    price_match = marketplace["price_pattern"].search(product_text)
+                    if price_match:
+                        a_tags = product.select('a')
+                        product_url = marketplace["url"]
+                        if a_tags and a_tags[0].has_attr('href'):
+                            product_url = a_tags[0]['href']
+                        
+                        # Extract a simple title from the product text
+                        title_extract = product_text[:50].strip().replace('\n', ' ')
+                        
+                        results.append(SearchResult(
+                            plant_name=plant_name,
+                            price=price_from_match(price_match),
+                            retailer=marketplace['name'],
+                            title=title_extract,
+                            url=product_url,
+                            relevance_score=relevance_score
+                        ))
+                        found_products += 1
+                        if found_products >= 2 and priority_marketplaces:
+                            break
+                        elif found_products >= 1 and not priority_marketplaces:
+                            break
+        
+        self.fragments.put(marketplace["url"], fragment_key, fingerprint, results)
+        return results
+    
     def close_driver(self):
         """Close the Selenium WebDriver if it exists"""
         if self.driver:
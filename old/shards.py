@@ -0,0 +1,247 @@
+import multiprocessing
+import queue
+import sys
+import time
+
+import pandas as pd
+
+from models import PlantPriceResults
+from registry import DEFAULT_RATE_LIMIT_PATH
+from sources import SourcePlanner
+from utils import group_duplicate_plant_names
+
+def split_shards(plant_names, shard_count):
+    """
+    Deal plant names round-robin into shards
+    
+    Round-robin rather than contiguous blocks, so slow stretches of the list
+    (e.g. a run of rare plants) are spread over every shard.
+    
+    Returns:
+        List of shards, each a list of (input index, plant name)
+    """
+    shard_count = max(1, min(shard_count, len(plant_names)))
+    shards = [[] for _ in range(shard_count)]
+    for index, plant_name in enumerate(plant_names):
+        shards[index % shard_count].append((index, plant_name))
+    return shards
+
+def run_shard(shard, items, options, events, stop_event):
+    """
+    Process entry point: search one shard's plants with a scraper (and browser) of its own
+    
+    Everything the parent needs is sent as events: ('log', shard, message),
+    ('result', shard, index, plant_name, results), ('planner', shard, records)
+    with the shard's source planner records, and finally ('done', shard).
+    Shards only read the catalog index and statistics files; the parent crawls
+    and saves them.
+    
+    Args:
+        shard: Shard number
+        items: (input index, plant name) pairs to search
+        options: Dictionary with method ('selenium' or 'bs4'), rate_limit_path, http2, catalog_path and planner_path
+            (None when the catalog index or source planner is off)
+        events: multiprocessing queue to the parent
+        stop_event: multiprocessing Event set when the run is stopped
+    """
+    from scraper import PlantPriceScraper
+    
+    logger = lambda message: events.put(('log', shard, message))
+    scraper = PlantPriceScraper(logger=logger)
+    try:
+        # Every shard draws on the same per-host request budget
+        scraper.registry.share_rate_limits(options.get('rate_limit_path', DEFAULT_RATE_LIMIT_PATH))
+        scraper.use_http2(options.get('http2', False))
+        if options.get('catalog_path'):
+            scraper.enable_catalog_mode(options['catalog_path'], refresh=False)
+        if options.get('planner_path'):
+            scraper.enable_source_planner(options['planner_path'])
+            scraper.source_planner.journal = []
+        selenium = options.get('method') == "selenium"
+        if selenium:
+            scraper.setup_driver()
+        scraper.start()
+        scraper.warm_up()
+        
+        for index, plant_name in items:
+            if stop_event.is_set() or not scraper.running:
+                break
+            try:
+                if selenium:
+                    results = scraper.search_plant_selenium(plant_name)
+                    # Nobody is watching this shard's browser, so a CAPTCHA pause is never lifted:
+                    # the shard's remaining plants are searched with Bing only
+                    if scraper.engine_backlog == [plant_name]:
+                        logger(f"CAPTCHA in shard {shard + 1} browser, skipping Google from {plant_name} on")
+                else:
+                    results = scraper.search_plant_bs4(plant_name)
+            except Exception as e:
+                logger(f"Error searching {plant_name}: {str(e)}")
+                results = []
+            events.put(('result', shard, index, plant_name, results))
+    except Exception as e:
+        logger(f"Shard {shard + 1} failed: {str(e)}")
+    finally:
+        scraper.close_driver()
+        if scraper.source_planner:
+            events.put(('planner', shard, scraper.source_planner.journal))
+        events.put(('done', shard))
+
+class ShardedRun:
+    """
+    Search a plant list split over several processes and merge the results in input order
+    
+    Each shard runs in its own process with its own PlantPriceScraper (and
+    browser in Selenium mode), so searches aren't limited by one interpreter
+    or one browser. Per-host rate limits are shared by all shards through a
+    SQLite coordination file, so the shards together keep to each site's
+    limit. Results and log messages come back over one queue, which gives a
+    single progress count for the whole run.
+    
+    Files the shards would otherwise all write are handled by the parent:
+    stale retailer catalogs are crawled once before the shards start (they
+    only read the index), and the shards' source planner records are
+    replayed into one planner and saved after they finish.
+    """
+    
+    def __init__(self, plant_names, shard_count=4, method="bs4", rate_limit_path=DEFAULT_RATE_LIMIT_PATH,
+                 http2=False, catalog=False, planner=False, logger=None, catalog_path="catalog_index.json",
+                 planner_path="source_stats.json"):
+        """
+        Args:
+            plant_names: Plant names to search (already deduplicated)
+            shard_count: Number of processes
+            method: "selenium" or "bs4"
+            rate_limit_path: SQLite file the shards coordinate rate limits through
+            http2, catalog, planner: Scraper options applied in every shard
+            logger: Function to call with log messages
+            catalog_path: Catalog index file, when catalog is set
+            planner_path: Source statistics file, when planner is set
+        """
+        self.plant_names = list(plant_names)
+        self.shards = split_shards(self.plant_names, shard_count)
+        self.options = {
+            'method': method,
+            'rate_limit_path': rate_limit_path,
+            'http2': http2,
+            'catalog_path': catalog_path if catalog else None,
+            'planner_path': planner_path if planner else None
+        }
+        self.logger = logger or (lambda msg: None)
+        # Spawned rather than forked: each shard starts clean of the parent's threads, sockets and browser
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = self.context.Event()
+        self.completed = [0] * len(self.shards)
+        self.results = {}  # input index -> results
+        self.planner_records = []  # Source planner records sent back by the shards
+    
+    def run(self, on_result=None, on_progress=None):
+        """
+        Start the shards and wait for them to finish
+        
+        Args:
+            on_result: Called with (plant_name, results) as each plant completes
+            on_progress: Called with (plants completed, total plants) after each plant
+        
+        Returns:
+            List of (plant_name, results) in input order (plants never searched are left out)
+        """
+        if self.options['catalog_path']:
+            self.refresh_catalog()
+        
+        events = self.context.Queue()
+        processes = [
+            self.context.Process(target=run_shard, args=(shard, items, self.options, events, self.stop_event), daemon=True)
+            for shard, items in enumerate(self.shards)
+        ]
+        for process in processes:
+            process.start()
+        self.logger(f"Searching {len(self.plant_names)} plants in {len(processes)} processes")
+        
+        running = len(processes)
+        while running:
+            try:
+                event = events.get(timeout=1)
+            except queue.Empty:
+                # A shard killed outright never sends 'done'
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+            
+            kind, shard = event[0], event[1]
+            if kind == 'log':
+                self.logger(f"[{shard + 1}] {event[2]}")
+            elif kind == 'result':
+                index, plant_name, results = event[2:]
+                self.results[index] = results
+                self.completed[shard] += 1
+                if on_result:
+                    on_result(plant_name, results)
+                if on_progress:
+                    on_progress(len(self.results), len(self.plant_names))
+            elif kind == 'planner':
+                self.planner_records.extend(event[2])
+            elif kind == 'done':
+                running -= 1
+        
+        for process in processes:
+            process.join(timeout=10)
+        if self.options['planner_path']:
+            self.save_planner_statistics()
+        return [(self.plant_names[index], self.results[index]) for index in sorted(self.results)]
+    
+    def refresh_catalog(self):
+        """Crawl stale retailer catalogs once, in this process, before the shards read the index"""
+        from scraper import PlantPriceScraper
+        
+        scraper = PlantPriceScraper(logger=self.logger)
+        try:
+            scraper.registry.share_rate_limits(self.options['rate_limit_path'])
+            scraper.enable_catalog_mode(self.options['catalog_path'])
+        finally:
+            scraper.fetcher.close()
+    
+    def save_planner_statistics(self):
+        """Add every shard's source queries to the saved statistics, as if one process had made them"""
+        planner = SourcePlanner(self.options['planner_path'])
+        for record in self.planner_records:
+            planner.record(*record)
+        planner.save()
+        self.logger(f"Saved source statistics for {len(self.planner_records)} queries")
+    
+    def stop(self):
+        """Ask every shard to stop after its current plant"""
+        self.stop_event.set()
+    
+    def describe(self):
+        """Progress of each shard for the log"""
+        shards = ", ".join(f"{shard + 1}: {done}/{len(items)}"
+                           for shard, (done, items) in enumerate(zip(self.completed, self.shards)))
+        return f"Shards: {sum(self.completed)}/{len(self.plant_names)} plants ({shards})"
+
+if __name__ == "__main__":
+    # python shards.py plants.txt [processes] [bs4|selenium] [results.csv]
+    with open(sys.argv[1], 'r') as f:
+        input_names = [line.strip() for line in f if line.strip()]
+    shard_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    method = sys.argv[3] if len(sys.argv) > 3 else "bs4"
+    output_path = sys.argv[4] if len(sys.argv) > 4 else "results.csv"
+    
+    jobs = group_duplicate_plant_names(input_names)
+    run = ShardedRun([search_name for search_name, _ in jobs], shard_count, method, logger=print)
+    started = time.monotonic()
+    merged = dict(run.run(on_progress=lambda done, total: print(f"{done}/{total} plants")))
+    print(run.describe())
+    
+    # One row per input line, in input order (lines without a searchable name get an empty row)
+    rows = [dict(PlantPriceResults(input_name).to_dict(), plant_name=input_name) for input_name in input_names]
+    for search_name, indices in jobs:
+        plant_results = PlantPriceResults(search_name)
+        for result in merged.get(search_name, []):
+            plant_results.add_result(result)
+        for index in indices:
+            row = plant_results.to_dict()
+            row["plant_name"] = input_names[index]
+            rows[index] = row
+    pd.DataFrame(rows).to_csv(output_path, index=False)
+    print(f"Results for {len(merged)} plants saved to {output_path} in {time.monotonic() - started:.0f}s")
@@ -0,0 +1,231 @@
+import json
+import os
+import random
+import threading
+
+from matcher import tokenize, stem_word
+
+# Keyword stems that put a plant in a category; sources are ranked per category
+# because a succulent nursery that never stocks natives shouldn't be judged on them
+PLANT_CATEGORIES = {
+    'succulent': ['echeveria', 'haworthia', 'crassula', 'aloe', 'sedum', 'agave', 'sempervivum', 'graptopetalum',
+                  'graptoveria', 'kalanchoe', 'aeonium', 'senecio', 'gasteria', 'pachyphytum', 'succulent'],
+    'cactus': ['cactus', 'cacti', 'mammillaria', 'opuntia', 'echinopsis', 'gymnocalycium', 'astrophytum',
+               'rebutia', 'cereus', 'ferocactus', 'euphorbia'],
+    'native': ['grevillea', 'banksia', 'callistemon', 'bottlebrush', 'eucalyptus', 'acacia', 'wattle', 'westringia',
+               'lomandra', 'anigozanthos', 'kangaroo', 'correa', 'leptospermum', 'melaleuca', 'boronia', 'waratah'],
+    'indoor': ['monstera', 'philodendron', 'anthurium', 'calathea', 'hoya', 'alocasia', 'pothos', 'epipremnum',
+               'ficus', 'peperomia', 'syngonium', 'begonia', 'fern', 'orchid', 'spathiphyllum'],
+    'edible': ['tomato', 'basil', 'mint', 'rosemary', 'thyme', 'lemon', 'lime', 'citrus', 'apple', 'fig', 'olive',
+               'blueberry', 'strawberry', 'chilli', 'herb']
+}
+GENERAL_CATEGORY = 'general'
+
+# Query counts are multiplied by this after every recorded query of the same source,
+# so a source's ranking follows what it has done lately rather than since the first run
+DECAY = 0.98
+
+_CATEGORY_BY_STEM = {stem_word(word): category for category, words in PLANT_CATEGORIES.items() for word in words}
+
+def plant_category(plant_name):
+    """Category of a plant name ('succulent', 'native', ...) or GENERAL_CATEGORY"""
+    for token in tokenize(plant_name):
+        category = _CATEGORY_BY_STEM.get(token)
+        if category:
+            return category
+    return GENERAL_CATEGORY
+
+class SourceStats:
+    """Decayed query, hit, latency and bandwidth totals for one source (optionally within one plant category)"""
+    __slots__ = ('queries', 'hits', 'seconds', 'bytes')
+    
+    def __init__(self, queries=0.0, hits=0.0, seconds=0.0, bytes=0.0):
+        self.queries = queries
+        self.hits = hits
+        self.seconds = seconds
+        self.bytes = bytes
+    
+    def add(self, hit, seconds, bytes_read, decay=DECAY):
+        self.queries = self.queries * decay + 1
+        self.hits = self.hits * decay + (1 if hit else 0)
+        self.seconds = self.seconds * decay + seconds
+        self.bytes = self.bytes * decay + bytes_read
+    
+    def hit_rate(self, prior=0.5, weight=2.0):
+        """Hit rate smoothed towards prior, which counts as `weight` queries"""
+        return (self.hits + prior * weight) / (self.queries + weight)
+    
+    @property
+    def latency(self):
+        """Mean seconds per query"""
+        return self.seconds / self.queries if self.queries else 0.0
+    
+    @property
+    def bytes_per_query(self):
+        return self.bytes / self.queries if self.queries else 0.0
+
+class SourcePlanner:
+    """
+    Learns which sources return relevant prices and queries the best ones first
+    
+    Every source query is recorded with whether it produced a priced result, how
+    long it took and how many bytes it read, both overall and per plant category.
+    Sources are ranked by their category hit rate (smoothed towards their overall
+    hit rate while the category has few samples), with latency breaking ties.
+    Sources whose hit rate has fallen below min_hit_rate after min_queries
+    queries are skipped, except with probability `exploration` so that a
+    source that starts stocking a plant type can earn its place back.
+    """
+    
+    def __init__(self, path="source_stats.json", exploration=0.1, min_hit_rate=0.05, min_queries=10, seed=None):
+        """
+        Args:
+            path: JSON file the statistics are persisted to (None to keep them in memory)
+            exploration: Probability of querying a pruned source anyway
+            min_hit_rate: Sources below this hit rate are pruned
+            min_queries: Queries (decayed) needed before a source can be pruned
+            seed: Random seed for the exploration decisions
+        """
+        self.path = path
+        self.exploration = exploration
+        self.min_hit_rate = min_hit_rate
+        self.min_queries = min_queries
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}  # (source, category or None for all categories) -> SourceStats
+        self.pruned = 0  # Queries skipped this session
+        self.explored = 0  # Pruned sources queried anyway this session
+        self.journal = None  # Set to a list to also keep every record() call's arguments (see ShardedRun)
+        
+        if path and os.path.exists(path):
+            self.load()
+    
+    def record(self, plant_name, source, hit, seconds, bytes_read=0):
+        """
+        Record one query of a source
+        
+        Args:
+            plant_name: Plant that was searched for
+            source: Source name (retailer, site or stage name)
+            hit: Whether the query produced a priced, relevant result
+            seconds: Time the query took
+            bytes_read: Bytes downloaded for the query
+        """
+        category = plant_category(plant_name)
+        with self.lock:
+            if self.journal is not None:
+                self.journal.append((plant_name, source, hit, seconds, bytes_read))
+            for key in ((source, None), (source, category)):
+                self.stats.setdefault(key, SourceStats()).add(hit, seconds, bytes_read)
+    
+    def hit_rate(self, source, category):
+        """Expected chance that querying the source yields a price for a plant of this category"""
+        overall = self.stats.get((source, None))
+        prior = overall.hit_rate() if overall else 0.5
+        within = self.stats.get((source, category))
+        # The category estimate starts at the source's overall rate and moves away as samples arrive
+        return within.hit_rate(prior, weight=4.0) if within else prior
+    
+    def rank(self, plant_name, sources):
+        """
+        Order sources best first for a plant
+        
+        Args:
+            plant_name: Plant about to be searched for
+            sources: Source names
+        
+        Returns:
+            List of (source, hit rate), best first
+        """
+        category = plant_category(plant_name)
+        with self.lock:
+            scored = []
+            for source in sources:
+                stats = self.stats.get((source, category)) or self.stats.get((source, None))
+                latency = stats.latency if stats else 0.0
+                scored.append((self.hit_rate(source, category), -latency, source))
+        scored.sort(key=lambda item: item[:2], reverse=True)  # Stable: ties keep the configured order
+        return [(source, rate) for rate, _, source in scored]
+    
+    def order(self, plant_name, items, name=lambda item: item):
+        """Sort items (retailers, site dictionaries, ...) best source first; name gives each item's source name"""
+        ranking = {source: position for position, (source, rate) in enumerate(self.rank(plant_name, [name(item) for item in items]))}
+        return sorted(items, key=lambda item: ranking[name(item)])
+    
+    def order_stages(self, plant_name, stages):
+        """
+        Order search stages by their expected hits per request
+        
+        Args:
+            plant_name: Plant about to be searched for
+            stages: Dictionary of stage name -> source names queried by that stage
+        
+        Returns:
+            Stage names, best first
+        """
+        scores = []
+        for stage, sources in stages.items():
+            rates = [rate for source, rate in self.rank(plant_name, sources) if self.is_useful(source, plant_name)]
+            scores.append((sum(rates) / len(rates) if rates else 0.0, stage))
+        scores.sort(key=lambda item: item[0], reverse=True)
+        return [stage for score, stage in scores]
+    
+    def is_useful(self, source, plant_name):
+        """Whether a source still hits often enough (or hasn't been queried enough to tell)"""
+        category = plant_category(plant_name)
+        with self.lock:
+            stats = self.stats.get((source, category)) or self.stats.get((source, None))
+            if not stats or stats.queries < self.min_queries:
+                return True
+            return self.hit_rate(source, category) >= self.min_hit_rate
+    
+    def should_query(self, plant_name, source):
+        """Source filter: skip sources that almost never hit, apart from the occasional exploratory query"""
+        if self.is_useful(source, plant_name):
+            return True
+        with self.lock:
+            if self.rng.random() < self.exploration:
+                self.explored += 1
+                return True
+            self.pruned += 1
+            return False
+    
+    def describe(self, limit=5):
+        """Summary lines for the log: best and pruned sources overall"""
+        with self.lock:
+            overall = [(stats.hit_rate(), source, stats) for (source, category), stats in self.stats.items() if category is None]
+        if not overall:
+            return "Source planner: no statistics yet"
+        overall.sort(key=lambda item: item[0], reverse=True)
+        
+        best = ", ".join(f"{source} {rate:.0%} ({stats.latency:.1f}s, {stats.bytes_per_query / 1024:.0f} KB)"
+                         for rate, source, stats in overall[:limit])
+        text = f"Source planner: best sources {best}; skipped {self.pruned} low-yield queries, explored {self.explored}"
+        low = [source for rate, source, stats in overall if stats.queries >= self.min_queries and rate < self.min_hit_rate]
+        if low:
+            text += f"; pruned: {', '.join(low)}"
+        return text
+    
+    def load(self):
+        """Load statistics from the JSON file"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        for source, categories in data.get('sources', {}).items():
+            for category, values in categories.items():
+                self.stats[(source, None if category == '*' else category)] = SourceStats(*values)
+    
+    def save(self):
+        """Write statistics to the JSON file"""
+        if not self.path:
+            return
+        
+        data = {'sources': {}}
+        with self.lock:
+            for (source, category), stats in self.stats.items():
+                data['sources'].setdefault(source, {})[category or '*'] = [
+                    stats.queries, stats.hits, stats.seconds, stats.bytes
+                ]
+        
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
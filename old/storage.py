@@ -0,0 +1,356 @@
+import json
+import sqlite3
+import threading
+import time
+
+from utils import normalize_plant_name
+
+DEFAULT_HISTORY_PATH = "price_history.db"
+
+DAY = 24 * 60 * 60
+
+# A source with no match for a plant is skipped for NEGATIVE_TTL, doubling with every
+# further miss up to NEGATIVE_MAX_TTL (obscure cultivars rarely start appearing overnight)
+NEGATIVE_TTL = 7 * DAY
+NEGATIVE_MAX_TTL = 60 * DAY
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_history (
+    id INTEGER PRIMARY KEY,
+    plant TEXT NOT NULL,          -- normalized plant name (see utils.normalize_plant_name)
+    plant_name TEXT NOT NULL,     -- plant name as searched
+    retailer TEXT NOT NULL,
+    source_type TEXT,
+    price_cents INTEGER,          -- NULL when no price was found
+    currency TEXT,
+    url TEXT,
+    title TEXT,
+    source TEXT,
+    observed_at REAL NOT NULL     -- unix time
+);
+CREATE INDEX IF NOT EXISTS idx_price_history_plant_retailer_time
+    ON price_history (plant, retailer, observed_at);
+CREATE TABLE IF NOT EXISTS negative_results (
+    plant TEXT NOT NULL,          -- normalized plant name
+    source TEXT NOT NULL,         -- retailer / site name
+    misses INTEGER NOT NULL,      -- consecutive queries without a match
+    last_checked REAL NOT NULL,   -- unix time
+    expires_at REAL,              -- unix time; NULL until the entry has enough misses to be used
+    PRIMARY KEY (plant, source)
+);
+CREATE TABLE IF NOT EXISTS page_fragments (
+    url TEXT NOT NULL,            -- page the results were extracted from
+    selector TEXT NOT NULL,       -- product selector (and options) used, see fingerprints.FragmentCache
+    fingerprint TEXT NOT NULL,    -- BLAKE2b hash of the page's product nodes as fetched
+    results TEXT NOT NULL,        -- JSON list of SearchResult fields
+    updated_at REAL NOT NULL,     -- unix time
+    PRIMARY KEY (url, selector)
+);
+"""
+
+class PriceHistoryStore:
+    """
+    SQLite store of every SearchResult seen, for price history across runs
+    
+    Results are buffered and written in batches, each batch in a single
+    transaction. The connection can be shared between the GUI and the
+    scraping thread.
+    """
+    
+    def __init__(self, path=DEFAULT_HISTORY_PATH, batch_size=200):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.Lock()
+        # Workers on a shared queue all write here, so wait for the write lock rather than failing
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock:
+            self.conn.executescript(SCHEMA)
+    
+    def add_result(self, result):
+        """Queue a SearchResult for the next batch (written once the batch is full)"""
+        row = (
+            normalize_plant_name(result.plant_name),
+            result.plant_name,
+            result.retailer or "Other",
+            result.source_type,
+            result.price_cents,
+            result.currency,
+            result.url,
+            result.title,
+            result.source,
+            result.created_at
+        )
+        with self.lock:
+            self.pending.append(row)
+            full = len(self.pending) >= self.batch_size
+        # flush takes the lock itself
+        if full:
+            self.flush()
+    
+    def add_results(self, results):
+        """Queue several SearchResults"""
+        for result in results:
+            self.add_result(result)
+    
+    def flush(self):
+        """Write all queued results in one transaction"""
+        with self.lock:
+            if not self.pending:
+                return
+            rows, self.pending = self.pending, []
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO price_history (plant, plant_name, retailer, source_type, price_cents, "
+                    "currency, url, title, source, observed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+    
+    def close(self):
+        """Flush anything pending and close the database"""
+        self.flush()
+        with self.lock:
+            self.conn.close()
+    
+    def _query(self, sql, params=()):
+        """Run a read query and return the rows as dictionaries"""
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+    
+    def load_fragments(self, limit):
+        """
+        Most recently updated page fragments, newest first (see fingerprints.FragmentCache)
+        
+        Returns:
+            List of (url, selector, fingerprint, list of result field dictionaries)
+        """
+        rows = self._query("SELECT url, selector, fingerprint, results FROM page_fragments "
+                           "ORDER BY updated_at DESC LIMIT ?", (limit,))
+        return [(row['url'], row['selector'], row['fingerprint'], json.loads(row['results'])) for row in rows]
+    
+    def save_fragment(self, url, selector, fingerprint, results, evicted=()):
+        """
+        Store a page fragment's fingerprint and results, and drop evicted ones
+        
+        Args:
+            url, selector: Key of the fragment
+            fingerprint: Hash of the fragment
+            results: List of JSON-friendly result field dictionaries
+            evicted: (url, selector) keys to delete
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO page_fragments (url, selector, fingerprint, results, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, selector, fingerprint, json.dumps(results), time.time())
+            )
+            self.conn.executemany("DELETE FROM page_fragments WHERE url = ? AND selector = ?", evicted)
+    
+    def latest_prices(self, plant_name=None):
+        """
+        Latest known price per plant and retailer
+        
+        Args:
+            plant_name: Limit to one plant (any spelling that normalizes the same)
+        
+        Returns:
+            List of row dictionaries, one per (plant, retailer)
+        """
+        where = "WHERE price_cents IS NOT NULL"
+        params = ()
+        if plant_name:
+            where += " AND plant = ?"
+            params = (normalize_plant_name(plant_name),)
+        
+        return self._query(
+            f"""
+            SELECT h.* FROM price_history h
+            JOIN (
+                SELECT plant, retailer, MAX(observed_at) AS observed_at
+                FROM price_history {where}
+                GROUP BY plant, retailer
+            ) latest USING (plant, retailer, observed_at)
+            WHERE h.price_cents IS NOT NULL
+            ORDER BY h.plant, h.retailer
+            """,
+            params
+        )
+    
+    def history(self, plant_name, retailer=None, since=None):
+        """All priced observations for a plant, oldest first"""
+        sql = "SELECT * FROM price_history WHERE plant = ? AND price_cents IS NOT NULL"
+        params = [normalize_plant_name(plant_name)]
+        if retailer:
+            sql += " AND retailer = ?"
+            params.append(retailer)
+        if since is not None:
+            sql += " AND observed_at >= ?"
+            params.append(since)
+        return self._query(sql + " ORDER BY observed_at", params)
+    
+    def source_stats(self, since):
+        """
+        Observation statistics per (plant, retailer) since a point in time
+        
+        Args:
+            since: Unix time to start counting from
+        
+        Returns:
+            List of dictionaries with plant, retailer, observations, changes
+            (number of times the price differed from the previous observation),
+            last_seen and last_changed
+        """
+        return self._query(
+            """
+            SELECT plant, retailer, COUNT(*) AS observations, SUM(changed) AS changes,
+                   MAX(observed_at) AS last_seen,
+                   MAX(CASE WHEN changed THEN observed_at END) AS last_changed
+            FROM (
+                SELECT plant, retailer, observed_at,
+                       COALESCE(price_cents != LAG(price_cents) OVER (
+                           PARTITION BY plant, retailer ORDER BY observed_at), 0) AS changed
+                FROM price_history
+                WHERE price_cents IS NOT NULL AND observed_at >= ?
+            )
+            GROUP BY plant, retailer
+            """,
+            (since,)
+        )
+    
+    def price_change(self, plant_name, days=7):
+        """
+        Price change per retailer over the last N days
+        
+        The baseline is the last price seen on or before the start of the window
+        (or the first price inside it if there is nothing older).
+        
+        Returns:
+            List of dictionaries with retailer, old_cents, new_cents, change_cents and change_pct
+        """
+        plant = normalize_plant_name(plant_name)
+        cutoff = time.time() - days * 24 * 60 * 60
+        changes = []
+        
+        for latest in self.latest_prices(plant_name):
+            baseline = self._query(
+                "SELECT price_cents FROM price_history "
+                "WHERE plant = ? AND retailer = ? AND price_cents IS NOT NULL AND observed_at <= ? "
+                "ORDER BY observed_at DESC LIMIT 1",
+                (plant, latest["retailer"], cutoff)
+            ) or self._query(
+                "SELECT price_cents FROM price_history "
+                "WHERE plant = ? AND retailer = ? AND price_cents IS NOT NULL AND observed_at > ? "
+                "ORDER BY observed_at LIMIT 1",
+                (plant, latest["retailer"], cutoff)
+            )
+            if not baseline:
+                continue
+            
+            old_cents = baseline[0]["price_cents"]
+            new_cents = latest["price_cents"]
+            changes.append({
+                "retailer": latest["retailer"],
+                "old_cents": old_cents,
+                "new_cents": new_cents,
+                "change_cents": new_cents - old_cents,
+                "change_pct": round((new_cents - old_cents) / old_cents * 100, 1) if old_cents else None
+            })
+        
+        return changes
+
+class NegativeResultCache:
+    """
+    Remembers (plant, source) pairs that returned no matching product
+    
+    Stored in the price history database. An entry becomes active after
+    min_misses consecutive misses (so a single failed request doesn't hide a
+    source) and then expires after NEGATIVE_TTL, doubling with each further
+    miss up to NEGATIVE_MAX_TTL. A hit removes the entry. With force_refresh
+    set, every source is queried again but misses are still recorded.
+    """
+    
+    def __init__(self, store, ttl=NEGATIVE_TTL, max_ttl=NEGATIVE_MAX_TTL, min_misses=2):
+        """
+        Args:
+            store: PriceHistoryStore whose database holds the cache
+            ttl: Seconds a source is skipped after it becomes negative for a plant
+            max_ttl: Longest skip, in seconds
+            min_misses: Consecutive misses before a source is skipped
+        """
+        self.store = store
+        self.ttl = ttl
+        self.max_ttl = max_ttl
+        self.min_misses = min_misses
+        self.force_refresh = False
+        self.skipped = 0
+        self.entries = {}  # (plant, source) -> (misses, expires_at)
+        for row in store._query("SELECT plant, source, misses, expires_at FROM negative_results"):
+            self.entries[(row['plant'], row['source'])] = (row['misses'], row['expires_at'])
+    
+    def is_negative(self, plant_name, source, now=None):
+        """Whether the source is known to have no match for the plant and the entry hasn't expired"""
+        entry = self.entries.get((normalize_plant_name(plant_name), source))
+        return bool(entry and entry[1] and entry[1] > (now or time.time()))
+    
+    def should_query(self, plant_name, source):
+        """Source filter: skip sources with an active negative entry (unless a full refresh is forced)"""
+        if self.force_refresh or not self.is_negative(plant_name, source):
+            return True
+        self.skipped += 1
+        return False
+    
+    def negative_sources(self, plant_name, now=None):
+        """Sources currently skipped for a plant"""
+        plant = normalize_plant_name(plant_name)
+        now = now or time.time()
+        return {source for (key, source), (misses, expires_at) in self.entries.items()
+                if key == plant and expires_at and expires_at > now}
+    
+    def record(self, plant_name, source, hit, now=None):
+        """
+        Record the outcome of querying a source for a plant
+        
+        Args:
+            plant_name: Plant that was searched for
+            source: Source name
+            hit: Whether a matching priced product was found
+            now: Unix time of the query (defaults to time.time())
+        """
+        key = (normalize_plant_name(plant_name), source)
+        now = now or time.time()
+        
+        if hit:
+            if self.entries.pop(key, None) is not None:
+                with self.store.lock, self.store.conn:
+                    self.store.conn.execute("DELETE FROM negative_results WHERE plant = ? AND source = ?", key)
+            return
+        
+        misses = self.entries.get(key, (0, None))[0] + 1
+        expires_at = None
+        if misses >= self.min_misses:
+            expires_at = now + min(self.ttl * 2 ** (misses - self.min_misses), self.max_ttl)
+        self.entries[key] = (misses, expires_at)
+        with self.store.lock, self.store.conn:
+            self.store.conn.execute(
+                "INSERT OR REPLACE INTO negative_results (plant, source, misses, last_checked, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                key + (misses, now, expires_at)
+            )
+    
+    def clear(self, plant_name=None):
+        """Forget negative entries for one plant, or all of them"""
+        with self.store.lock, self.store.conn:
+            if plant_name:
+                plant = normalize_plant_name(plant_name)
+                self.store.conn.execute("DELETE FROM negative_results WHERE plant = ?", (plant,))
+                self.entries = {key: value for key, value in self.entries.items() if key[0] != plant}
+            else:
+                self.store.conn.execute("DELETE FROM negative_results")
+                self.entries = {}
+    
+    def describe(self):
+        """One-line summary for the log"""
+        now = time.time()
+        active = sum(1 for misses, expires_at in self.entries.values() if expires_at and expires_at > now)
+        return f"Negative cache: {active} (plant, source) pairs without a match, {self.skipped} queries skipped"
@@ -0,0 +1,152 @@
+import html
+import json
+import re
+
+from prices import Price, parse_price
+
+# Patterns run over the raw page bytes, so pages with structured data never need a full parse
+_JSON_LD_PATTERN = re.compile(
+    rb'<script[^>]*type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script>', re.S | re.I
+)
+_META_TAG_PATTERN = re.compile(rb'<meta\s[^>]*>', re.I)
+_ITEMPROP_PRICE_PATTERN = re.compile(rb'<(\w+)\s[^>]*itemprop\s*=\s*["\']?price(?=["\'\s>])[^>]*>([^<]*)', re.I)
+_ITEMPROP_CURRENCY_PATTERN = re.compile(rb'<\w+\s[^>]*itemprop\s*=\s*["\']?priceCurrency(?=["\'\s>])[^>]*>', re.I)
+_ATTRIBUTE_PATTERN = re.compile(rb'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+_TITLE_PATTERN = re.compile(rb'<title[^>]*>(.*?)</title>', re.S | re.I)
+
+def _attributes(tag):
+    """Attributes of a single raw tag as a lowercase-keyed dictionary of strings"""
+    attributes = {}
+    for name, double, single, bare in _ATTRIBUTE_PATTERN.findall(tag):
+        value = double or single or bare
+        attributes[name.decode('ascii', 'replace').lower()] = html.unescape(value.decode('utf-8', 'replace'))
+    return attributes
+
+def _make_price(value, currency=None):
+    """Price from a structured price value, tagged with its currency if one is given"""
+    price = parse_price(value)
+    if price and currency:
+        price = Price(price.cents, currency.strip().upper())
+    return price
+
+def _is_product(node):
+    """Whether a JSON-LD node is a Product (or ProductGroup / a type list including Product)"""
+    node_type = node.get('@type')
+    types = node_type if isinstance(node_type, list) else [node_type]
+    return any(t in ('Product', 'ProductGroup', 'IndividualProduct') for t in types)
+
+def _offer_price(offers):
+    """First price found in an offers value (Offer, AggregateOffer or a list of either)"""
+    for offer in offers if isinstance(offers, list) else [offers]:
+        if not isinstance(offer, dict):
+            continue
+        value = offer.get('price', offer.get('lowPrice'))
+        if value is None and isinstance(offer.get('priceSpecification'), dict):
+            value = offer['priceSpecification'].get('price')
+        price = _make_price(value, offer.get('priceCurrency'))
+        if price:
+            return price
+    return None
+
+def _json_ld_nodes(data):
+    """Walk JSON-LD data yielding every dictionary, following lists and @graph"""
+    if isinstance(data, list):
+        for item in data:
+            yield from _json_ld_nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        for key in ('@graph', 'mainEntity', 'itemOffered'):
+            if key in data:
+                yield from _json_ld_nodes(data[key])
+
+def extract_json_ld_offer(page):
+    """
+    Find a priced Product in the page's JSON-LD blocks
+    
+    Args:
+        page: Raw page bytes
+    
+    Returns:
+        Tuple of (Price, product name) or None
+    """
+    for block in _JSON_LD_PATTERN.findall(page):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        
+        for node in _json_ld_nodes(data):
+            if not _is_product(node):
+                continue
+            price = _offer_price(node.get('offers'))
+            if price is None:
+                # ProductGroup: price lives on the variants
+                for variant in node.get('hasVariant') or []:
+                    if isinstance(variant, dict):
+                        price = _offer_price(variant.get('offers'))
+                        if price:
+                            break
+            if price:
+                name = node.get('name')
+                return price, name.strip() if isinstance(name, str) else None
+    return None
+
+def extract_microdata_offer(page):
+    """Price from an itemprop="price" element (content attribute, or its text)"""
+    match = _ITEMPROP_PRICE_PATTERN.search(page)
+    if not match:
+        return None
+    
+    attributes = _attributes(match.group(0))
+    value = attributes.get('content') or html.unescape(match.group(2).decode('utf-8', 'replace'))
+    currency_tag = _ITEMPROP_CURRENCY_PATTERN.search(page)
+    currency = _attributes(currency_tag.group(0)).get('content') if currency_tag else None
+    return _make_price(value, currency)
+
+def extract_page_offer(page):
+    """
+    Price from structured data: JSON-LD, then microdata, then OpenGraph/product meta tags
+    
+    Works on the raw bytes (or text) of a page with regular expressions, so it costs
+    a small fraction of building a BeautifulSoup tree and running CSS selectors.
+    
+    Args:
+        page: Page bytes or text
+    
+    Returns:
+        Dictionary with price (Price), title and source ('json-ld', 'microdata'
+        or 'opengraph'), or None if the page has no structured price
+    """
+    if isinstance(page, str):
+        page = page.encode('utf-8', 'replace')
+    
+    # Meta tags give the fallback title and the OpenGraph price
+    meta = {}
+    for tag in _META_TAG_PATTERN.findall(page):
+        attributes = _attributes(tag)
+        key = (attributes.get('property') or attributes.get('name') or '').lower()
+        if key and key not in meta and 'content' in attributes:
+            meta[key] = attributes['content']
+    
+    title = meta.get('og:title')
+    if not title:
+        title_match = _TITLE_PATTERN.search(page)
+        if title_match:
+            title = html.unescape(title_match.group(1).decode('utf-8', 'replace'))
+    title = title.strip() if title else None
+    
+    offer = extract_json_ld_offer(page)
+    if offer:
+        price, name = offer
+        return {'price': price, 'title': name or title, 'source': 'json-ld'}
+    
+    price = extract_microdata_offer(page)
+    if price:
+        return {'price': price, 'title': title, 'source': 'microdata'}
+    
+    for prefix in ('og:price', 'product:price'):
+        price = _make_price(meta.get(f'{prefix}:amount'), meta.get(f'{prefix}:currency'))
+        if price:
+            return {'price': price, 'title': title, 'source': 'opengraph'}
+    
+    return None
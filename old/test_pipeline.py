@@ -0,0 +1,84 @@
+import contextlib
+import threading
+import unittest
+
+from models import SearchResult
+from pipeline import ScrapePipeline
+
+class FakePage:
+    status_code = 200
+    text = "<html><body><div class='product'>Echeveria $12.95</div></body></html>"
+
+class FakeFetcher:
+    def fetch(self, url, page_type='retailer', **kwargs):
+        return FakePage()
+
+class FakeScraper:
+    """Just enough of PlantPriceScraper for the pipeline: one specialty site, no network"""
+    
+    def __init__(self, fail_record=False):
+        self.running = False
+        self.paused_for_captcha = False
+        self.catalog = None
+        self.retailers = []
+        self.fetcher = FakeFetcher()
+        self.fail_record = fail_record
+        self.recorded = []
+    
+    def start(self):
+        self.running = True
+    
+    def logger(self, message):
+        pass
+    
+    def should_query(self, plant_name, source_name):
+        return source_name == "Specialty"
+    
+    def order_sources(self, plant_name, items, name):
+        return items
+    
+    def get_marketplaces(self, plant_name, priority_marketplaces=False):
+        return []
+    
+    def get_specialty_sites(self, plant_name):
+        return [{'name': "Specialty", 'plan': None, 'url': "https://example.com/search", 'product_selector': "div.product"}]
+    
+    def rate_limit(self, plan):
+        return contextlib.nullcontext()
+    
+    def source_started(self):
+        return 0.0, 0
+    
+    def parse_specialty_page(self, site, html, plant_name):
+        return SearchResult(plant_name, "$12.95", retailer=site['name'], url=site['url'])
+    
+    def record_source(self, plant_name, source_name, hit, started, failed=False):
+        if self.fail_record:
+            raise RuntimeError("statistics unavailable")
+        self.recorded.append((plant_name, source_name, hit))
+
+class ScrapePipelineTest(unittest.TestCase):
+    def run_pipeline(self, scraper, plant_names):
+        # run() blocks until every plant reaches the sink, so a lost task shows up as a timeout
+        output = []
+        thread = threading.Thread(target=lambda: output.extend(ScrapePipeline(scraper).run(plant_names, report_interval=None)),
+                                  daemon=True)
+        thread.start()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive(), "pipeline did not drain")
+        return output
+    
+    def test_results_in_input_order(self):
+        scraper = FakeScraper()
+        output = self.run_pipeline(scraper, ["Echeveria", "Haworthia"])
+        self.assertEqual([plant_name for plant_name, results in output], ["Echeveria", "Haworthia"])
+        self.assertEqual(output[0][1][0].price, "$12.95")
+        self.assertEqual(len(scraper.recorded), 2)
+    
+    def test_failing_record_source_does_not_hang(self):
+        output = self.run_pipeline(FakeScraper(fail_record=True), ["Echeveria", "Haworthia"])
+        self.assertEqual(len(output), 2)
+        self.assertEqual(output[1][1][0].price, "$12.95")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,13 @@
 import random
 import time
 import re
+import unicodedata
 import webbrowser
 import urllib.parse
+from collections import deque
+from functools import lru_cache
+
+from prices import parse_price, extract_price
 
 # Collection of user agents for rotating in requests
 USER_AGENTS = [
@@ -64,6 +69,70 @@ def format_search_term(plant_name, include_buy=True, location="australia"):
     # URL encode to handle special characters properly
     return urllib.parse.quote_plus(terms)
 
+# Results mentioning any of these sites are never relevant
+EXCLUDED_SITES = [
+    'succulentsonline.com.au',
+    'wikipedia.org',
+    'wikimedia.org',
+    'inaturalist.org',
+    'flickr.com',
+    'pinterst.com'
+]
+
+# Common irrelevant results (care guides, store info, etc.)
+IRRELEVANT_TERMS = [
+    'wikipedia',
+    'images',
+    'pictures',
+    'how to grow',
+    'care guide',
+    'plant care',
+    'identification',
+    'poison',
+    'toxic',
+    'nursery locations',
+    'store hours',
+    'contact us',
+    'about us'
+]
+
+# Words that suggest a result is about buying something
+PRICE_INDICATORS = ['$', 'price', 'cost', 'buy', 'purchase', 'shop', 'sale']
+
+class TermScanner:
+    """
+    Checks lowercased text against several fixed term lists.
+    
+    Term lists are lowercased, deduplicated and frozen once, and each category is
+    checked with C-level substring searches. A single compiled alternation of all
+    terms, anchored with \b, was measured to be slower than this on CPython
+    (see benchmarks.py).
+    """
+    def __init__(self, **categories):
+        self.categories = {
+            name: tuple(dict.fromkeys(term.lower() for term in terms))
+            for name, terms in categories.items()
+        }
+    
+    def contains_any(self, text, category):
+        """Check whether any term of a category occurs in the (lowercased) text"""
+        return any(map(text.__contains__, self.categories[category]))
+    
+    def count(self, text, category):
+        """Count how many distinct terms of a category occur in the (lowercased) text"""
+        return sum(map(text.__contains__, self.categories[category]))
+
+RELEVANCE_SCANNER = TermScanner(
+    excluded=EXCLUDED_SITES,
+    irrelevant=IRRELEVANT_TERMS,
+    price=PRICE_INDICATORS
+)
+
+@lru_cache(maxsize=2048)
+def _plant_words(plant_name):
+    """Lowercased words (3+ characters) of a plant name, split once per plant"""
+    return tuple(word for word in plant_name.lower().split() if len(word) > 2)
+
 def is_relevant_result(plant_name, result_text):
     """
     Check if a search result is relevant to the plant we're looking for.
@@ -76,66 +145,31 @@ def is_relevant_result(plant_name, result_text):
     Returns:
         Boolean indicating if the result is relevant
     """
-    # Convert both strings to lowercase for case-insensitive comparison
+    # Convert to lowercase for case-insensitive comparison
     result_text = result_text.lower()
-    plant_name = plant_name.lower()
     
     # Check if the result is from excluded websites
-    excluded_sites = [
-        'succulentsonline.com.au',
-        'wikipedia.org',
-        'wikimedia.org',
-        'inaturalist.org',
-        'flickr.com',
-        'pinterst.com'
-    ]
-    
-    if any(site in result_text for site in excluded_sites):
+    if RELEVANCE_SCANNER.contains_any(result_text, 'excluded'):
         return False
     
-    # Break the plant name into words and check presence
-    plant_words = [word for word in plant_name.split() if len(word) > 2]
+    # Check presence of the plant name's words
+    plant_words = _plant_words(plant_name)
+    matches = sum(map(result_text.__contains__, plant_words))
     
     # For plant names with 3+ words, require at least 2/3 of words to be present
     if len(plant_words) >= 3:
-        matches = sum(1 for word in plant_words if word in result_text)
         if matches < len(plant_words) * 0.67:  # At least 2/3 of words must match
             return False
     # For plant names with 1-2 words, require all words to be present
-    else:
-        if not all(word in result_text for word in plant_words):
-            return False
-    
-    # Exclude common irrelevant results
-    irrelevant_terms = [
-        'wikipedia',
-        'images',
-        'pictures',
-        'how to grow',
-        'care guide',
-        'plant care',
-        'identification',
-        'poison',
-        'toxic',
-        'nursery locations',
-        'store hours',
-        'contact us',
-        'about us'
-    ]
-    
-    # Count how many irrelevant terms appear
-    irrelevant_matches = sum(1 for term in irrelevant_terms if term in result_text)
+    elif matches < len(plant_words):
+        return False
     
     # If more than 2 irrelevant terms, consider it not relevant
-    if irrelevant_matches > 2:
+    if RELEVANCE_SCANNER.count(result_text, 'irrelevant') > 2:
         return False
     
-    # Check for price indicators to increase confidence
-    price_indicators = ['$', 'price', 'cost', 'buy', 'purchase', 'shop', 'sale']
-    has_price_indicator = any(indicator in result_text for indicator in price_indicators)
-    
     # If it's a very short result and has no price indicators, be cautious
-    if len(result_text) < 100 and not has_price_indicator:
+    if len(result_text) < 100 and not RELEVANCE_SCANNER.contains_any(result_text, 'price'):
         return False
         
     return True
@@ -173,6 +207,69 @@ def extract_url_from_source(source_text):
     
     return None
 
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = ('utm_', 'gclid', 'gclsrc', 'fbclid', 'msclkid', 'srsltid', '_ga', 'campid', 'mkevt', 'mkcid')
+
+def canonical_url(url):
+    """
+    Normalize a URL so the same page found through different engines compares equal
+    
+    Lowercases the host, drops "www.", the fragment, tracking parameters and any
+    trailing slash, and sorts the remaining query parameters.
+    """
+    if not url:
+        return url
+    
+    parts = urllib.parse.urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    
+    query = [
+        (key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ]
+    path = parts.path.rstrip('/') or '/'
+    return urllib.parse.urlunsplit(('https', host, path, urllib.parse.urlencode(sorted(query)), ''))
+
+def dedupe_results_by_url(results):
+    """Keep the first result for each canonical URL (results without a URL are kept by source)"""
+    seen = set()
+    unique = []
+    for result in results:
+        key = canonical_url(result.url) if result.url else result.source
+        if key not in seen:
+            seen.add(key)
+            unique.append(result)
+    return unique
+
+class LatencyTracker:
+    """Rolling window of request latencies, used to decide when to hedge a slow request"""
+    
+    def __init__(self, window=50, percentile=0.9, default_delay=3.0, min_samples=5):
+        """
+        Args:
+            window: Number of recent latencies kept
+            percentile: Latency percentile after which a request counts as slow
+            default_delay: Hedge delay in seconds until enough latencies are known
+            min_samples: Latencies needed before the percentile is used
+        """
+        self.samples = deque(maxlen=window)
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+    
+    def record(self, seconds):
+        """Add one observed latency"""
+        self.samples.append(seconds)
+    
+    def hedge_delay(self):
+        """Seconds to wait before firing a backup request"""
+        if len(self.samples) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * self.percentile), len(ordered) - 1)]
+
 def open_url(url):
     """Open a URL in the default web browser"""
     try:
@@ -195,27 +292,10 @@ def format_price(price_text):
     if not price_text or price_text == "N/A" or price_text == "Not found":
         return price_text
     
-    # Try to extract a price using regex
-    price_match = re.search(r'\$?\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)', price_text)
-    if price_match:
-        price = price_match.group(1)
-        
-        # Remove any commas
-        price = price.replace(',', '')
-        
-        # Convert to float and format
-        try:
-            price_float = float(price)
-            return f"${price_float:.2f}"
-        except ValueError:
-            # If conversion fails, just add $ symbol if missing
-            if not price_text.startswith('$'):
-                return f"${price}"
-            return price_text
-    
-    # If no match, return original with $ if needed
-    if not price_text.startswith('$') and any(c.isdigit() for c in price_text):
-        return f"${price_text}"
+    # Use the shared price parser: a bare value first ("12.5"), then the first price in the text
+    price = parse_price(price_text) or extract_price(price_text)
+    if price:
+        return price.format()
     
     return price_text
 
@@ -260,4 +340,45 @@ def clean_plant_name(plant_name):
     # Clean up after removing parentheses
     clean_name = ' '.join(clean_name.split())
     
-    return clean_name
\ No newline at end of file
+    return clean_name
+
+def normalize_plant_name(plant_name):
+    """
+    Build a canonical key for a plant name so near-identical entries compare equal
+    
+    Args:
+        plant_name: Raw plant name as entered or imported
+        
+    Returns:
+        Lowercased, accent-free, whitespace-collapsed version of the cleaned name
+    """
+    clean_name = clean_plant_name(plant_name)
+    
+    # Strip diacritics (e.g. "Échevéria" -> "Echeveria")
+    decomposed = unicodedata.normalize('NFKD', clean_name)
+    clean_name = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    
+    return ' '.join(clean_name.casefold().split())
+
+def group_duplicate_plant_names(plant_names):
+    """
+    Collapse duplicate plant names into a single scrape job each
+    
+    Args:
+        plant_names: List of plant names in input order (may contain duplicates)
+        
+    Returns:
+        List of (search_name, row_indices) tuples in order of first appearance.
+        search_name is the cleaned form of the first matching entry and
+        row_indices lists every input position that maps to it.
+    """
+    groups = {}
+    for index, plant_name in enumerate(plant_names):
+        key = normalize_plant_name(plant_name)
+        if not key:
+            continue
+        if key not in groups:
+            groups[key] = (clean_plant_name(plant_name), [])
+        groups[key][1].append(index)
+    
+    return list(groups.values())
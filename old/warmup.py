@@ -0,0 +1,124 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Resolved addresses are reused for this long; retailer CDNs rotate records on the order of minutes
+DNS_TTL = 5 * 60
+
+class DnsCache:
+    """
+    Process-wide cache in front of socket.getaddrinfo
+    
+    Both transports (requests/urllib3 and httpx) resolve through socket.getaddrinfo
+    for every new connection, so once install() has been called every connection
+    to a known host skips the resolver until its entry is DNS_TTL seconds old.
+    """
+    
+    def __init__(self, ttl=DNS_TTL):
+        self.ttl = ttl
+        self.entries = {}  # getaddrinfo arguments -> (expires at, addresses)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._getaddrinfo = None  # Original resolver while installed
+    
+    def install(self):
+        """Route socket.getaddrinfo through the cache"""
+        if self._getaddrinfo is None:
+            self._getaddrinfo = socket.getaddrinfo
+            socket.getaddrinfo = self.getaddrinfo
+    
+    def uninstall(self):
+        """Restore the original socket.getaddrinfo"""
+        if self._getaddrinfo is not None:
+            socket.getaddrinfo = self._getaddrinfo
+            self._getaddrinfo = None
+    
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """Drop-in replacement for socket.getaddrinfo"""
+        resolve = self._getaddrinfo or socket.getaddrinfo
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return list(entry[1])
+        
+        addresses = resolve(host, port, family, type, proto, flags)
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = (now + self.ttl, addresses)
+        return list(addresses)
+    
+    def resolve(self, host, port=443):
+        """
+        Resolve a host into the cache the way an HTTP connection would
+        
+        Returns:
+            Seconds the lookup took (close to zero when it was already cached)
+        """
+        start = time.perf_counter()
+        self.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        return time.perf_counter() - start
+    
+    def describe(self):
+        """One-line summary for the log"""
+        return f"DNS cache: {len(self.entries)} entries, {self.hits} hits, {self.misses} lookups"
+
+def warm_up(hosts, fetcher, dns_cache, open_connections=True, max_workers=16, logger=None):
+    """
+    Resolve every host and optionally open a pooled connection to it, in parallel
+    
+    With open_connections, each host gets two HEAD requests: the first pays for
+    TCP and TLS setup (cold), the second reuses the pooled connection (warm), so
+    the difference is what pre-warming saves on the first real request.
+    
+    Args:
+        hosts: Host names (e.g. "www.ebay.com.au")
+        fetcher: PageFetcher whose connection pool should be warmed
+        dns_cache: Installed DnsCache
+        open_connections: Also open connections, not just resolve names
+        max_workers: Hosts warmed at the same time
+        logger: Function to call with log messages
+    
+    Returns:
+        Dictionary of host -> {'dns': seconds, 'cold': seconds, 'warm': seconds};
+        values are None where a step failed or was skipped
+    """
+    logger = logger or (lambda msg: None)
+    
+    def warm(host):
+        timings = {'dns': None, 'cold': None, 'warm': None}
+        try:
+            timings['dns'] = dns_cache.resolve(host)
+            if open_connections:
+                url = f"https://{host}/"
+                timings['cold'] = fetcher.head(url, timeout=5)
+                timings['warm'] = fetcher.head(url, timeout=5)
+        except Exception as e:
+            logger(f"Could not warm up {host}: {str(e)}")
+        return host, timings
+    
+    hosts = list(dict.fromkeys(hosts))
+    if not hosts:
+        return {}
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(hosts)), thread_name_prefix="warmup") as pool:
+        report = dict(pool.map(warm, hosts))
+    
+    def ms(seconds):
+        return f"{seconds * 1000:.0f} ms" if seconds is not None else "-"
+    
+    for host, timings in report.items():
+        line = f"  {host}: DNS {ms(timings['dns'])}"
+        if open_connections:
+            line += f", first byte cold {ms(timings['cold'])} / warm {ms(timings['warm'])}"
+        logger(line)
+    
+    saved = [t['cold'] - t['warm'] for t in report.values() if t['cold'] is not None and t['warm'] is not None]
+    if saved:
+        logger(f"Warm connections save {sum(saved) / len(saved) * 1000:.0f} ms per host on the first request")
+    
+    return report
@@ -0,0 +1,319 @@
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from fingerprints import FragmentCache
+from storage import PriceHistoryStore
+
+DEFAULT_QUEUE_PATH = "work_queue.db"
+
+# A leased job that isn't acked within this many seconds goes back to the queue
+VISIBILITY_TIMEOUT = 10 * 60
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 60  # Seconds before a failed job is retried, doubled for each attempt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    queue TEXT NOT NULL,
+    payload TEXT NOT NULL,        -- plant name
+    status TEXT NOT NULL,         -- pending, leased, done or failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,           -- unix time the lease runs out
+    available_at REAL NOT NULL,   -- unix time the job may next be leased
+    enqueued_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    error TEXT,
+    UNIQUE (queue, payload)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue_status_available ON jobs (queue, status, available_at);
+"""
+
+class Job:
+    """A leased plant job"""
+    __slots__ = ('id', 'payload', 'attempts')
+    
+    def __init__(self, id, payload, attempts):
+        self.id = id
+        self.payload = payload
+        self.attempts = attempts
+    
+    def __repr__(self):
+        return f"Job({self.id}, {self.payload!r}, attempt {self.attempts})"
+
+class SQLiteWorkQueue:
+    """
+    Work queue of plant jobs in a SQLite file
+    
+    A coordinator enqueues plant names; any number of worker processes lease
+    jobs, process them and ack them. A lease hides the job from other workers
+    for the visibility timeout; if the worker dies or the lease runs out, the
+    job becomes available again. Failed jobs are retried with a growing delay
+    until max_attempts, then marked failed.
+    
+    Every operation is a single short transaction, so the file can be shared
+    by processes on one machine or, over a network filesystem with working
+    locks, by several machines. That needs SQLite's rollback journal, which
+    is the default: WAL mode keeps its index in shared memory and does not
+    work across hosts, so single_host=True should only be used when every
+    worker runs on the same machine. Another backend only needs enqueue,
+    lease, ack, nack and stats with the same meaning.
+    """
+    
+    def __init__(self, path=DEFAULT_QUEUE_PATH, queue="plants", visibility_timeout=VISIBILITY_TIMEOUT,
+                 max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY, single_host=False):
+        self.path = path
+        self.queue = queue
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lock = threading.Lock()
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        with self.lock:
+            # WAL lets readers run alongside the writer, but only between processes on one host
+            self.conn.execute(f"PRAGMA journal_mode={'WAL' if single_host else 'DELETE'}")
+            self.conn.executescript(SCHEMA)
+    
+    def _transaction(self, work):
+        """Run work(cursor) in one write transaction, taking the write lock up front"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(cursor)
+                cursor.execute("COMMIT")
+                return result
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+    
+    def enqueue(self, plant_names):
+        """
+        Add plant jobs
+        
+        Plants done in an earlier run are queued again with fresh attempts;
+        plants still pending, leased or failed are left as they are.
+        
+        Returns:
+            Number of jobs added or re-queued
+        """
+        now = time.time()
+        rows = [(self.queue, name, 'pending', now, now, now) for name in dict.fromkeys(plant_names)]
+        
+        def work(cursor):
+            cursor.executemany(
+                "INSERT INTO jobs (queue, payload, status, available_at, enqueued_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (queue, payload) DO UPDATE SET status = 'pending', attempts = 0, "
+                "available_at = excluded.available_at, enqueued_at = excluded.enqueued_at, "
+                "updated_at = excluded.updated_at, error = NULL WHERE status = 'done'",
+                rows
+            )
+            return cursor.rowcount
+        
+        return self._transaction(work)
+    
+    def lease(self, worker_id, count=1):
+        """
+        Lease up to count jobs for a worker
+        
+        Jobs whose lease has expired are taken back first; those that have
+        used up their attempts are marked failed instead.
+        
+        Returns:
+            List of Job
+        """
+        def work(cursor):
+            now = time.time()
+            cursor.execute(
+                "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired'), updated_at = ? "
+                "WHERE queue = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.queue, now, self.max_attempts)
+            )
+            rows = cursor.execute(
+                "SELECT id, payload, attempts FROM jobs "
+                "WHERE queue = ? AND ((status = 'pending' AND available_at <= ?) "
+                "OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY id LIMIT ?",
+                (self.queue, now, now, count)
+            ).fetchall()
+            cursor.executemany(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(worker_id, now + self.visibility_timeout, now, row[0]) for row in rows]
+            )
+            return [Job(job_id, payload, attempts + 1) for job_id, payload, attempts in rows]
+        
+        return self._transaction(work)
+    
+    def ack(self, job, worker_id):
+        """
+        Mark a leased job done
+        
+        Returns:
+            False if the lease had already expired and passed to another worker
+        """
+        def work(cursor):
+            cursor.execute(
+                "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL, error = NULL, "
+                "updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (time.time(), job.id, worker_id)
+            )
+            return cursor.rowcount == 1
+        
+        return self._transaction(work)
+    
+    def nack(self, job, worker_id, error=None):
+        """Give a job back after a failure: retried after a delay, or failed once out of attempts"""
+        def work(cursor):
+            now = time.time()
+            if job.attempts >= self.max_attempts:
+                status, available_at = 'failed', now
+            else:
+                status, available_at = 'pending', now + self.retry_delay * 2 ** (job.attempts - 1)
+            cursor.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL, "
+                "error = ?, updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (status, available_at, error, now, job.id, worker_id)
+            )
+            return cursor.rowcount == 1
+        
+        return self._transaction(work)
+    
+    def retry_failed(self):
+        """Put failed jobs back in the queue with fresh attempts; returns how many"""
+        def work(cursor):
+            now = time.time()
+            cursor.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, available_at = ?, updated_at = ? "
+                "WHERE queue = ? AND status = 'failed'",
+                (now, now, self.queue)
+            )
+            return cursor.rowcount
+        
+        return self._transaction(work)
+    
+    def stats(self):
+        """Job counts by status"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (self.queue,)
+            ).fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+    
+    def is_finished(self):
+        """Whether every job is done or failed"""
+        counts = self.stats()
+        return counts['pending'] == 0 and counts['leased'] == 0
+    
+    def describe(self):
+        """One-line summary for the log"""
+        counts = self.stats()
+        total = sum(counts.values())
+        return (f"Queue '{self.queue}': {counts['done']}/{total} done, {counts['leased']} in progress, "
+                f"{counts['pending']} waiting, {counts['failed']} failed")
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def default_worker_id():
+    """host:pid, unique across the machines sharing a queue"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def run_worker(queue, scraper, sink, worker_id=None, logger=None, poll_interval=5, exit_when_empty=True):
+    """
+    Lease plant jobs, scrape them and write the results to the shared sink until the queue is finished
+    
+    Results are flushed to the sink before the job is acked, so a job is only
+    marked done once its prices are stored. A job is nacked (retried later, up
+    to the queue's attempt limit) when a search stage raises, when every
+    retailer, marketplace and specialty query for the plant failed, or when
+    the scraper returned an error row; nothing is written for it then.
+    
+    Args:
+        queue: SQLiteWorkQueue
+        scraper: PlantPriceScraper (BeautifulSoup mode is used)
+        sink: PriceHistoryStore shared by all workers
+        worker_id: Lease owner name (defaults to host:pid)
+        logger: Function to call with log messages
+        poll_interval: Seconds to wait when no job is available
+        exit_when_empty: Return once nothing is pending or leased (otherwise keep polling)
+    
+    Returns:
+        Number of jobs completed by this worker
+    """
+    logger = logger or (lambda msg: None)
+    worker_id = worker_id or default_worker_id()
+    scraper.fragments = FragmentCache(sink)
+    scraper.start()
+    completed = 0
+    
+    while scraper.running:
+        jobs = queue.lease(worker_id)
+        if not jobs:
+            if exit_when_empty and queue.is_finished():
+                break
+            time.sleep(poll_interval)
+            continue
+        
+        job = jobs[0]
+        try:
+            logger(f"[{worker_id}] {job.payload} (attempt {job.attempts})")
+            queried, failed = scraper.sources_queried, scraper.sources_failed
+            results = scraper.search_plant_bs4(job.payload, raise_errors=True)
+            queried, failed = scraper.sources_queried - queried, scraper.sources_failed - failed
+            # The scraper logs and swallows per-source errors, so look at what came back
+            if queried and failed == queried:
+                raise RuntimeError(f"all {queried} sources failed")
+            if any(result.price == "Error" for result in results):
+                raise RuntimeError("search returned an error")
+            sink.add_results(results)
+            sink.flush()
+        except Exception as e:
+            logger(f"[{worker_id}] Error on {job.payload}: {str(e)}")
+            queue.nack(job, worker_id, str(e))
+            continue
+        
+        if queue.ack(job, worker_id):
+            completed += 1
+        else:
+            logger(f"[{worker_id}] Lease on {job.payload} expired before it finished")
+    
+    return completed
+
+if __name__ == "__main__":
+    # python workqueue.py enqueue plants.txt [queue.db]
+    # python workqueue.py work [queue.db] [price_history.db]
+    # python workqueue.py status [queue.db]
+    # python workqueue.py retry [queue.db]
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    
+    if command == "enqueue":
+        queue = SQLiteWorkQueue(sys.argv[3] if len(sys.argv) > 3 else DEFAULT_QUEUE_PATH)
+        with open(sys.argv[2], 'r') as f:
+            added = queue.enqueue(line.strip() for line in f if line.strip())
+        print(f"Enqueued {added} plants")
+        print(queue.describe())
+    elif command == "work":
+        from scraper import PlantPriceScraper
+        
+        queue = SQLiteWorkQueue(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_QUEUE_PATH)
+        sink = PriceHistoryStore(sys.argv[3]) if len(sys.argv) > 3 else PriceHistoryStore()
+        done = run_worker(queue, PlantPriceScraper(logger=print), sink, logger=print)
+        sink.close()
+        print(f"Worker finished after {done} plants")
+        print(queue.describe())
+    elif command == "retry":
+        queue = SQLiteWorkQueue(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_QUEUE_PATH)
+        print(f"Re-queued {queue.retry_failed()} failed plants")
+    else:
+        queue = SQLiteWorkQueue(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_QUEUE_PATH)
+        print(queue.describe())
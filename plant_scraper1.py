@@ -18,6 +18,32 @@ from webdriver_manager.chrome import ChromeDriverManager
 import webbrowser
 import os
 
+# Retailer definitions shared with the modular scraper (old/registry.py)
+RETAILER_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "old", "retailers.json")
+DEFAULT_PRICE_PATTERN = r'\$\d+(?:\.\d{2})?'
+
+_retailer_config = None
+
+def load_direct_retailers(plant_name, path=RETAILER_CONFIG):
+    """Direct retailer entries from the retailer registry config, with search URLs for a plant"""
+    global _retailer_config
+    if _retailer_config is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            _retailer_config = json.load(f)
+    
+    defaults = _retailer_config.get("defaults", {})
+    entries = sorted(_retailer_config["retailers"], key=lambda entry: entry.get("priority", defaults.get("priority", 100)))
+    return [
+        {
+            "name": entry["name"],
+            "url": entry["url"].format(plant_name=plant_name.replace(' ', entry.get("space", defaults.get("space", "+")))),
+            "price_pattern": entry.get("price_pattern", DEFAULT_PRICE_PATTERN),
+            "product_selector": entry["product_selector"],
+            "alt_selectors": entry.get("alt_selectors", [])
+        }
+        for entry in entries
+    ]
+
 class PlantPriceScraperApp:
     def __init__(self, root):
         self.root = root
@@ -671,29 +697,7 @@ Crassula Ovata (Jade Plant)
         return True
 
     def search_direct_retailers(self, plant_name):
-        retailers = [
-            {
-                "name": "Bunnings",
-                "url": f"https://www.bunnings.com.au/search/products?q={plant_name.replace(' ', '%20')}&category=Plants",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "article.product",
-                "alt_selectors": ["div.product-list article", "div[data-product-card]"]
-            },
-            {
-                "name": "Flower Power",
-                "url": f"https://www.flowerpower.com.au/search?q={plant_name.replace(' ', '+')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.product-item-info",
-                "alt_selectors": ["li.product-item"]
-            },
-            {
-                "name": "Garden Express",
-                "url": f"https://www.gardenexpress.com.au/search/{plant_name.replace(' ', '%20')}",
-                "price_pattern": r'\$\d+(?:\.\d{2})?',
-                "product_selector": "div.product-item",
-                "alt_selectors": ["div.product-grid div"]
-            }
-        ]
+        retailers = load_direct_retailers(plant_name)
         
         results = []
         